@@ -0,0 +1,264 @@
+# batch_mode.py
+"""
+Offline batch planning: queued steps → one Batch-API job.
+
+    submit_batch()   leases every runnable task, writes its current step as
+                     one line of a Batch-format JSONL file
+                     ({"custom_id", "method", "url", "body"}) and submits it
+    collect_batch()  polls the job until it finishes, journals each reply as
+                     the step's `response` record and releases the leases
+
+The auto loop then finds the journaled replies through its normal resume
+path and dispatches them without calling the model again, so batched steps
+go through the same validation, dispatch and queue bookkeeping as
+interactive ones.  A reply whose task changed in the meantime no longer
+matches the step's prompt hash and is simply ignored.
+
+Backends:
+
+* OpenAIBatchBackend – files.create(purpose="batch") + batches.create/
+  retrieve; output and error files are read back with files.content.
+* LocalBatchBackend  – a stand-in that answers the same file along the
+  auto_loop model route (or through any `complete` callable) and writes an
+  output file in the Batch API's format; used for DeepSeek/local endpoints
+  and tests.
+
+Pending jobs are tracked in <state dir>/batches.json.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Any, Callable, Iterable, Optional
+
+import metrics
+import task_queue
+from file_lock import locked, read_json, write_json_atomic
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+COMPLETION_WINDOW = "24h"
+# Leases outlive the completion window so no worker runs a batched step
+BATCH_LEASE_SECONDS = 26 * 3600
+TERMINAL = {"completed", "failed", "expired", "cancelled"}
+
+
+def _as_dict(obj: Any) -> dict:
+    if isinstance(obj, dict):
+        return obj
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    return json.loads(json.dumps(obj, default=lambda o: vars(o)))
+
+
+def _read_jsonl(path: str) -> list[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# --------------------------------------------------------------------------- #
+#  Backends
+# --------------------------------------------------------------------------- #
+class OpenAIBatchBackend:
+    name = "openai"
+
+    def submit(self, input_path: str) -> str:
+        from client import _openai
+        openai = _openai()
+        with open(input_path, "rb") as f:
+            upload = openai.files.create(file=f, purpose="batch")
+        batch = openai.batches.create(input_file_id=upload.id, endpoint=BATCH_ENDPOINT,
+                                      completion_window=COMPLETION_WINDOW)
+        return batch.id
+
+    def poll(self, batch_id: str) -> tuple[str, list[str]]:
+        """Return (status, output/error file ids)."""
+        from client import _openai
+        batch = _openai().batches.retrieve(batch_id)
+        files = [f for f in (batch.output_file_id, batch.error_file_id) if f]
+        return batch.status, files
+
+    def results(self, file_id: str) -> list[dict]:
+        from client import _openai
+        text = _openai().files.content(file_id).text
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+class LocalBatchBackend:
+    name = "local"
+
+    def __init__(self, directory: str,
+                 complete: Optional[Callable[[dict], Any]] = None):
+        self.directory = directory
+        self.complete = complete
+
+    def _output_path(self, batch_id: str) -> str:
+        return os.path.join(self.directory, f"{batch_id}_output.jsonl")
+
+    def _complete(self, body: dict) -> Any:
+        if self.complete is not None:
+            return self.complete(body)
+        from client import _call_llm
+        from scheduler import BACKGROUND, request_priority
+        with request_priority(BACKGROUND):
+            return _call_llm(body, "auto_loop")
+
+    def submit(self, input_path: str) -> str:
+        batch_id = f"local_{uuid.uuid4().hex[:12]}"
+        out = []
+        for n, line in enumerate(_read_jsonl(input_path)):
+            entry = {"id": f"req_{n}", "custom_id": line["custom_id"],
+                     "response": None, "error": None}
+            try:
+                body = _as_dict(self._complete(line["body"]))
+                entry["response"] = {"status_code": 200, "body": body}
+            except Exception as e:
+                entry["error"] = {"code": type(e).__name__, "message": str(e)}
+            out.append(entry)
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._output_path(batch_id), "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(e, ensure_ascii=False) + "\n" for e in out)
+        return batch_id
+
+    def poll(self, batch_id: str) -> tuple[str, list[str]]:
+        path = self._output_path(batch_id)
+        return ("completed", [path]) if os.path.exists(path) else ("failed", [])
+
+    def results(self, file_id: str) -> list[dict]:
+        return _read_jsonl(file_id)
+
+
+def backend_for(name: str, directory: str):
+    if name == "local":
+        return LocalBatchBackend(directory)
+    return OpenAIBatchBackend()
+
+
+# --------------------------------------------------------------------------- #
+#  Batch state (batches.json)
+# --------------------------------------------------------------------------- #
+def pending_batches(state_path: str) -> dict[str, dict]:
+    with locked(state_path, shared=True):
+        return read_json(state_path, {})
+
+
+def _update_state(state_path: str, batch_id: str, record: Optional[dict]) -> None:
+    with locked(state_path):
+        state = read_json(state_path, {})
+        if record is None:
+            state.pop(batch_id, None)
+        else:
+            state[batch_id] = record
+        write_json_atomic(state_path, state)
+
+
+def _release(task_path: str, task_ids: Iterable[str], owner: str) -> None:
+    for task_id in set(task_ids):
+        task_queue.release_task(task_path, task_id, owner)
+
+
+# --------------------------------------------------------------------------- #
+#  Submit / collect
+# --------------------------------------------------------------------------- #
+def submit_batch(task_path: str, state_path: str, journal_dir: str, backend,
+                 context: Optional[str] = None,
+                 knowledge_for: Optional[Callable[[str], Optional[str]]] = None,
+                 input_dir: Optional[str] = None) -> Optional[dict]:
+    """Submit the current step of every runnable task; None if there is none."""
+    from client import functions_for, request_body
+    from journal import TaskJournal, prompt_hash
+    from rule_engine import check_step, format_violations
+    from tool_selection import step_text, step_tools
+
+    owner = f"batch:{uuid.uuid4().hex[:12]}"
+    tasks = task_queue.claim_runnable(task_path, owner, BATCH_LEASE_SECONDS)
+    lines, items = [], {}
+    for task in tasks:
+        idx = task.get("current_step", 0)
+        steps = task.get("steps", [])
+        text = step_text(steps[idx])
+        violations = check_step(text)
+        if violations:
+            logging.error(f"{task['id']} step {idx+1} not batched: {format_violations(violations)}")
+            task_queue.release_task(task_path, task["id"], owner)
+            continue
+        prompt = task_queue.step_prompt(task, idx, text)
+        knowledge = knowledge_for(task["id"]) if knowledge_for else None
+        functions = functions_for(text, context, knowledge, (), step_tools(steps[idx]), steps)
+        phash = prompt_hash(task["id"], idx, prompt)
+        custom_id = f"{len(lines)}:{task['id']}"
+        items[custom_id] = {"task": task["id"], "step": idx, "hash": phash}
+        lines.append({"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT,
+                      "body": request_body(prompt, context, functions, knowledge)})
+        TaskJournal(journal_dir, task["id"]).record_prompt(idx, phash)
+    if not lines:
+        return None
+
+    input_dir = input_dir or os.path.dirname(os.path.abspath(state_path))
+    os.makedirs(input_dir, exist_ok=True)
+    input_path = os.path.join(input_dir, f"{owner.split(':')[1]}_input.jsonl")
+    with open(input_path, "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(line, ensure_ascii=False) + "\n" for line in lines)
+    try:
+        batch_id = backend.submit(input_path)
+    except Exception:
+        _release(task_path, (i["task"] for i in items.values()), owner)
+        raise
+
+    record = {"id": batch_id, "backend": backend.name, "owner": owner,
+              "input": input_path, "items": items, "submitted": time.time()}
+    _update_state(state_path, batch_id, record)
+    metrics.record("batch", op="submit", backend=backend.name, requests=len(lines))
+    logging.info(f"Batch {batch_id}: submitted {len(lines)} steps")
+    return record
+
+
+def collect_batch(batch_id: str, task_path: str, state_path: str, journal_dir: str,
+                  backend, interval: float = 60.0,
+                  timeout: Optional[float] = None) -> Optional[dict]:
+    """Wait for a batch and journal its replies; None if still running at `timeout`."""
+    from client import _usage
+    from journal import TaskJournal
+
+    record = pending_batches(state_path).get(batch_id)
+    if record is None:
+        raise KeyError(f"unknown batch '{batch_id}'")
+    started = time.monotonic()
+    while True:
+        status, files = backend.poll(batch_id)
+        if status in TERMINAL:
+            break
+        if timeout is not None and time.monotonic() - started >= timeout:
+            return None
+        logging.info(f"Batch {batch_id}: {status}; polling again in {interval:g}s")
+        time.sleep(interval)
+
+    items = record["items"]
+    answered = failed = 0
+    for file_id in files:
+        for line in backend.results(file_id):
+            item = items.get(line.get("custom_id"))
+            if item is None:
+                continue
+            response = line.get("response") or {}
+            body = response.get("body")
+            if line.get("error") or response.get("status_code") != 200 or not body:
+                logging.warning(f"Batch {batch_id}: {item['task']} step {item['step']+1} "
+                                f"failed: {line.get('error') or response.get('status_code')}")
+                failed += 1
+                continue
+            TaskJournal(journal_dir, item["task"]).record_response(
+                item["step"], item["hash"], body["choices"][0]["message"])
+            metrics.record("llm_call", phase="batch", model=body.get("model"), **_usage(body))
+            answered += 1
+
+    # Unanswered steps simply run interactively on the next auto-loop tick
+    _release(task_path, (i["task"] for i in items.values()), record["owner"])
+    _update_state(state_path, batch_id, None)
+    metrics.record("batch", op="collect", backend=record["backend"], status=status,
+                   answered=answered, failed=failed,
+                   latency_s=round(time.time() - record["submitted"], 1))
+    return {"status": status, "requests": len(items), "answered": answered, "failed": failed}
@@ -0,0 +1,192 @@
+# blob_store.py
+"""
+Content-addressed storage for large session-memory messages.
+
+Tool results (whole files, listings, diffs) used to be copied into the
+session file verbatim and re-serialised on every append.  Now any message
+whose content exceeds INLINE_LIMIT characters is stored once as
+<session dir>/blobs/<sha256[:2]>/<sha256>, and the session keeps a stub:
+
+    {"role": "tool", "content": "<preview>\n… [blob 3fa1c2d4e5b6: 48213 chars]",
+     "blob": {"sha256": "...", "size": 48213, "preview": "..."}}
+
+Stubs are expanded lazily: `expand_cited()` restores only the messages that a
+later prompt or message cites (by tool result ref "[r4821-3]" or blob
+prefix).  This only shapes the session memory as loaded: client.py does not
+send that memory to the OpenAI API.  `collect_garbage()` deletes blobs no
+live session file references any more: sessions of exited processes are
+pruned first, and session files untouched for SESSION_TTL_SECONDS
+(JAIME_SESSION_TTL_DAYS, default 7) no longer keep blobs alive.  A grace period protects blobs written just before
+their stub is appended.
+"""
+
+from __future__ import annotations
+
+import glob
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from file_lock import locked, read_json
+
+# None: "blobs" under handlers.append_json.SESSION_DIR, resolved on each use
+BLOB_DIR: Optional[str] = None
+
+INLINE_LIMIT = int(os.getenv("JAIME_BLOB_THRESHOLD", "4096"))
+PREVIEW_CHARS = 240
+GC_GRACE_SECONDS = 3600
+SESSION_TTL_SECONDS = float(os.getenv("JAIME_SESSION_TTL_DAYS", "7")) * 86400
+
+_CITATION = re.compile(r"\[(r\d+(?:-\d+)?)\]|\bblob ([0-9a-f]{12})\b")
+
+
+def _blob_dir(blob_dir: Optional[str]) -> str:
+    if blob_dir or BLOB_DIR:
+        return blob_dir or BLOB_DIR
+    from handlers.append_json import SESSION_DIR
+    return os.path.join(SESSION_DIR, "blobs")
+
+
+def _path(digest: str, blob_dir: str) -> str:
+    return os.path.join(blob_dir, digest[:2], digest)
+
+
+def put(text: str, blob_dir: Optional[str] = None) -> str:
+    """Store `text` (once) and return its sha256."""
+    blob_dir = _blob_dir(blob_dir)
+    data = text.encode("utf-8")
+    digest = hashlib.sha256(data).hexdigest()
+    path = _path(digest, blob_dir)
+    with locked(blob_dir, shared=True):
+        if os.path.exists(path):
+            os.utime(path)  # fresh mtime keeps it inside the GC grace period
+            return digest
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+    return digest
+
+
+def get(digest: str, blob_dir: Optional[str] = None) -> Optional[str]:
+    """Return a blob's text, or None if it is gone."""
+    blob_dir = _blob_dir(blob_dir)
+    try:
+        with open(_path(digest, blob_dir), "r", encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+# --------------------------------------------------------------------------- #
+#  Message stubs
+# --------------------------------------------------------------------------- #
+def externalize(message: Dict[str, Any], limit: int = INLINE_LIMIT,
+                blob_dir: Optional[str] = None) -> Dict[str, Any]:
+    """Return `message` with oversized content moved to the blob store."""
+    content = message.get("content")
+    if not isinstance(content, str) or len(content) <= limit or message.get("blob"):
+        return message
+    digest = put(content, blob_dir)
+    preview = content[:PREVIEW_CHARS]
+    return {
+        **message,
+        "content": f"{preview}\n… [blob {digest[:12]}: {len(content)} chars]",
+        "blob": {"sha256": digest, "size": len(content), "preview": preview},
+    }
+
+
+def expand(message: Dict[str, Any], blob_dir: Optional[str] = None) -> Dict[str, Any]:
+    """Return `message` with its full content restored (stub kept if the blob is gone)."""
+    blob = message.get("blob")
+    if not blob:
+        return message
+    text = get(blob["sha256"], blob_dir)
+    if text is None:
+        logging.warning(f"blob {blob['sha256'][:12]} missing; keeping preview")
+        return message
+    restored = {k: v for k, v in message.items() if k != "blob"}
+    restored["content"] = text
+    return restored
+
+
+def expand_cited(messages: List[Dict[str, Any]], text: str = "",
+                 blob_dir: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Expand only the stubs that `text` or another message cites."""
+    if not any(m.get("blob") for m in messages):
+        return messages
+    sources = [text] + [m["content"] for m in messages
+                        if isinstance(m.get("content"), str) and not m.get("blob")]
+    cited = {ref or prefix for s in sources for ref, prefix in _CITATION.findall(s)}
+    return [expand(m, blob_dir) if m.get("blob") and (
+                m.get("result_ref") in cited or m["blob"]["sha256"][:12] in cited)
+            else m for m in messages]
+
+
+# --------------------------------------------------------------------------- #
+#  Garbage collection
+# --------------------------------------------------------------------------- #
+def referenced(session_files: Iterable[str]) -> set[str]:
+    """Digests referenced by the given session files."""
+    refs: set[str] = set()
+    for path in session_files:
+        with locked(path, shared=True):
+            data = read_json(path, [])
+        for message in data if isinstance(data, list) else []:
+            blob = message.get("blob") if isinstance(message, dict) else None
+            if blob and blob.get("sha256"):
+                refs.add(blob["sha256"])
+    return refs
+
+
+def live_sessions(session_dir: str, ttl: float = SESSION_TTL_SECONDS) -> list[str]:
+    """Session files modified within `ttl` seconds (exited processes' are pruned)."""
+    from handlers.append_json import prune_sessions
+    prune_sessions(session_dir)
+    cutoff = time.time() - ttl
+    live = []
+    for path in glob.glob(os.path.join(session_dir, "*.json")):
+        try:
+            if os.stat(path).st_mtime >= cutoff:
+                live.append(path)
+        except FileNotFoundError:
+            pass
+    return live
+
+
+def collect_garbage(session_dir: str, blob_dir: Optional[str] = None,
+                    grace: float = GC_GRACE_SECONDS,
+                    ttl: float = SESSION_TTL_SECONDS) -> int:
+    """Delete blobs no live session references, older than `grace` seconds."""
+    blob_dir = _blob_dir(blob_dir)
+    if not os.path.isdir(blob_dir):
+        return 0
+    removed = 0
+    with locked(blob_dir):
+        keep = referenced(live_sessions(session_dir, ttl))
+        cutoff = time.time() - grace
+        for path in glob.glob(os.path.join(blob_dir, "??", "*")):
+            name = os.path.basename(path)
+            if name in keep or name.startswith(".tmp-"):
+                continue
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+    if removed:
+        logging.info(f"blob store: removed {removed} unreferenced blobs")
+    return removed
@@ -1,90 +1,283 @@
 # client.py
 import os
 import json
-import openai
-import requests
+import time
+import hashlib
 import logging
 from typing import List, Dict, Any, Optional
 
-from config import OPENAI_API_KEY, MODEL_NAME, LLM_PROVIDER
+import metrics
+from scheduler import scheduler_for
+from model_router import Target, route_for
+from config import (MODEL_NAME, LLM_PROVIDER, STABLE_TOOLS,
+                    CACHE_MIN_PREFIX_CHARS, require_api_key)
 from prevalidations import PREVALIDATIONS
+from rule_engine import check_step, format_violations
 from function_schema import FUNCTIONS
-from handlers.dispatch import dispatch_function
-from handlers.append_json import append_json
+from tool_selection import select_functions, task_functions
+from handlers.dispatch import dispatch
+from tool_cache import reference_text
+from handlers.append_json import append_json, load_messages, reset_messages
+from blob_store import expand_cited
 
 # --------------------------------------------------------------------------- #
-#  LLM setup: choose provider based on config flag
+#  LLM setup: the SDKs are imported on first use so that non-LLM CLI modes
+#  never pay for loading them
 # --------------------------------------------------------------------------- #
-openai.api_key = OPENAI_API_KEY
+def _openai():
+    """Import the OpenAI SDK lazily and configure the API key once."""
+    import openai
+    if not openai.api_key:
+        openai.api_key = require_api_key()
+    return openai
+
+_chat = None
+
+def _chat_client():
+    """OpenAI client for chat requests with the SDK's own retries disabled.
+
+    The scheduler is the only retry layer, so every 429 reaches its AIMD
+    limiter and token accounting.
+    """
+    global _chat
+    if _chat is None:
+        import openai
+        _chat = openai.OpenAI(api_key=require_api_key(), max_retries=0)
+    return _chat
+
+_http = None
+
+def _http_session():
+    """Pooled HTTP session for OpenAI-compatible endpoints (kept warm by --serve)."""
+    global _http
+    if _http is None:
+        import requests
+        _http = requests.Session()
+    return _http
 
 # --------------------------------------------------------------------------- #
-#  Session-memory helpers
+#  Session-memory helpers (one file per session, see handlers/append_json.py)
 # --------------------------------------------------------------------------- #
-SESSION_PATH = os.path.join(os.path.dirname(__file__), "session_memory.json")
-
-def _reset_session_file() -> None:
-    """Overwrite session_memory.json with an empty list (clean start)."""
-    with open(SESSION_PATH, "w", encoding="utf-8") as f:
-        json.dump([], f)
+def reset_session() -> None:
+    """Start this session's memory file empty (clean start).
 
-# Clear memory *immediately at import time*
-_reset_session_file()
+    Called by the CLI when an LLM run begins; importing this module does not
+    touch any file, and other processes' sessions are never reset.  A named
+    session (JAIME_SESSION_ID) is shared between processes and left intact.
+    """
+    if not os.getenv("JAIME_SESSION_ID"):
+        reset_messages()
 
-def _ensure_session_file() -> None:
-    """Create an empty list file if it does not yet exist."""
-    if not os.path.exists(SESSION_PATH):
-        with open(SESSION_PATH, "w", encoding="utf-8") as f:
-            json.dump([], f)
+def load_session_messages(prompt: str = "") -> List[Dict[str, Any]]:
+    """Return the flat list of memory messages (may be empty).
 
-def load_session_messages() -> List[Dict[str, Any]]:
-    """Return the flat list of memory messages (may be empty)."""
-    _ensure_session_file()
-    try:
-        with open(SESSION_PATH, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return data if isinstance(data, list) else []
-    except Exception:
-        return []
+    Large results stay as blob stubs unless `prompt` or a later message cites
+    them.
+    """
+    return expand_cited(load_messages(), prompt)
 
 # --------------------------------------------------------------------------- #
 #  Helper to call the chosen LLM
 # --------------------------------------------------------------------------- #
-def _call_llm(payload: Dict[str, Any]) -> Any:
-    """Route to DeepSeek locally—or on failure, log and fall back to OpenAI."""
-    if LLM_PROVIDER == "deepseek":
+def _estimate_tokens(payload: Dict[str, Any]) -> int:
+    """Rough request size for the tokens/min budget (~4 chars per token)."""
+    chars = len(json.dumps(payload.get("messages", []), default=str))
+    chars += len(json.dumps(payload.get("functions", [])))
+    return chars // 4 + int(payload.get("max_tokens") or 512)
+
+def _total_tokens(resp: Any) -> Optional[int]:
+    usage = _usage(resp)
+    return (usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0)) or None
+
+def _send_openai(payload: Dict[str, Any], timeout: Optional[float] = None):
+    """One OpenAI request; returns (completion, response headers)."""
+    raw = _chat_client().chat.completions.with_raw_response.create(**payload, timeout=timeout)
+    return raw.parse(), raw.headers
+
+def _send_deepseek(url: str, payload: Dict[str, Any], timeout: float = 5):
+    resp = _http_session().post(url, json=payload, timeout=timeout)
+    resp.raise_for_status()
+    return resp.json(), resp.headers
+
+def _send(target: Target, payload: Dict[str, Any]):
+    if target.provider == "deepseek":
         url = os.getenv("DEESEEK_URL", "http://localhost:8000/v1/chat/completions")
+        return _send_deepseek(url, payload, target.timeout)
+    # OpenAI must not receive `memory` as a kwarg
+    payload = {k: v for k, v in payload.items() if k != "memory"}
+    return _send_openai(payload, target.timeout)
+
+def _route_call(payload: Dict[str, Any], phase: str):
+    """Walk the phase's fallback chain; returns (response, target, fallbacks used).
+
+    Requests go through the per-provider rate-limit scheduler, which queues
+    them by priority and retries 429s/5xx with backoff.  Targets with a
+    fallback after them get a single retry so the chain moves on quickly.
+    """
+    route = route_for(phase)
+    est = _estimate_tokens(payload)
+    for n, target in enumerate(route.targets):
+        last = n == len(route.targets) - 1
+        body = {**payload, "model": target.model}
         try:
-            resp = requests.post(url, json=payload, timeout=5)
-            resp.raise_for_status()
-            return resp.json()
-        except requests.exceptions.RequestException as e:
-            logging.warning(f"DeepSeek endpoint unreachable ({e}); falling back to OpenAI")
-            # Prepare a clean payload for OpenAI
-            payload_copy = payload.copy()
-            payload_copy.pop("memory", None)
-            return openai.chat.completions.create(**payload_copy)
-    else:
-        # OpenAI path also must not receive `memory` as a kwarg
-        payload_copy = payload.copy()
-        payload_copy.pop("memory", None)
-        return openai.chat.completions.create(**payload_copy)
+            resp = scheduler_for(target.provider).call(
+                lambda: _send(target, body), est, _total_tokens,
+                **({} if last else {"max_retries": 1}))
+            return resp, target, n
+        except Exception as e:
+            if last:
+                raise
+            logging.warning(f"{route.name}: {target} failed ({type(e).__name__}: {e}); "
+                            f"falling back to {route.targets[n + 1]}")
+            metrics.record("llm_fallback", route=route.name, target=str(target),
+                           error=type(e).__name__)
+
+def _call_llm(payload: Dict[str, Any], phase: str = "default") -> Any:
+    """Send a chat-completions payload along the route for `phase`."""
+    return _route_call(payload, phase)[0]
+
+def _usage(resp: Any) -> Dict[str, int]:
+    """Extract token usage from an SDK object or a raw JSON dict."""
+    usage = resp.get("usage") if isinstance(resp, dict) else getattr(resp, "usage", None)
+    if usage is None:
+        return {}
+    if not isinstance(usage, dict):
+        usage = usage.model_dump() if hasattr(usage, "model_dump") else vars(usage)
+    out = {k: usage[k] for k in ("prompt_tokens", "completion_tokens")
+           if isinstance(usage.get(k), int)}
+    details = usage.get("prompt_tokens_details") or {}
+    if not isinstance(details, dict):
+        details = details.model_dump() if hasattr(details, "model_dump") else vars(details)
+    if isinstance(details.get("cached_tokens"), int):
+        out["cached_tokens"] = details["cached_tokens"]
+    return out
+
+def _prefix_hash(payload: Dict[str, Any]) -> str:
+    """Hash of everything before the first non-static message (tools first)."""
+    h = hashlib.sha1(json.dumps(payload.get("functions", []), sort_keys=True).encode())
+    for m in payload["messages"]:
+        if not m.get("static"):
+            break
+        h.update(m["content"].encode("utf-8"))
+    return h.hexdigest()[:12]
+
+def _wire_messages(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Drop the local `static` markers before a payload leaves the process."""
+    return [{k: v for k, v in m.items() if k != "static"} for m in messages]
+
+def _timed_call(payload: Dict[str, Any], phase: str) -> Any:
+    """Call the LLM and record latency, token and tool-payload metrics."""
+    functions = payload.get("functions", [])
+    schema_bytes = len(json.dumps(functions))
+    prefix = _prefix_hash(payload)
+    payload = {**payload, "messages": _wire_messages(payload["messages"])}
+    started = time.perf_counter()
+    resp, target, fallbacks = _route_call(payload, phase)
+    metrics.record(
+        "llm_call",
+        phase=phase,
+        route=route_for(phase).name,
+        provider=target.provider,
+        model=target.model,
+        fallbacks=fallbacks,
+        prefix=prefix,
+        latency_ms=round((time.perf_counter() - started) * 1000, 1),
+        tools_sent=len(functions),
+        tools_available=len(FUNCTIONS),
+        tool_schema_bytes=schema_bytes,
+        tool_schema_bytes_saved=len(json.dumps(FUNCTIONS)) - schema_bytes,
+        **_usage(resp),
+    )
+    return resp
+
+def _attach_functions(payload: Dict[str, Any], functions: List[Dict[str, Any]]) -> None:
+    """Add the tool list to a payload (omitted entirely when empty)."""
+    if functions:
+        payload["functions"] = functions
+        payload["function_call"] = "auto"
 
 # --------------------------------------------------------------------------- #
-#  Low-level call that adds memory but does **not** execute function calls
+#  Prompt layout: static prefix first, variable content last
 # --------------------------------------------------------------------------- #
-def handle_prompt_raw(prompt: str, context: Optional[str] = None):
-    """Send one prompt to the LLM, log the exchange in memory, return the reply."""
-    memory: List[Dict[str, Any]] = load_session_messages()
+def static_messages(context: Optional[str] = None,
+                    knowledge: Optional[str] = None) -> List[Dict[str, Any]]:
+    """System messages that stay byte-identical between steps.
 
-    # ----- build per-turn messages ---------------------------------------- #
+    Order is fixed: validation rules → knowledge bundle → context file, so
+    provider-side prompt caching can reuse the prefix.  The `static` marker is
+    stripped before sending.
+    """
     messages: List[Dict[str, Any]] = []
     if PREVALIDATIONS:
         messages.append({
             "role": "system",
             "content": f"VALIDATION RULES:\n{json.dumps(PREVALIDATIONS)}",
+            "static": True,
         })
+    if knowledge:
+        messages.append({"role": "system", "content": f"REFERENCE KNOWLEDGE:\n{knowledge}",
+                         "static": True})
     if context:
-        messages.append({"role": "system", "content": context})
+        messages.append({"role": "system", "content": context, "static": True})
+    return messages
+
+def functions_for(text: str, context: Optional[str] = None,
+                  knowledge: Optional[str] = None, history=(),
+                  override: Optional[List[str]] = None,
+                  steps: Optional[List[Any]] = None) -> List[Dict[str, Any]]:
+    """Pick the tools for a step, keeping them stable when the prefix is cacheable.
+
+    Within a task (`steps` given) the stable list is the union of its steps'
+    tools; only a lone prompt falls back to the full list.
+    """
+    if STABLE_TOOLS == "always":
+        stable = True
+    elif STABLE_TOOLS == "never":
+        stable = False
+    else:
+        size = sum(len(m["content"]) for m in static_messages(context, knowledge))
+        stable = size >= CACHE_MIN_PREFIX_CHARS
+    if stable and override is None and steps:
+        return task_functions(steps)
+    return select_functions(text, history, override, stable=stable)
+
+def request_body(prompt: str, context: Optional[str] = None,
+                 functions: Optional[List[Dict[str, Any]]] = None,
+                 knowledge: Optional[str] = None) -> Dict[str, Any]:
+    """Chat-completions body for one stateless step (used by batch mode).
+
+    Same prefix layout as handle_prompt_raw, but without session memory; the
+    model is the auto_loop route's OpenAI target.
+    """
+    if functions is None:
+        functions = functions_for(prompt, context, knowledge)
+    route = route_for("auto_loop")
+    model = next((t.model for t in route.targets if t.provider == "openai"), MODEL_NAME)
+    payload: Dict[str, Any] = {
+        "model": model,
+        "messages": _wire_messages(static_messages(context, knowledge)
+                                   + [{"role": "user", "content": prompt}]),
+    }
+    _attach_functions(payload, functions)
+    return payload
+
+# --------------------------------------------------------------------------- #
+#  Low-level call that adds memory but does **not** execute function calls
+# --------------------------------------------------------------------------- #
+def handle_prompt_raw(prompt: str, context: Optional[str] = None,
+                      functions: Optional[List[Dict[str, Any]]] = None,
+                      phase: str = "prompt", knowledge: Optional[str] = None):
+    """Send one prompt to the LLM, log the exchange in memory, return the reply.
+
+    `functions` defaults to functions_for(prompt); `knowledge` is placed in
+    the static prefix rather than in the user message.
+    """
+    if functions is None:
+        functions = functions_for(prompt, context, knowledge)
+    memory: List[Dict[str, Any]] = load_session_messages(prompt)
+
+    # ----- build per-turn messages ---------------------------------------- #
+    messages = static_messages(context, knowledge)
 
     user_msg = {"role": "user", "content": prompt}
     messages.append(user_msg)
@@ -96,14 +289,13 @@ def handle_prompt_raw(prompt: str, context: Optional[str] = None):
     payload = {
         "model": MODEL_NAME,
         "messages": messages,
-        "functions": FUNCTIONS,
-        "function_call": "auto"
     }
+    _attach_functions(payload, functions)
     # include memory only for OpenAI provider (DeepSeek may ignore)
     if LLM_PROVIDER != "deepseek":
         payload["memory"] = memory
 
-    resp = _call_llm(payload)
+    resp = _timed_call(payload, phase)
 
     # Persist assistant reply (or tool call) in memory
     if isinstance(resp, dict):
@@ -126,23 +318,48 @@ def handle_prompt_raw(prompt: str, context: Optional[str] = None):
 
     return reply
 
+def complete(messages: List[Dict[str, Any]], phase: str) -> str:
+    """One stateless completion on `phase`'s route (no memory, no tools).
+
+    Returns "" when the model sent no content; callers must not treat that
+    as a result.
+    """
+    resp = _timed_call({"model": MODEL_NAME, "messages": messages}, phase)
+    msg = resp["choices"][0]["message"] if isinstance(resp, dict) else resp.choices[0].message
+    return (msg.get("content") if isinstance(msg, dict) else msg.content) or ""
+
 # --------------------------------------------------------------------------- #
 #  High-level helper: validate, then execute any function calls
 # --------------------------------------------------------------------------- #
-def handle_prompt(prompt: str, context: Optional[str] = None) -> str:
-    """Run a two-phase cycle: validation → execution (if any)."""
+def handle_prompt(prompt: str, context: Optional[str] = None,
+                  functions: Optional[List[Dict[str, Any]]] = None,
+                  knowledge: Optional[str] = None) -> str:
+    """Run a two-phase cycle: validation → execution (if any).
+
+    Mechanical rules are checked locally first; the LLM validation phase only
+    runs when judgment rules (PREVALIDATIONS) exist.
+    """
+    violations = check_step(prompt)
+    if violations:
+        return format_violations(violations)
+    if functions is None:
+        functions = functions_for(prompt, context, knowledge)
+
+    # Phase 2 reuses the same static prefix; validation output goes after it.
+    exec_messages = static_messages(context, knowledge)
+
     # Phase 1 – validation
-    val_msg = handle_prompt_raw(prompt, context)
-    val_text = (val_msg.get("content") if isinstance(val_msg, dict)
-                else val_msg.content or "")
+    if PREVALIDATIONS:
+        val_msg = handle_prompt_raw(prompt, context, functions, phase="validation",
+                                    knowledge=knowledge)
+        val_text = (val_msg.get("content") if isinstance(val_msg, dict)
+                    else val_msg.content or "")
+        exec_messages.append(
+            {"role": "system", "content": f"VALIDATION RESULTS:\n{val_text}"}
+        )
 
     # Phase 2 – execution
-    memory = load_session_messages()
-    exec_messages: List[Dict[str, Any]] = [
-        {"role": "system", "content": f"VALIDATION RESULTS:\n{val_text}"}
-    ]
-    if context:
-        exec_messages.append({"role": "system", "content": context})
+    memory = load_session_messages(prompt)
 
     user_msg = {"role": "user", "content": prompt}
     exec_messages.append(user_msg)
@@ -151,13 +368,12 @@ def handle_prompt(prompt: str, context: Optional[str] = None) -> str:
     payload = {
         "model": MODEL_NAME,
         "messages": exec_messages,
-        "functions": FUNCTIONS,
-        "function_call": "auto"
     }
+    _attach_functions(payload, functions)
     if LLM_PROVIDER != "deepseek":
         payload["memory"] = memory
 
-    exec_resp = _call_llm(payload)
+    exec_resp = _timed_call(payload, "execution")
 
     if isinstance(exec_resp, dict):
         msg = exec_resp["choices"][0]["message"]
@@ -178,21 +394,21 @@ def handle_prompt(prompt: str, context: Optional[str] = None) -> str:
     function_call = (msg.get("function_call") if isinstance(msg, dict)
                      else getattr(msg, "function_call", None))
     if function_call:
-        result = dispatch_function(function_call)
-        append_json({
+        outcome = dispatch(function_call)
+        name = (function_call.get("name") if isinstance(function_call, dict)
+                else getattr(function_call, "name", None))
+        tool_msg = {
             "role": "tool",
             "tool_call_id": (function_call.get("id") if isinstance(function_call, dict)
                              else getattr(function_call, "id", None)),
-            "content": result,
-        })
-        return result
+            # A cache hit points back at the earlier message instead of repeating it
+            "content": (reference_text(name, outcome.ref) if outcome.cached
+                        else outcome.text),
+        }
+        if outcome.ref:
+            tool_msg["result_ref"] = outcome.ref
+        append_json(tool_msg)
+        return outcome.text
 
     return (msg.get("content") if isinstance(msg, dict)
             else msg.content or "No action taken")
-import glob
-
-knowledge_files = glob.glob('./knowledge/*.txt')
-for file in knowledge_files:
-    with open(file, 'r') as f:
-        knowledge = f.read()
-        # Process knowledge as needed
@@ -0,0 +1,613 @@
+# code_index.py
+"""
+Persistent trigram index for fast code search (the search_code tool).
+
+Every indexed file contributes the set of byte trigrams of its lower-cased
+content.  SQLite tables under CACHE_DIR/code_index/ hold the index:
+
+    files     (id, path, mtime_ns, size, indexed)  indexed = 0 for binary/huge
+    postings  (tri, seg, ids)                       ids = files containing tri
+    meta      change-feed stamps, time of the last full sweep
+
+A query is reduced to the literal runs every match must contain; the
+postings of their trigrams are intersected to get a few candidate files,
+and only those are read and matched line by line.  A query without a
+literal of three or more characters scans every indexed file.
+
+`refresh()` is driven by a change feed rather than a full scan: it stats
+only the directories, .gitignore files and .git/index (adding, removing or
+renaming a file changes its directory's mtime).  Only when one of those
+changed is that subtree listed again (git ls-files when available,
+otherwise a walk that honours .gitignore files), and only new files and
+those directly in a changed directory stat'ed.  Files the agent writes are reported through
+`notify()`; in-place edits by other programs are picked up by a background
+sweep every SWEEP_SECONDS.  Matching always reads the candidate files
+themselves, so a stale entry can only hide a match, never invent one.
+
+Posting rows are never rewritten whole on the hot path.  A large (re)build
+writes each batch of postings as a new segment and merges the segments in
+one pass at the end; small updates go to a tail segment, and a re-indexed
+file gets a new id, leaving the old id dangling until a compaction (run by
+the sweep once the tail or the dead ids grow too large) drops it.
+Binary files and files over MAX_FILE_BYTES are not indexed.
+"""
+
+from __future__ import annotations
+
+import fnmatch
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import subprocess
+import threading
+import time
+from array import array
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+from config import CACHE_DIR
+
+try:
+    from re import _parser as _sre  # Python 3.11+
+except ImportError:  # pragma: no cover
+    import sre_parse as _sre
+
+INDEX_DIR = os.path.join(CACHE_DIR, "code_index")
+MAX_FILE_BYTES = 1_000_000
+SNIFF_BYTES = 1024
+BATCH_FILES = 2000
+# Bound on "?" per statement; old SQLite builds allow only 999
+SQL_VARIABLES = 900
+# Full re-stat for in-place edits the change feed cannot see
+SWEEP_SECONDS = 60.0
+SKIP_DIRS = {".git", ".hg", ".svn"}
+
+
+class Match(NamedTuple):
+    path: str           # relative to the index root
+    line: int           # 1-based
+    text: str
+    before: list        # context lines preceding the match
+    after: list         # context lines following the match
+
+
+# --------------------------------------------------------------------------- #
+#  Trigrams
+# --------------------------------------------------------------------------- #
+def trigrams(data: bytes) -> set[int]:
+    """Distinct lower-cased byte trigrams of `data`, packed into ints."""
+    data = data.lower()
+    grams = {data[i:i + 3] for i in range(len(data) - 2)}
+    return {int.from_bytes(g, "big") for g in grams}
+
+
+def required_literals(pattern: str) -> list[str]:
+    """Literal runs that every match of the regex `pattern` must contain."""
+    try:
+        parsed = _sre.parse(pattern)
+    except re.error:
+        return []
+    runs: list[str] = []
+
+    def walk(items) -> None:
+        current = ""
+        for op, av in items:
+            if op is _sre.LITERAL:
+                current += chr(av)
+                continue
+            if current:
+                runs.append(current)
+                current = ""
+            if op is _sre.SUBPATTERN:
+                walk(av[-1])
+            elif op in (_sre.MAX_REPEAT, _sre.MIN_REPEAT) and av[0] >= 1:
+                walk(av[2])
+        if current:
+            runs.append(current)
+
+    walk(parsed)
+    return runs
+
+
+def _pack(ids: Iterable[int]) -> bytes:
+    return array("I", sorted(ids)).tobytes()
+
+
+def _unpack(blob: Optional[bytes]) -> array:
+    out = array("I")
+    if blob:
+        out.frombytes(blob)
+    return out
+
+
+# --------------------------------------------------------------------------- #
+#  Listing files (.gitignore aware)
+# --------------------------------------------------------------------------- #
+def _ignore_regex(pattern: str, base: str) -> Optional[tuple[re.Pattern, bool, bool]]:
+    """Compile one .gitignore line into (regex, negated, dir_only)."""
+    pattern = pattern.rstrip()
+    if not pattern or pattern.startswith("#"):
+        return None
+    negated = pattern.startswith("!")
+    pattern = pattern[1:] if negated else pattern
+    dir_only = pattern.endswith("/")
+    pattern = pattern.rstrip("/")
+    anchored = "/" in pattern
+    pattern = pattern.lstrip("/")
+    body = ""
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            body += "(?:.*/)?"
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == len(pattern):
+            body += "/.*"
+            i += 3
+        elif pattern[i] == "*":
+            body += ".*" if pattern.startswith("**", i) else "[^/]*"
+            i += 2 if pattern.startswith("**", i) else 1
+        elif pattern[i] == "?":
+            body += "[^/]"
+            i += 1
+        elif pattern[i] == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                body += re.escape(pattern[i])
+                i += 1
+            else:
+                body += fnmatch.translate(pattern[i:end + 1])[4:-3]
+                i = end + 1
+        else:
+            body += re.escape(pattern[i])
+            i += 1
+    prefix = re.escape(base + "/") if base else ""
+    regex = prefix + ("" if anchored else "(?:.*/)?") + body + "$"
+    return re.compile(regex), negated, dir_only
+
+
+def _ignored(rel: str, is_dir: bool, rules: list) -> bool:
+    ignored = False
+    for regex, negated, dir_only in rules:
+        if dir_only and not is_dir:
+            continue
+        if regex.match(rel):
+            ignored = not negated
+    return ignored
+
+
+def _walk(root: str) -> Iterator[str]:
+    """Yield root-relative file paths, skipping what .gitignore files exclude."""
+    rules_by_dir: dict[str, list] = {}
+    for current, dirs, files in os.walk(root):
+        rel_dir = os.path.relpath(current, root).replace(os.sep, "/")
+        rel_dir = "" if rel_dir == "." else rel_dir
+        parent = os.path.dirname(rel_dir) if rel_dir else None
+        rules = list(rules_by_dir.get(parent, [])) if parent is not None else []
+        try:
+            with open(os.path.join(current, ".gitignore"), "r", encoding="utf-8") as f:
+                rules += [r for r in (_ignore_regex(line, rel_dir) for line in f) if r]
+        except (OSError, UnicodeDecodeError):
+            pass
+        rules_by_dir[rel_dir] = rules
+
+        def rel(name: str) -> str:
+            return f"{rel_dir}/{name}" if rel_dir else name
+
+        dirs[:] = sorted(d for d in dirs
+                         if d not in SKIP_DIRS and not _ignored(rel(d), True, rules))
+        for name in sorted(files):
+            if not _ignored(rel(name), False, rules):
+                yield rel(name)
+
+
+def list_files(root: str, dirs: Optional[Iterable[str]] = None) -> list[str]:
+    """Root-relative paths of the files to index (only under `dirs` if given)."""
+    dirs = None if dirs is None else sorted(dirs)
+    if os.path.isdir(os.path.join(root, ".git")):
+        spec = ["--"] + [f":(literal){d}" for d in dirs] if dirs else []
+        try:
+            out = subprocess.run(
+                ["git", "ls-files", "-z", "--cached", "--others", "--exclude-standard"] + spec,
+                cwd=root, capture_output=True, check=True, timeout=60).stdout
+            return sorted({p for p in out.decode("utf-8", "surrogateescape").split("\0") if p})
+        except (OSError, subprocess.SubprocessError) as e:
+            logging.info(f"code index: git ls-files unavailable ({e}); walking {root}")
+    return [p for p in _walk(root) if dirs is None or _under(p, dirs)]
+
+
+def _under(rel: str, dirs: Iterable[str]) -> bool:
+    return any(rel.startswith(d + "/") for d in dirs)
+
+
+# --------------------------------------------------------------------------- #
+#  Index
+# --------------------------------------------------------------------------- #
+# Bumped whenever the tables change shape; an older index is rebuilt
+VERSION = 2
+# Segment of postings written by small incremental updates
+TAIL_SEG = -1
+MAX_TAIL_BYTES = 4_000_000
+# Compact once dangling ids of replaced files exceed this share of the index
+DEAD_RATIO = 0.25
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, path TEXT UNIQUE NOT NULL,
+    mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, indexed INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS postings (
+    tri INTEGER NOT NULL, seg INTEGER NOT NULL, ids BLOB NOT NULL,
+    PRIMARY KEY (tri, seg));
+"""
+
+Stamps = dict[str, tuple[int, int]]
+
+
+def _parents(rel: str) -> Iterator[str]:
+    """"" and every ancestor directory of a root-relative path."""
+    while rel:
+        rel = os.path.dirname(rel)
+        yield rel
+
+
+class CodeIndex:
+    def __init__(self, root: str, db_path: Optional[str] = None,
+                 poll_interval: float = 2.0, sweep_interval: float = SWEEP_SECONDS):
+        self.root = os.path.abspath(os.path.expanduser(root))
+        if db_path is None:
+            digest = hashlib.sha1(self.root.encode("utf-8")).hexdigest()[:16]
+            db_path = os.path.join(INDEX_DIR, f"{digest}.sqlite")
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db_path = db_path
+        self.poll_interval = poll_interval
+        self.sweep_interval = sweep_interval
+        self._refreshed_at = float("-inf")
+        self._dirty: set[str] = set()
+        self._sweeper: Optional[threading.Thread] = None
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        if self._db.execute("PRAGMA user_version").fetchone()[0] != VERSION:
+            self._db.executescript("DROP TABLE IF EXISTS meta; DROP TABLE IF EXISTS files; "
+                                   f"DROP TABLE IF EXISTS postings; PRAGMA user_version = {VERSION};")
+        self._db.executescript(_SCHEMA)
+
+    # ----- change feed ------------------------------------------------------ #
+    def _meta(self, key: str, default=None):
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def _set_meta(self, key: str, value) -> None:
+        self._db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, json.dumps(value)))
+
+    def _mtime(self, rel: str) -> int:
+        try:
+            return os.stat(os.path.join(self.root, rel)).st_mtime_ns
+        except OSError:
+            return -1
+
+    def _watch_list(self, paths: Iterable[str]) -> list[str]:
+        """What the change feed stats: every directory, ignore file and the git index."""
+        watched = {".git/index", ".git/info/exclude"}
+        for rel in paths:
+            watched.update(_parents(rel))
+            if os.path.basename(rel) == ".gitignore":
+                watched.add(rel)
+        return sorted(watched)
+
+    def notify(self, paths: Iterable[str]) -> None:
+        """Mark files written by this process for re-indexing on the next search."""
+        with self._lock:
+            for path in paths:
+                rel = os.path.relpath(os.path.abspath(path), self.root)
+                if not rel.startswith(".."):
+                    if os.path.isfile(path):
+                        self._dirty.add(rel.replace(os.sep, "/"))
+            self._refreshed_at = float("-inf")
+
+    # ----- incremental build ---------------------------------------------- #
+    def _grams(self, rel: str) -> Optional[set[int]]:
+        try:
+            with open(os.path.join(self.root, rel), "rb") as f:
+                data = f.read(MAX_FILE_BYTES + 1)
+        except OSError:
+            return None
+        if len(data) > MAX_FILE_BYTES or b"\0" in data[:SNIFF_BYTES]:
+            return None
+        return trigrams(data)
+
+    def _append(self, adds: dict[int, set[int]], seg: int) -> None:
+        """Write a bulk batch's postings as a new segment, without reading any."""
+        self._db.executemany("INSERT INTO postings VALUES (?, ?, ?)",
+                             ((tri, seg, _pack(ids)) for tri, ids in adds.items()))
+
+    def _add_to_tail(self, adds: dict[int, set[int]]) -> None:
+        """Merge a few files' postings into the small tail segment."""
+        for tri, ids in adds.items():
+            row = self._db.execute("SELECT ids FROM postings WHERE tri = ? AND seg = ?",
+                                   (tri, TAIL_SEG)).fetchone()
+            merged = _unpack(row[0] if row else None)
+            merged.extend(ids)
+            self._db.execute("INSERT OR REPLACE INTO postings VALUES (?, ?, ?)",
+                             (tri, TAIL_SEG, merged.tobytes()))
+
+    def _compact(self) -> None:
+        """Merge all segments into one row per trigram and drop dead ids, in one pass."""
+        live = {fid for (fid,) in self._db.execute("SELECT id FROM files")}
+        self._db.execute("CREATE TEMP TABLE merged (tri INTEGER PRIMARY KEY, ids BLOB NOT NULL)")
+
+        def merged() -> Iterator[tuple[int, bytes]]:
+            current, ids = None, array("I")
+            for tri, blob in self._db.execute("SELECT tri, ids FROM postings ORDER BY tri"):
+                if tri != current and current is not None:
+                    kept = [i for i in ids if i in live]
+                    if kept:
+                        yield current, _pack(kept)
+                    ids = array("I")
+                current = tri
+                ids.frombytes(blob)
+            kept = [i for i in ids if i in live]
+            if current is not None and kept:
+                yield current, _pack(kept)
+
+        self._db.executemany("INSERT INTO merged VALUES (?, ?)", merged())
+        self._db.execute("DELETE FROM postings")
+        self._db.execute("INSERT INTO postings SELECT tri, 0, ids FROM merged")
+        self._db.execute("DROP TABLE merged")
+        self._set_meta("dead", 0)
+
+    def _needs_compaction(self) -> bool:
+        files = self._db.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+        tail = self._db.execute("SELECT COALESCE(SUM(LENGTH(ids)), 0) FROM postings "
+                                "WHERE seg = ?", (TAIL_SEG,)).fetchone()[0]
+        return tail > MAX_TAIL_BYTES or self._meta("dead", 0) > max(files, 1000) * DEAD_RATIO
+
+    def _known(self, paths: set[str]) -> dict[str, tuple[int, int, int]]:
+        """Stored (id, mtime_ns, size) of those of `paths` that are indexed."""
+        query = "SELECT path, id, mtime_ns, size FROM files"
+        if len(paths) > BATCH_FILES:
+            rows = self._db.execute(query)
+        else:
+            rows = (row for p in paths
+                    for row in self._db.execute(query + " WHERE path = ?", (p,)))
+        return {path: (fid, mtime, size) for path, fid, mtime, size in rows if path in paths}
+
+    def _update(self, seen: Stamps, gone: Iterable[str] = ()) -> tuple[int, int]:
+        """Index the files in `seen` whose stamp changed and drop `gone` ones.
+
+        A missing file (stamp -1) is dropped too.  A changed file gets a new
+        id: the postings of the old one are left dangling (queries only see
+        ids still in `files`) until the next compaction, so no large posting
+        row is rewritten.  Returns (updated, removed).
+        """
+        gone = set(gone) | {p for p, stamp in seen.items() if stamp[0] < 0}
+        known = self._known(gone | set(seen))
+        changed = [p for p, stamp in seen.items()
+                   if stamp[0] >= 0 and (p not in known or known[p][1:] != stamp)]
+        removed = [p for p in gone if p in known]
+        if not changed and not removed:
+            return 0, 0
+        bulk = len(changed) > BATCH_FILES
+        seg = self._db.execute("SELECT COALESCE(MAX(seg), 0) + 1 FROM postings "
+                               "WHERE seg != ?", (TAIL_SEG,)).fetchone()[0]
+        adds: dict[int, set[int]] = {}
+        with self._db:
+            dropped = [known[p][0] for p in removed] + [known[p][0] for p in changed if p in known]
+            self._db.executemany("DELETE FROM files WHERE id = ?", ((fid,) for fid in dropped))
+            self._set_meta("dead", self._meta("dead", 0) + len(dropped))
+            for n, path in enumerate(changed, 1):
+                grams = self._grams(path)
+                mtime, size = seen[path]
+                fid = self._db.execute(
+                    "INSERT INTO files (path, mtime_ns, size, indexed) VALUES (?, ?, ?, ?)",
+                    (path, mtime, size, int(grams is not None))).lastrowid
+                for tri in grams or ():
+                    adds.setdefault(tri, set()).add(fid)
+                if bulk and n % BATCH_FILES == 0:
+                    # Bound memory on the first build of a large repository
+                    self._append(adds, seg)
+                    adds, seg = {}, seg + 1
+            if bulk:
+                self._append(adds, seg)
+                self._compact()
+            else:
+                self._add_to_tail(adds)
+        return len(changed), len(removed)
+
+    def _stat(self, paths: Iterable[str]) -> Stamps:
+        seen: Stamps = {}
+        for rel in paths:
+            try:
+                st = os.stat(os.path.join(self.root, rel))
+                seen[rel] = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                seen[rel] = (-1, -1)
+        return seen
+
+    def _relist(self, scope: Optional[set[str]], dirty: set[str]) -> dict[str, int]:
+        """List the repository (only the `scope` directories, if given) and
+        update it: new and dirty files are stat'ed, and so are the files
+        directly in a scope directory; the others keep their stored stamp.
+        """
+        listing = list_files(self.root, scope)
+        if scope is None:
+            stored = {p for (p,) in self._db.execute("SELECT path FROM files")}
+        else:
+            # "/" + 1 == "0": the key range of everything under d/
+            stored = {p for d in scope for (p,) in self._db.execute(
+                "SELECT path FROM files WHERE path >= ? AND path < ?", (d + "/", d + "0"))}
+        listed = set(listing)
+        seen = self._stat(p for p in listing if scope is None or p not in stored
+                          or os.path.dirname(p) in scope)
+        seen.update(self._stat(dirty))
+        updated, removed = self._update(seen, gone=stored - listed)
+        with self._db:
+            watch = {} if scope is None else {
+                rel: mtime for rel, mtime in self._meta("watch", {}).items()
+                if rel not in scope and not _under(rel, scope)}
+            fresh = self._watch_list(listing) + sorted(d for d in scope or () if os.path.isdir(
+                os.path.join(self.root, d)))
+            watch.update(zip(fresh, map(self._mtime, fresh)))
+            self._set_meta("watch", watch)
+            if scope is None:
+                self._set_meta("swept_at", time.time())
+        if updated or removed:
+            logging.info(f"code index {self.root}: {updated} updated, {removed} removed")
+        return {"updated": updated, "removed": removed, "files": len(listing)}
+
+    def _sweep(self) -> None:
+        """Background full re-stat: catches in-place edits made outside the agent."""
+        try:
+            listing = list_files(self.root)
+            seen = self._stat(listing)  # the slow part runs without the lock
+            with self._lock:
+                stored = {p for (p,) in self._db.execute("SELECT path FROM files")}
+                updated, removed = self._update(seen, gone=stored - set(listing))
+                with self._db:
+                    watch = self._watch_list(listing)
+                    self._set_meta("watch", dict(zip(watch, map(self._mtime, watch))))
+                    self._set_meta("swept_at", time.time())
+                    if self._needs_compaction():
+                        self._compact()
+            if updated or removed:
+                logging.info(f"code index {self.root}: sweep updated {updated}, removed {removed}")
+        except Exception as e:  # housekeeping must never break a search
+            logging.warning(f"code index sweep of {self.root} failed: {e}")
+        finally:
+            self._sweeper = None
+
+    def refresh(self, force: bool = False) -> dict[str, int]:
+        """Bring the index up to date with the change feed.
+
+        Each call (at most once per `poll_interval`) stats only the watched
+        directories, ignore files and .git/index.  A changed directory is
+        re-listed (git ls-files on that subtree) and its files stat'ed; a
+        changed root, ignore file or git index re-lists everything.  Files
+        written through `notify()` are re-indexed directly.  Every
+        `sweep_interval` a background thread re-stats everything, for edits
+        made in place by other programs.  `force` (and the first build)
+        re-stats every file synchronously.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._refreshed_at < self.poll_interval:
+                return {}
+            self._refreshed_at = now
+            dirty, self._dirty = self._dirty, set()
+            watch = self._meta("watch")
+            if force or watch is None:
+                return self._relist(None, dirty)
+
+            changed = {rel for rel, mtime in watch.items() if self._mtime(rel) != mtime}
+            if "" in changed or any(rel.startswith(".git/") or rel.endswith(".gitignore")
+                                    for rel in changed):
+                result = self._relist(None, dirty)
+            elif changed:
+                result = self._relist(changed, dirty)
+            elif dirty:
+                updated, removed = self._update(self._stat(dirty))
+                result = {"updated": updated, "removed": removed}
+            else:
+                result = {}
+            if (self._sweeper is None
+                    and time.time() - self._meta("swept_at", 0) >= self.sweep_interval):
+                self._sweeper = threading.Thread(target=self._sweep, name="code-index-sweep",
+                                                 daemon=True)
+                self._sweeper.start()
+            return result
+
+    # ----- queries ---------------------------------------------------------- #
+    def candidates(self, literals: Iterable[str]) -> Optional[list[str]]:
+        """Paths that contain every trigram of `literals` (None: no usable literal)."""
+        wanted: set[int] = set()
+        for lit in literals:
+            wanted |= trigrams(lit.encode("utf-8"))
+        if not wanted:
+            return None
+        ids: Optional[set[int]] = None
+        postings = []
+        for tri in wanted:
+            posting = array("I")
+            for (blob,) in self._db.execute("SELECT ids FROM postings WHERE tri = ?", (tri,)):
+                posting.frombytes(blob)
+            if not posting:
+                return []
+            postings.append(posting)
+        for posting in sorted(postings, key=len):
+            ids = set(posting) if ids is None else ids.intersection(posting)
+            if not ids:
+                return []
+        ids = sorted(ids)
+        paths = []
+        for start in range(0, len(ids), SQL_VARIABLES):
+            chunk = ids[start:start + SQL_VARIABLES]
+            paths += [p for (p,) in self._db.execute(
+                f"SELECT path FROM files WHERE id IN ({','.join('?' * len(chunk))})", chunk)]
+        return sorted(paths)
+
+    def search(self, query: str, regex: bool = False, ignore_case: bool = False,
+               context: int = 2, max_results: int = 50,
+               path_glob: Optional[str] = None) -> tuple[list[Match], dict[str, int]]:
+        """Return (matches, stats) for a literal or regex query."""
+        started = time.perf_counter()
+        with self._lock:
+            self.refresh()
+            pattern = query if regex else re.escape(query)
+            compiled = re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+            literals = required_literals(pattern)
+            if ignore_case:
+                # The index only folds ASCII case
+                literals = [part for lit in literals for part in re.split(r"[^\x00-\x7f]+", lit)]
+            paths = self.candidates(literals)
+            total = self._db.execute("SELECT COUNT(*) FROM files WHERE indexed").fetchone()[0]
+            if paths is None:
+                paths = [p for (p,) in self._db.execute(
+                    "SELECT path FROM files WHERE indexed ORDER BY path")]
+        if path_glob:
+            paths = [p for p in paths if fnmatch.fnmatch(p, path_glob)]
+
+        matches: list[Match] = []
+        files_matched = 0
+        for rel in paths:
+            try:
+                with open(os.path.join(self.root, rel), "r", encoding="utf-8",
+                          errors="replace") as f:
+                    lines = f.read().splitlines()
+            except OSError:
+                continue
+            hit = False
+            for i, line in enumerate(lines):
+                if compiled.search(line):
+                    hit = True
+                    matches.append(Match(rel, i + 1, line,
+                                         lines[max(0, i - context):i], lines[i + 1:i + 1 + context]))
+                    if len(matches) >= max_results:
+                        break
+            files_matched += hit
+            if len(matches) >= max_results:
+                break
+        stats = {"candidates": len(paths), "indexed": total, "files": files_matched,
+                 "ms": round((time.perf_counter() - started) * 1000, 1)}
+        return matches, stats
+
+
+_indexes: dict[str, CodeIndex] = {}
+_registry_lock = threading.Lock()
+
+
+def notify(paths: Iterable[str]) -> None:
+    """Tell every open index that `paths` were just written by this process."""
+    with _registry_lock:
+        indexes = list(_indexes.values())
+    paths = [os.path.abspath(os.path.expanduser(p)) for p in paths]
+    for index in indexes:
+        index.notify(p for p in paths if p.startswith(index.root + os.sep))
+
+
+def index_for(root: str) -> CodeIndex:
+    """Shared index per repository root (kept warm for the process lifetime)."""
+    key = os.path.abspath(os.path.expanduser(root))
+    with _registry_lock:
+        if key not in _indexes:
+            _indexes[key] = CodeIndex(key)
+        return _indexes[key]
@@ -5,11 +5,53 @@ import sys
 LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai")
 
 
-# Load API credentials and model name from environment
-defined_api_key = os.getenv('OPENAI_API_KEY')
-if not defined_api_key:
-    sys.exit("ERROR: Please set the OPENAI_API_KEY environment variable.")
-OPENAI_API_KEY = defined_api_key
+# Load API credentials and model name from environment.  A missing key is only
+# fatal for modes that actually call the LLM (see require_api_key), so flows,
+# feedback and the self-awareness report keep working without it.
+OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+
+
+def require_api_key() -> str:
+    """Return the OpenAI key, exiting with a clear error if it is not set."""
+    if not OPENAI_API_KEY:
+        sys.exit("ERROR: Please set the OPENAI_API_KEY environment variable.")
+    return OPENAI_API_KEY
 
 # You can override the model via OPENAI_MODEL; default to gpt-4\OPENAI_MODEL default: 
-MODEL_NAME = "gpt-4o-mini"
\ No newline at end of file
+MODEL_NAME = "gpt-4o-mini"
+
+# Prompt-cache friendliness: when the static system prefix (rules, knowledge,
+# context file) is long enough for provider-side caching, send the full,
+# stable tool list so the prefix stays byte-identical across steps.
+# 'auto' (default), 'always' or 'never'.
+STABLE_TOOLS = os.getenv("JAIME_STABLE_TOOLS", "auto")
+# Providers only cache prefixes above ~1024 tokens (~4 chars per token).
+CACHE_MIN_PREFIX_CHARS = 4096
+
+# Persistent caches (knowledge signatures, indexes, ...); safe to delete.
+CACHE_DIR = os.getenv("JAIME_CACHE_DIR",
+                      os.path.join(os.path.dirname(os.path.abspath(__file__)), ".jaime_cache"))
+# Model routing (see model_router.py): every phase / LLM-calling handler maps
+# to an ordered fallback chain of "provider:model" targets (or dicts with a
+# per-target "timeout") and a per-attempt timeout in seconds.  Phases without
+# an entry use "default".  JAIME_MODEL_ROUTES may name a JSON file with the
+# same shape whose entries replace these.
+# Tiering is opt-in: both tiers default to MODEL_NAME, so out of the box every
+# route sends the same model and routes only differ in timeouts and in the
+# local DeepSeek first hop.  Set these (or JAIME_MODEL_ROUTES) to split them.
+FAST_MODEL = os.getenv("JAIME_FAST_MODEL", MODEL_NAME)    # validation, summaries
+CODE_MODEL = os.getenv("JAIME_CODE_MODEL", MODEL_NAME)    # tool calls, code generation
+
+_LOCAL = ([{"provider": "deepseek", "model": MODEL_NAME, "timeout": 5}]
+          if LLM_PROVIDER == "deepseek" else [])
+MODEL_ROUTES = {
+    "default":           {"targets": _LOCAL + [f"openai:{MODEL_NAME}"], "timeout": 120},
+    "validation":        {"targets": _LOCAL + [f"openai:{FAST_MODEL}"], "timeout": 30},
+    "summarize":         {"targets": _LOCAL + [f"openai:{FAST_MODEL}"], "timeout": 30},
+    # Phases whose replies carry tool calls (write_file content included)
+    "execution":         {"targets": _LOCAL + [f"openai:{CODE_MODEL}"], "timeout": 120},
+    "auto_loop":         {"targets": _LOCAL + [f"openai:{CODE_MODEL}"], "timeout": 120},
+    "serve":             {"targets": _LOCAL + [f"openai:{CODE_MODEL}"], "timeout": 120},
+    "prompt":            {"targets": _LOCAL + [f"openai:{CODE_MODEL}"], "timeout": 120},
+    "smart_modify_file": {"targets": [f"openai:{CODE_MODEL}"], "timeout": 300},
+}
@@ -0,0 +1,63 @@
+# file_lock.py
+"""
+Advisory inter-process locking for the JSON stores shared by agent processes
+(session memory, tasks.json, ...).
+
+`locked(path)` takes an fcntl lock on a sidecar "<path>.lock" file, so the data
+file itself can still be replaced atomically with `write_json_atomic()`.
+On platforms without fcntl (Windows) locking degrades to a no-op.
+"""
+
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+
+@contextmanager
+def locked(path: str, shared: bool = False) -> Iterator[None]:
+    """Hold an exclusive (or shared) advisory lock for `path`."""
+    lock_path = f"{path}.lock"
+    parent = os.path.dirname(lock_path)
+    if parent:
+        os.makedirs(parent, exist_ok=True)
+    with open(lock_path, "a+") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+def read_json(path: str, default: Any) -> Any:
+    """Load JSON from `path`, returning `default` if missing or corrupt."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default
+
+
+def write_json_atomic(path: str, data: Any, indent: int = 2) -> None:
+    """Write JSON to a temp file in the same directory and rename it over `path`."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=indent, ensure_ascii=False)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
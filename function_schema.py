@@ -114,12 +114,33 @@ FUNCTIONS = [
                 "folder_path": {
                     "type": "string",
                     "description": "Path of the Git repository to diff",
-                }
+                },
+                "fetch": {
+                    "type": "boolean",
+                    "description": "Fetch the remote first (default true); false reuses the last fetched state",
+                },
             },
             "required": ["folder_path"],
         },
     },
 ]
+# Read-only git summary (cacheable, prefetched; see tool_cache.py)
+FUNCTIONS.append(
+    {
+        "name": "git_status",
+        "description": "Show the working tree status (changed, staged and untracked files) and diff stats against the remote branch, without fetching",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "folder_path": {
+                    "type": "string",
+                    "description": "Path of the Git repository",
+                },
+            },
+            "required": ["folder_path"],
+        },
+    }
+)
 # New function schema for the git pull functionality
 FUNCTIONS.append(
     {
@@ -162,3 +183,80 @@ FUNCTIONS.append(
         },
     }
 )
+# Batched reads: several files / globs in one round-trip
+FUNCTIONS.append(
+    {
+        "name": "read_files",
+        "description": "Read several files at once. Accepts file paths, directories and globs (e.g. handlers/*.py); binary files are skipped and the total output is capped, truncating large files fairly",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "paths": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "File paths, directories or glob patterns (supports ~ for home)",
+                },
+                "max_bytes": {
+                    "type": "integer",
+                    "description": "Total content budget in bytes (default 100000)",
+                },
+            },
+            "required": ["paths"],
+        },
+    }
+)
+# Indexed code search (trigram index, see code_index.py)
+FUNCTIONS.append(
+    {
+        "name": "search_code",
+        "description": "Search the code of a repository for a literal string or regex and return file:line matches with surrounding context lines. Much cheaper than reading files to locate a symbol",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "query": {"type": "string", "description": "Text or regex to find"},
+                "folder_path": {
+                    "type": "string",
+                    "description": "Repository root to search (default: current directory)",
+                },
+                "regex": {"type": "boolean", "description": "Treat query as a regular expression"},
+                "ignore_case": {"type": "boolean", "description": "Case-insensitive search"},
+                "context": {"type": "integer", "description": "Context lines around each match (default 2)"},
+                "max_results": {"type": "integer", "description": "Maximum matching lines (default 50)"},
+                "glob": {"type": "string", "description": "Only search paths matching this glob, e.g. *.py"},
+            },
+            "required": ["query"],
+        },
+    }
+)
+# Structure of Python sources without full reads (see outline_cache.py)
+FUNCTIONS.append(
+    {
+        "name": "outline_file",
+        "description": "Outline a Python file: classes, functions, methods and module variables with signatures, line spans and docstrings. With symbol, return only that symbol's source",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "path": {"type": "string", "description": "Python file to outline (supports ~ for home)"},
+                "symbol": {
+                    "type": "string",
+                    "description": "Optional symbol to read, e.g. 'handle' or 'ResultCache.lookup'",
+                },
+            },
+            "required": ["path"],
+        },
+    }
+)
+FUNCTIONS.append(
+    {
+        "name": "outline_repo",
+        "description": "Outline every Python file in a folder (respecting .gitignore): symbols, signatures, line spans and docstrings, without reading whole files",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "folder_path": {"type": "string", "description": "Folder to outline (default: current directory)"},
+                "glob": {"type": "string", "description": "Only include paths matching this glob, e.g. handlers/*.py"},
+                "max_depth": {"type": "integer", "description": "0 = top-level symbols only, 1 (default) adds methods"},
+            },
+        },
+    }
+)
@@ -2,34 +2,144 @@
 """Persist conversation memory as a *flat list* of messages.
 
 Each call stores **exactly one** message dict, so the on-disk file stays small
-and easy to diff.  The file lives at project_root/session_memory.json.
+and easy to diff.
 
-Add your own locking/rotation if you later share this file across processes.
+Every session gets its own file, project_root/sessions/<session_id>.json.
+The id comes from `use_session()` (per thread, used by the --serve daemon),
+then JAIME_SESSION_ID (set it to share one session between processes), and
+defaults to one per process.  Writes take an advisory lock and
+replace the file atomically, so concurrent writers never clobber each other.
+A process deletes its own default session files on exit, and files of
+per-process sessions ("pid-<n>", "serve-<n>") whose process is gone are
+pruned whenever blob garbage is collected (on every reset).
+
+Oversized message content (whole files, diffs, ...) is kept once in the
+content-addressed blob store and referenced by a stub; see blob_store.py.
+Messages are stamped with "ts", and once a session breaks the retention
+policy its older turns are folded into a rolling summary in the background;
+see memory_retention.py.
 """
 
-import json
+import atexit
 import os
-from typing import Dict, Any
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+import blob_store
+import memory_retention
+from file_lock import locked, read_json, write_json_atomic
 
 HERE = os.path.dirname(os.path.abspath(__file__))
-JSON_PATH = os.path.normpath(os.path.join(HERE, "../session_memory.json"))
+SESSION_DIR = os.path.normpath(os.path.join(HERE, "../sessions"))
+
+_local = threading.local()
+# Session ids owned by one process; see prune_sessions()
+_PROCESS_SESSION = re.compile(r"^(?:pid|serve)-(\d+)\.json$")
+
+
+@contextmanager
+def use_session(sid: str) -> Iterator[None]:
+    """Route this thread's memory reads/writes to session `sid`."""
+    previous = getattr(_local, "sid", None)
+    _local.sid = sid
+    try:
+        yield
+    finally:
+        _local.sid = previous
+
+
+def session_id() -> str:
+    """Return the id of the current memory session."""
+    return (getattr(_local, "sid", None) or os.getenv("JAIME_SESSION_ID")
+            or f"pid-{os.getpid()}")
+
+
+def session_path() -> str:
+    """Return the memory file of the current session."""
+    # Session ids come from clients too: never let one leave SESSION_DIR
+    safe = re.sub(r"[^\w.-]", "_", session_id())
+    return os.path.join(SESSION_DIR, f"{safe}.json")
+
+
+def load_messages() -> List[Dict[str, Any]]:
+    """Return the session's messages under a shared lock."""
+    path = session_path()
+    with locked(path, shared=True):
+        data = read_json(path, [])
+    return data if isinstance(data, list) else []
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # exists, owned by someone else
+    return True
+
+
+def _remove_session(path: str) -> None:
+    with locked(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    try:
+        os.remove(f"{path}.lock")
+    except FileNotFoundError:
+        pass
+
+
+def prune_sessions(session_dir: Optional[str] = None) -> int:
+    """Delete per-process session files whose process has exited; returns the count."""
+    session_dir = session_dir or SESSION_DIR
+    if not os.path.isdir(session_dir):
+        return 0
+    removed = 0
+    for name in os.listdir(session_dir):
+        match = _PROCESS_SESSION.match(name)
+        if match and not _pid_alive(int(match.group(1))):
+            _remove_session(os.path.join(session_dir, name))
+            removed += 1
+    return removed
+
+
+@atexit.register
+def _drop_own_session() -> None:
+    """Remove this process's default session files; nobody else can use them."""
+    for prefix in ("pid", "serve"):
+        path = os.path.join(SESSION_DIR, f"{prefix}-{os.getpid()}.json")
+        if os.path.exists(path):
+            _remove_session(path)
+
+
+def reset_messages() -> None:
+    """Empty the current session's memory file and drop orphaned blobs."""
+    path = session_path()
+    with locked(path):
+        write_json_atomic(path, [])
+    blob_store.collect_garbage(SESSION_DIR)  # also prunes exited processes' sessions
 
 
 def append_json(message: Any) -> None:
-    """Append *one* message to session_memory.json."""
+    """Append *one* message to the current session file."""
     if not isinstance(message, dict):
         raise TypeError("append_json expects a dict message")
 
-    # Load (or initialise) the flat list
-    try:
-        with open(JSON_PATH, "r", encoding="utf-8") as f:
-            data = json.load(f)
+    message = blob_store.externalize({"ts": round(time.time(), 3), **message})
+    path = session_path()
+    with locked(path):
+        # Load (or initialise) the flat list
+        data = read_json(path, [])
         if not isinstance(data, list):
             data = []
-    except FileNotFoundError:
-        data = []
-
-    data.append(message)
-
-    with open(JSON_PATH, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+        data.append(message)
+        write_json_atomic(path, data)
+        size = os.path.getsize(path)
+    worker = memory_retention.WORKER
+    if memory_retention.over_limit(data, size, worker.policy):
+        worker.schedule(path)
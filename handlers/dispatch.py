@@ -5,6 +5,11 @@ and calls its `handle(**kwargs)`.
 
 * Accepts either an OpenAI FunctionCall object **or** a plain dict
   { "name": str, "arguments": str|dict }.
+* Rejects calls that break a local rule (see rule_engine) before the
+  handler runs.
+* Serves repeated read-only calls from tool_cache while their targets are
+  unchanged (including results prefetched by prefetch.py), and invalidates
+  overlapping entries (and tells code_index) after mutating calls.
 * Produces crystal-clear error messages to aid debugging.
 """
 
@@ -13,7 +18,17 @@ from __future__ import annotations
 import importlib
 import json
 import types
-from typing import Any
+from typing import Any, NamedTuple, Optional
+
+import metrics
+from rule_engine import check_call, format_violations
+from tool_cache import CACHE, MUTATING, PATH_ARGS
+
+
+class DispatchResult(NamedTuple):
+    text: str               # full handler output
+    ref: Optional[str]      # tool_cache reference id, if the result is cached
+    cached: bool            # True when served from the cache
 
 
 def _parse_call(call: Any) -> tuple[str, dict]:
@@ -47,8 +62,34 @@ def dispatch_function(call: Any) -> str:
     Returns:
         str – the handler’s return value (should already be serialisable).
     """
+    return dispatch(call).text
+
+
+def dispatch(call: Any) -> DispatchResult:
+    """Like dispatch_function, but also report the cache reference of the result."""
     name, args = _parse_call(call)
 
+    violations = check_call(name, args)
+    if violations:
+        return DispatchResult(format_violations(violations), None, False)
+
+    entry = CACHE.lookup(name, args)
+    if entry is not None:
+        if entry.primed:
+            # Prefetched, never shown to the model: send it in full
+            metrics.record("prefetch_hit", tool=name)
+        return DispatchResult(entry.result, entry.ref, not entry.primed)
+
+    text = _run_handler(name, args)
+    CACHE.invalidate_for(name, args)
+    if name in MUTATING:
+        from code_index import notify
+        notify(v for k, v in args.items() if k in PATH_ARGS and isinstance(v, str))
+    return DispatchResult(text, CACHE.store(name, args, text), False)
+
+
+def _run_handler(name: str, args: dict) -> str:
+    """Import and run one handler, turning every failure into a ❌ message."""
     try:
         module: types.ModuleType = importlib.import_module(f"handlers.{name}")
     except ModuleNotFoundError as e:
@@ -3,28 +3,32 @@ import logging
 import subprocess
 from pathlib import Path
 
-def handle(folder_path: str) -> str:
+def handle(folder_path: str, fetch: bool = True) -> str:
     """
     Show git diff between local changes and remote HEAD for the current branch.
     Decodes all output as UTF-8 (errors replaced) to avoid Windows codec errors,
     and safely handles missing stderr/stdout.
+
+    With fetch=False the remote is not contacted (diff against the last fetched
+    origin/<branch>), which makes the call read-only and cacheable.
     """
-    logging.debug(f"git_diff handler received folder_path: {folder_path}")
+    logging.debug(f"git_diff handler received folder_path: {folder_path}, fetch: {fetch}")
     repo_root = Path(folder_path).expanduser().resolve()
     if not (repo_root / '.git').is_dir():
         return f"❌ Error: no git repository found at {repo_root}"
 
     try:
         # Fetch remote (no merge), decoding as UTF-8 and replacing errors
-        subprocess.run(
-            ["git", "fetch"],
-            cwd=str(repo_root),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            encoding="utf-8",
-            errors="replace",
-            check=True
-        )
+        if fetch:
+            subprocess.run(
+                ["git", "fetch"],
+                cwd=str(repo_root),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                encoding="utf-8",
+                errors="replace",
+                check=True
+            )
 
         # Find current branch
         branch_proc = subprocess.run(
@@ -0,0 +1,40 @@
+# handlers/git_status.py
+import logging
+import subprocess
+from pathlib import Path
+
+def handle(folder_path: str) -> str:
+    """
+    Show 'git status --short --branch' plus diff stats against origin/<branch>.
+    Never contacts the remote, so the call is read-only and cacheable.
+    """
+    logging.debug(f"git_status handler received folder_path: {folder_path}")
+    repo_root = Path(folder_path).expanduser().resolve()
+    if not (repo_root / '.git').is_dir():
+        return f"❌ Error: no git repository found at {repo_root}"
+
+    def git(*args):
+        return subprocess.run(
+            ["git", *args],
+            cwd=str(repo_root),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            encoding="utf-8",
+            errors="replace"
+        )
+
+    try:
+        status = git("status", "--short", "--branch")
+        if status.returncode != 0:
+            return f"❌ git status failed: {(status.stderr or '').strip()}"
+        branch = (git("rev-parse", "--abbrev-ref", "HEAD").stdout or "").strip()
+        stat = git("diff", "--stat", f"origin/{branch}")
+        if stat.returncode != 0:
+            stat_text = f"(no origin/{branch} to compare against)"
+        else:
+            stat_text = (stat.stdout or "").strip() or "no differences"
+        return (f"✅ Status of '{branch}':\n{(status.stdout or '').rstrip()}\n\n"
+                f"Diff stat against origin/{branch}:\n{stat_text}")
+    except Exception as e:
+        logging.error(f"git_status exception: {e}")
+        return f"❌ Error in git_status handler: {e}"
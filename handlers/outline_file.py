@@ -0,0 +1,45 @@
+# handlers/outline_file.py
+"""
+Outline a Python file, or return the source of one symbol in it.
+
+Parameters
+----------
+path : str
+    Python source file (supports ~).
+symbol : str, optional
+    "Class", "Class.method" or a bare function/method name.  When given,
+    only that symbol's lines are returned instead of the outline.
+
+The outline lists classes, functions, methods and module-level
+assignments with signatures, line spans and first docstring lines; it comes
+from outline_cache, so unchanged files are not re-parsed.
+"""
+
+import os
+from typing import Optional
+
+from outline_cache import CACHE, format_outline, symbol_source
+
+
+def handle(path: str, symbol: Optional[str] = None) -> str:
+    abs_path = os.path.abspath(os.path.expanduser(path))
+    if not os.path.isfile(abs_path):
+        return f"❌ Error: file not found: {abs_path}"
+    try:
+        if symbol:
+            matches, source = symbol_source(abs_path, symbol, CACHE)
+            if not matches:
+                return f"❌ Error: symbol '{symbol}' not found in {path}"
+            sym = matches[0]
+            head = f"{path}:{sym['start']}-{sym['end']} {sym['kind']} {sym['name']}"
+            if len(matches) > 1:
+                others = ", ".join(f"{m['name']} (L{m['start']})" for m in matches[1:])
+                head += f"  (also: {others})"
+            return f"{head}\n{source}"
+        return format_outline(path, CACHE.outline(abs_path), max_depth=2)
+    except SyntaxError as e:
+        return f"❌ Error: cannot parse {path}: {e}"
+    except (OSError, UnicodeDecodeError) as e:
+        return f"❌ Error reading {path}: {e}"
+    finally:
+        CACHE.flush()
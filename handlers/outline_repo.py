@@ -0,0 +1,61 @@
+# handlers/outline_repo.py
+"""
+Outline every Python file of a folder (respecting .gitignore).
+
+Parameters
+----------
+folder_path : str, optional
+    Folder to outline (default: current directory).
+glob : str, optional
+    Only include folder-relative paths matching this pattern,
+    e.g. "handlers/*.py".
+max_depth : int, optional
+    0 = top-level symbols only, 1 (default) also lists methods.
+
+Each file is summarised as in outline_file; the output is capped at
+MAX_CHARS characters, though the first file is always shown (cut at a line
+boundary if its outline alone is over the cap).
+"""
+
+import fnmatch
+import os
+from typing import Optional
+
+from code_index import list_files
+from outline_cache import CACHE, format_outline
+
+MAX_CHARS = 60_000
+
+
+def handle(folder_path: str = ".", glob: Optional[str] = None, max_depth: int = 1) -> str:
+    root = os.path.abspath(os.path.expanduser(folder_path))
+    if not os.path.isdir(root):
+        return f"❌ Error: directory not found: {root}"
+    files = [p for p in list_files(root)
+             if p.endswith(".py") and (not glob or fnmatch.fnmatch(p, glob))]
+    if not files:
+        return f"No Python files under {folder_path}" + (f" matching {glob}" if glob else "")
+
+    parts, size = [], 0
+    try:
+        for n, rel in enumerate(files):
+            try:
+                text = format_outline(rel, CACHE.outline(os.path.join(root, rel)), max_depth)
+            except SyntaxError as e:
+                text = f"{rel} — ⚠️ cannot parse: {e.msg} (line {e.lineno})"
+            except (OSError, UnicodeDecodeError) as e:
+                text = f"{rel} — ⚠️ unreadable: {e}"
+            if size + len(text) > MAX_CHARS:
+                if not parts:
+                    # Never answer with the note alone: cut the first outline to fit
+                    cut = text.rfind("\n", 0, MAX_CHARS)
+                    parts.append(text[:cut if cut > 0 else MAX_CHARS] + "\n  ... outline truncated")
+                    n += 1
+                if n < len(files):
+                    parts.append(f"... {len(files) - n} more file(s) not shown; narrow with glob")
+                break
+            parts.append(text)
+            size += len(text) + 1
+    finally:
+        CACHE.flush()
+    return "\n".join(parts)
@@ -0,0 +1,161 @@
+# handlers/read_files.py
+"""
+Read several files in one call.
+
+Parameters
+----------
+paths : list[str]
+    Files, directories (their files, recursively) and globs such as
+    "handlers/*.py" or "src/**/*.ts".  ~ is expanded.
+max_bytes : int, optional
+    Total budget for returned content (default 100 000).  It is shared
+    max-min fairly: small files are returned whole and the rest is split
+    evenly among the larger ones, which are cut at a line boundary.
+    Bytes a cut leaves unused are handed back to the files that are still
+    truncated, for up to REFILL_ROUNDS extra reads.
+
+Files are stat'ed, sniffed and read on a thread pool; a NUL byte in the
+first SNIFF_BYTES marks a file as binary and it is skipped without reading
+the rest.  The result is one JSON object:
+
+    {"files": [{"path", "size", "content", "truncated"} |
+               {"path", "skipped": "binary" | "not UTF-8" | "not found" | ...}],
+     "budget": int, "used": int}
+"""
+
+import glob
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Union
+
+DEFAULT_BUDGET = 100_000
+MAX_BUDGET = 1_000_000
+MAX_FILES = 200
+SNIFF_BYTES = 1024
+WORKERS = 16
+REFILL_ROUNDS = 4
+SKIP_DIRS = {".git", "__pycache__", "node_modules", ".venv", "venv"}
+
+
+def _expand(pattern: str) -> List[str]:
+    path = os.path.expanduser(pattern)
+    if glob.has_magic(path):
+        return sorted(p for p in glob.glob(path, recursive=True) if os.path.isfile(p))
+    if os.path.isdir(path):
+        out = []
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS and not d.startswith("."))
+            out.extend(os.path.join(root, f) for f in sorted(files))
+        return out
+    return [path]
+
+
+def _display(path: str) -> str:
+    rel = os.path.relpath(path)
+    return path if rel.startswith("..") else rel
+
+
+def _probe(path: str) -> Dict[str, Any]:
+    """Stat and sniff one file."""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(SNIFF_BYTES)
+            size = os.fstat(f.fileno()).st_size
+    except FileNotFoundError:
+        return {"skipped": "not found"}
+    except OSError as e:
+        return {"skipped": e.strerror or str(e)}
+    if b"\0" in head:
+        return {"size": size, "skipped": "binary"}
+    return {"size": size}
+
+
+def _read(path: str, limit: int) -> Dict[str, Any]:
+    """Read at most `limit` bytes as UTF-8, cutting at a line boundary if short."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read(limit + 1)
+    except OSError as e:
+        return {"skipped": e.strerror or str(e)}
+    truncated = len(data) > limit
+    if truncated:
+        data = data[:limit]
+        cut = data.rfind(b"\n")
+        if cut > 0:
+            data = data[:cut + 1]
+    try:
+        text = data.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # A cut in the middle of a multi-byte character is fine; anything else is not text
+        if not truncated or e.start < len(data) - 3:
+            return {"skipped": "not UTF-8"}
+        text = data[:e.start].decode("utf-8")
+    return {"content": text, "truncated": truncated}
+
+
+def _used(result: Dict[str, Any]) -> int:
+    return len(result.get("content", "").encode("utf-8"))
+
+
+def _allot(sizes: List[int], budget: int) -> List[int]:
+    """Max-min fair split of `budget` over files of the given sizes."""
+    alloc = [0] * len(sizes)
+    remaining = budget
+    order = sorted(range(len(sizes)), key=lambda i: sizes[i])
+    for n, i in enumerate(order):
+        alloc[i] = min(sizes[i], remaining // (len(order) - n))
+        remaining -= alloc[i]
+    return alloc
+
+
+def handle(paths: Union[List[str], str], max_bytes: Optional[int] = None) -> Dict[str, Any]:
+    if isinstance(paths, str):
+        paths = [paths]
+    budget = max(0, min(int(max_bytes or DEFAULT_BUDGET), MAX_BUDGET))
+
+    targets: List[str] = []
+    entries: List[Dict[str, Any]] = []
+    seen = set()
+    for pattern in paths:
+        matches = _expand(pattern)
+        if not matches:
+            entries.append({"path": pattern, "skipped": "no match"})
+        for m in matches:
+            key = os.path.abspath(m)
+            if key not in seen:
+                seen.add(key)
+                targets.append(key)
+
+    omitted = max(0, len(targets) - MAX_FILES)
+    targets = targets[:MAX_FILES]
+    with ThreadPoolExecutor(max_workers=min(WORKERS, len(targets) or 1)) as pool:
+        probes = list(pool.map(_probe, targets))
+        readable = [i for i, p in enumerate(probes) if "skipped" not in p]
+        sizes = [probes[i]["size"] for i in readable]
+        reads = list(pool.map(_read, [targets[i] for i in readable], _allot(sizes, budget)))
+        # Line-boundary cuts and unreadable files leave part of the budget
+        # unused; re-read the still truncated files with it until none grows
+        for _ in range(REFILL_ROUNDS):
+            spare = budget - sum(_used(r) for r in reads)
+            short = [n for n, r in enumerate(reads) if r.get("truncated")]
+            if spare <= 0 or not short:
+                break
+            have = [_used(reads[n]) for n in short]
+            extra = _allot([sizes[n] - h for n, h in zip(short, have)], spare)
+            grown = list(pool.map(_read, [targets[readable[n]] for n in short],
+                                  [h + e for h, e in zip(have, extra)]))
+            if sum(_used(r) for r in grown) <= sum(have):
+                break
+            for n, r in zip(short, grown):
+                reads[n] = r
+        for i, result in zip(readable, reads):
+            probes[i].update(result)
+
+    used = 0
+    for path, probe in zip(targets, probes):
+        entries.append({"path": _display(path), **probe})
+        used += len(probe.get("content", "").encode("utf-8"))
+    result: Dict[str, Any] = {"files": entries, "budget": budget, "used": used}
+    if omitted:
+        result["omitted_files"] = omitted
+    return result
@@ -0,0 +1,64 @@
+# handlers/search_code.py
+"""
+Search a repository for a literal string or regex (see code_index.py).
+
+Parameters
+----------
+query : str
+    Text to find; a Python regex when `regex` is true.
+folder_path : str, optional
+    Repository root (default: current directory).  Its trigram index is
+    built on first use and refreshed incrementally afterwards.
+regex, ignore_case : bool, optional
+context : int, optional
+    Lines of context around each match (default 2).
+max_results : int, optional
+    Stop after this many matching lines (default 50).
+glob : str, optional
+    Only search root-relative paths matching this pattern, e.g. "*.py".
+
+Output is grep-style: "path:line: text" for matches and "path-line- text"
+for context, followed by a one-line summary.
+"""
+
+import os
+import re
+from typing import Optional
+
+from code_index import index_for
+
+MAX_RESULTS = 200
+MAX_CONTEXT = 10
+
+
+def handle(query: str, folder_path: str = ".", regex: bool = False,
+           ignore_case: bool = False, context: int = 2, max_results: int = 50,
+           glob: Optional[str] = None) -> str:
+    root = os.path.abspath(os.path.expanduser(folder_path))
+    if not os.path.isdir(root):
+        return f"❌ Error: directory not found: {root}"
+    if not query:
+        return "❌ Error: empty query"
+    try:
+        matches, stats = index_for(root).search(
+            query, regex=regex, ignore_case=ignore_case,
+            context=max(0, min(int(context), MAX_CONTEXT)),
+            max_results=max(1, min(int(max_results), MAX_RESULTS)),
+            path_glob=glob)
+    except re.error as e:
+        return f"❌ Error: invalid regex {query!r}: {e}"
+
+    lines = []
+    for m in matches:
+        if lines:
+            lines.append("--")
+        first = m.line - len(m.before)
+        lines += [f"{m.path}-{first + i}- {text}" for i, text in enumerate(m.before)]
+        lines.append(f"{m.path}:{m.line}: {m.text}")
+        lines += [f"{m.path}-{m.line + 1 + i}- {text}" for i, text in enumerate(m.after)]
+    summary = (f"{len(matches)} match(es) in {stats['files']} file(s); "
+               f"{stats['candidates']} of {stats['indexed']} indexed files searched "
+               f"in {stats['ms']:g} ms")
+    if not matches:
+        return f"No matches for {query!r}. {summary}"
+    return "\n".join(lines + ["", summary])
@@ -1,14 +1,15 @@
 import os
-import openai
-from config import OPENAI_API_KEY, MODEL_NAME
 
-openai.api_key = OPENAI_API_KEY
 
 def handle(path: str, instructions: str) -> str:
     """
     Reads the file at `path`, asks the LLM to apply `instructions`
     to its contents, then writes back the updated file.
+
+    The call uses the "smart_modify_file" model route (see model_router.py).
     """
+    from client import complete
+
     # Resolve and read
     expanded = os.path.expanduser(path)
     if not os.path.isfile(expanded):
@@ -25,11 +26,9 @@ def handle(path: str, instructions: str) -> str:
         "\n\n"
         "Return the full, updated file content only."
     )
-    resp = openai.chat.completions.create(
-        model=MODEL_NAME,
-        messages=[{"role":"user","content":prompt}]
-    )
-    updated = resp.choices[0].message.content
+    updated = complete([{"role": "user", "content": prompt}], phase="smart_modify_file")
+    if not updated.strip():
+        return f"❌ Error: the model returned no content for {expanded}; file left unchanged"
 
     # Overwrite the file
     with open(expanded, "w", encoding="utf-8") as f:
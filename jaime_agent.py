@@ -7,14 +7,13 @@ import argparse
 import time
 import json
 import logging
-import subprocess
 import threading
-import shlex
 from collections import defaultdict
-from functools import lru_cache
 from pathlib import Path
 from dotenv import load_dotenv
 
+import task_queue
+
 load_dotenv()
 
 # Project directories and files
@@ -24,42 +23,49 @@ FEEDBACK_FILE = PROJECT_DIR / "user_feedback.txt"
 DECISION_IMPACT_FILE = PROJECT_DIR / "decision_impact_analysis.txt"
 FLOWS_FILE = PROJECT_DIR / "git_flows.json"
 KNOWLEDGE_DIR = PROJECT_DIR / "knowledge"
-
-# Ensure project directories exist
-PROJECT_DIR.mkdir(parents=True, exist_ok=True)
-KNOWLEDGE_DIR.mkdir(parents=True, exist_ok=True)
+JOURNAL_DIR = PROJECT_DIR / "journal"
+BATCH_DIR = PROJECT_DIR / "batches"
+BATCH_STATE_FILE = PROJECT_DIR / "batches.json"
 
 # Ensure import path when run from Startup folder
 MODULE_DIR = os.path.expanduser("~/Documents/loneProjects/JaimeAgent/scripts")
 if MODULE_DIR not in sys.path:
     sys.path.insert(0, MODULE_DIR)
 
-# Core imports for function-calling
-from client import handle_prompt_raw, handle_prompt
-from handlers.dispatch import dispatch_function
-
-# Logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(PROJECT_DIR / "jaime_agent.log", encoding="utf-8"),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
-activity_handler = logging.FileHandler(PROJECT_DIR / "activity_log.txt", encoding="utf-8")
-activity_handler.setLevel(logging.INFO)
-activity_handler.setFormatter(
-    logging.Formatter("%(asctime)s -> %(message)s", "%Y-%m-%d %H:%M:%S")
-)
-logging.getLogger().addHandler(activity_handler)
-
-# Stub for vector search
-try:
-    from vector_store import search_documents
-except ImportError:
-    def search_documents(query, top_k=3):
-        return []
+# The LLM stack (client -> openai/requests, handlers.dispatch) is imported
+# inside the modes that need it, so flows/feedback/self-awareness start fast.
+
+def setup_environment():
+    """Create project directories and attach the log handlers."""
+    PROJECT_DIR.mkdir(parents=True, exist_ok=True)
+    KNOWLEDGE_DIR.mkdir(parents=True, exist_ok=True)
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(PROJECT_DIR / "jaime_agent.log", encoding="utf-8"),
+            logging.StreamHandler(sys.stdout)
+        ]
+    )
+    activity_handler = logging.FileHandler(PROJECT_DIR / "activity_log.txt", encoding="utf-8")
+    activity_handler.setLevel(logging.INFO)
+    activity_handler.setFormatter(
+        logging.Formatter("%(asctime)s -> %(message)s", "%Y-%m-%d %H:%M:%S")
+    )
+    logging.getLogger().addHandler(activity_handler)
+
+# Vector search (optional module, resolved on first use)
+
+_vector_search = None
+
+def search_documents(query, top_k=3):
+    global _vector_search
+    if _vector_search is None:
+        try:
+            from vector_store import search_documents as _vector_search
+        except ImportError:
+            _vector_search = lambda query, top_k=3: []
+    return _vector_search(query, top_k=top_k)
 
 info_flow_log = defaultdict(list)
 def monitor_information_flow(func: str, data: str):
@@ -68,49 +74,47 @@ def monitor_information_flow(func: str, data: str):
 
 # Task I/O
 
+# tasks.json is shared by every worker process; see task_queue for the
+# locking and lease protocol.
+
 def load_tasks() -> list[dict]:
-    try:
-        return json.loads(TASK_FILE.read_text(encoding='utf-8'))
-    except FileNotFoundError:
-        logging.info("No tasks.json found, starting empty")
-        return []
-    except json.JSONDecodeError as e:
-        logging.error(f"Failed parsing tasks.json: {e}")
-        return []
+    return task_queue.load_tasks(str(TASK_FILE))
 
 
 def save_tasks(tasks: list[dict]):
     try:
-        TASK_FILE.write_text(json.dumps(tasks, indent=2), encoding='utf-8')
+        task_queue.save_tasks(str(TASK_FILE), tasks)
         logging.info(f"Tasks saved ({len(tasks)} remaining)")
     except Exception as e:
         logging.error(f"Failed writing tasks.json: {e}")
 
 # Document cache
+#
+# Files are cached by (path, mtime, size) and assembled contexts per query;
+# see knowledge_cache.  The directory is re-polled at most once per second,
+# so edits under knowledge/ reach the very next step.
+
+_knowledge = None
+
+def _assemble_docs(docs) -> str:
+    # One representative per cluster of near-duplicate chunks
+    from knowledge_dedup import dedupe_documents
+    kept = dedupe_documents(docs)
+    size_in = sum(len(text) for _, text in docs)
+    size_out = sum(len(text) for _, text in kept)
+    for name, _ in docs:
+        monitor_information_flow("load_reference_docs", name)
+    monitor_information_flow("load_reference_docs", f"dedup {size_in} -> {size_out} chars")
+    return "\n\n".join(f"== {name} ==\n{text}" for name, text in kept)
 
-@lru_cache(maxsize=1)
-def load_reference_docs(objective: str) -> str:
-    parts = []
-    for doc in search_documents(objective):
-        full = PROJECT_DIR / Path(doc).name
-        if full.exists():
-            try:
-                text = full.read_text(encoding='utf-8')
-                parts.append(f"== {full.name} ==\n{text}")
-                monitor_information_flow("load_reference_docs", full.name)
-            except Exception:
-                logging.error(f"Error reading {full}")
-    
-    # Load all .txt files from the knowledge directory
-    for txt_file in KNOWLEDGE_DIR.glob("*.txt"):
-        try:
-            text = txt_file.read_text(encoding='utf-8')
-            parts.append(f"== {txt_file.name} ==\n{text}")
-            monitor_information_flow("load_reference_docs", txt_file.name)
-        except Exception:
-            logging.error(f"Error reading {txt_file}")
 
-    return "\n\n".join(parts)
+def load_reference_docs(objective: str) -> str:
+    global _knowledge
+    if _knowledge is None:
+        from knowledge_cache import KnowledgeCache
+        _knowledge = KnowledgeCache(KNOWLEDGE_DIR)
+    extra = [PROJECT_DIR / Path(doc).name for doc in search_documents(objective)]
+    return _knowledge.context(objective, _assemble_docs, [p for p in extra if p.exists()])
 
 # Git flows
 
@@ -140,6 +144,8 @@ def handle_define_flow(args):
 
 
 def handle_run_flow(args):
+    import shlex
+    import subprocess
     flows = load_flows()
     name = args.run_flow
     if name not in flows:
@@ -168,7 +174,34 @@ def handle_self_awareness():
     sys.exit(0)
 
 
+def handle_metrics():
+    import metrics
+    for event, totals in metrics.summarize().items():
+        count = totals.pop('count')
+        fields = ", ".join(f"{k}={v:g}" for k, v in sorted(totals.items()))
+        print(f"{event}: {count} calls; {fields}")
+        if totals.get('prompt_tokens') and 'cached_tokens' in totals:
+            print(f"  prompt cache hit rate: {totals['cached_tokens'] / totals['prompt_tokens']:.1%}")
+    routes = metrics.summarize('llm_call', by='route')
+    if routes:
+        print("per route:")
+    for key, totals in sorted(routes.items()):
+        count = totals['count']
+        print(f"  {key.split(':', 1)[1]}: {count:g} calls, "
+              f"avg {totals.get('latency_ms', 0) / count:.0f} ms, "
+              f"{totals.get('prompt_tokens', 0):g} prompt / {totals.get('completion_tokens', 0):g} "
+              f"completion tokens, {totals.get('fallbacks', 0):g} fallbacks")
+    sys.exit(0)
+
+
 def handle_one_shot(args, ctx):
+    from client import handle_prompt_raw, reset_session
+    from rule_engine import check_step, format_violations
+    violations = check_step(args.prompt)
+    if violations:
+        print(format_violations(violations))
+        sys.exit(1)
+    reset_session()
     msg = handle_prompt_raw(args.prompt, ctx)
     if getattr(msg, 'function_call', None):
         print("⚠️ Function call skipped.")
@@ -176,6 +209,93 @@ def handle_one_shot(args, ctx):
         print(msg.content or '')
     sys.exit(0)
 
+# Daemon mode (--serve) and its thin client
+
+def _server_address(args):
+    import server
+    if args.port:
+        return ('127.0.0.1', args.port)
+    return os.path.expanduser(args.socket) if args.socket else server.SOCKET_PATH
+
+
+def handle_serve(args, ctx):
+    import server
+    service = server.AgentService(str(TASK_FILE), ctx, knowledge=load_reference_docs)
+    server.serve(service, _server_address(args))
+    sys.exit(0)
+
+
+def handle_remote_prompt(args, ctx):
+    import server
+    payload = {'op': 'prompt', 'prompt': args.prompt}
+    if ctx is not None:
+        payload['context'] = ctx
+    resp = server.request(_server_address(args), payload)
+    if not resp.get('ok'):
+        print(resp.get('error', 'request failed'))
+        sys.exit(1)
+    if resp.get('function_call'):
+        print("⚠️ Function call skipped.")
+    else:
+        print(resp.get('content', ''))
+    sys.exit(0)
+
+
+def handle_submit(args):
+    task = json.loads(Path(args.submit).read_text(encoding='utf-8'))
+    tasks = task if isinstance(task, list) else [task]
+    for t in tasks:
+        if args.socket or args.port:
+            import server
+            resp = server.request(_server_address(args), {'op': 'submit', 'task': t})
+            if not resp.get('ok'):
+                print(f"[!] {t.get('id')}: {resp.get('error')}")
+                sys.exit(1)
+        else:
+            try:
+                task_queue.submit_task(str(TASK_FILE), t)
+            except ValueError as e:
+                print(f"[!] {e}")
+                sys.exit(1)
+        print(f"[INFO] Queued task '{t.get('id')}'")
+    sys.exit(0)
+
+def _batch_backend(name):
+    import batch_mode
+    return batch_mode.backend_for(name, str(BATCH_DIR))
+
+def handle_batch_submit(args, ctx):
+    import batch_mode
+    from config import LLM_PROVIDER
+    name = 'local' if args.batch_local or LLM_PROVIDER == 'deepseek' else 'openai'
+    record = batch_mode.submit_batch(str(TASK_FILE), str(BATCH_STATE_FILE), str(JOURNAL_DIR),
+                                     _batch_backend(name), ctx, load_reference_docs,
+                                     str(BATCH_DIR))
+    if record is None:
+        print("No runnable steps to batch.")
+    else:
+        print(f"[INFO] Batch {record['id']} submitted with {len(record['items'])} steps")
+    sys.exit(0)
+
+def handle_batch_collect(args):
+    """Journal finished batch replies; the next auto-loop run dispatches them."""
+    import batch_mode
+    pending = batch_mode.pending_batches(str(BATCH_STATE_FILE))
+    ids = list(pending) if args.batch_collect == 'all' else [args.batch_collect]
+    if not ids:
+        print("No pending batches.")
+    for batch_id in ids:
+        if batch_id not in pending:
+            print(f"[!] Unknown batch '{batch_id}'")
+            sys.exit(1)
+        summary = batch_mode.collect_batch(batch_id, str(TASK_FILE), str(BATCH_STATE_FILE),
+                                           str(JOURNAL_DIR),
+                                           _batch_backend(pending[batch_id]['backend']),
+                                           interval=args.interval)
+        print(f"[INFO] Batch {batch_id} {summary['status']}: "
+              f"{summary['answered']}/{summary['requests']} replies journaled")
+    sys.exit(0)
+
 # Self-awareness logic
 
 def evaluate_self_awareness() -> str:
@@ -190,31 +310,92 @@ def evaluate_self_awareness() -> str:
 # Main auto-loop
 
 def run_auto_loop(ctx, interval):
-    tasks = load_tasks()
+    from client import handle_prompt_raw, reset_session, functions_for
+    from handlers.dispatch import dispatch_function
+    from journal import TaskJournal, message_record, prompt_hash, replay_message
+    from rule_engine import check_step, format_violations
+    from scheduler import BACKGROUND, request_priority
+    from prefetch import Prefetcher
+    from tool_cache import CACHE as tool_results, MUTATING
+    from tool_selection import step_text, step_tools
+    reset_session()
+    current_task = None
+    tool_history = defaultdict(list)
+    worker = task_queue.worker_id()
+    task_path = str(TASK_FILE)
+    prefetcher = Prefetcher(tool_results)
     stop_event = threading.Event()
     while not stop_event.wait(interval):
-        if not tasks:
-            print("No tasks. Add to tasks.json.")
-            break
-        task = tasks[0]
+        task = task_queue.claim_task(task_path, worker)
+        if task is None:
+            if not task_queue.load_tasks(task_path):
+                print("No tasks. Add to tasks.json.")
+                break
+            continue  # every task is leased by another worker
+        if task['id'] != current_task:
+            # Memoised tool results are scoped to one task
+            prefetcher.settle()
+            tool_results.clear()
+            current_task = task['id']
         idx = task.get('current_step',0)
         steps = task.get('steps',[])
-        if idx >= len(steps):
-            tasks.pop(0)
-            save_tasks(tasks)
-            continue
-        prompt = f"{load_reference_docs(task['id'])}\nTask {task['id']} step {idx+1}/{len(steps)}: {steps[idx]}"
-        resp = handle_prompt_raw(prompt, ctx)
+        text = step_text(steps[idx])
+        violations = check_step(text)
+        if violations:
+            print(format_violations(violations))
+            logging.error(f"{task['id']} rejected at step {idx+1}: {violations}")
+            task_queue.release_task(task_path, task['id'], worker)
+            break
+        prompt = task_queue.step_prompt(task, idx, text)
+        journal = TaskJournal(str(JOURNAL_DIR), task['id'])
+        phash = prompt_hash(task['id'], idx, prompt)
+        state = journal.resume(idx, phash)
+
+        if state.response is not None:
+            # Crash after the model answered: replay instead of paying again
+            logging.info(f"{task['id']} step {idx+1}: replaying journaled response")
+            resp = replay_message(state.response)
+        else:
+            knowledge = load_reference_docs(task['id'])
+            functions = functions_for(text, ctx, knowledge, tool_history[task['id']],
+                                      step_tools(steps[idx]), steps)
+            journal.record_prompt(idx, phash)
+            # Warm the tool cache for this and the next step while the model thinks
+            upcoming = step_text(steps[idx + 1]) if idx + 1 < len(steps) else ""
+            prefetcher.warm([text, upcoming])
+            with request_priority(BACKGROUND):
+                resp = handle_prompt_raw(prompt, ctx, functions, phase="auto_loop",
+                                         knowledge=knowledge)
+            journal.record_response(idx, phash, resp)
+
         if getattr(resp,'function_call',None):
-            result = dispatch_function(resp.function_call)
+            tool_history[task['id']].append(resp.function_call.name)
+            if state.result is not None:
+                result = state.result
+            elif state.intent is not None and journal.intent_applied(state.intent):
+                result = "ℹ️ Already applied before restart"
+                journal.record_result(idx, phash, result)
+            else:
+                journal.record_intent(idx, phash, message_record(resp)['function_call'])
+                if resp.function_call.name in MUTATING:
+                    prefetcher.settle()  # no prefetch may read what this call writes
+                result = dispatch_function(resp.function_call)
+                journal.record_result(idx, phash, result)
             print(result)
             if isinstance(result,str) and result.startswith('❌'):
                 logging.error(f"{task['id']} failed at step {idx+1}")
+                journal.record_failed(idx, phash)
+                task_queue.release_task(task_path, task['id'], worker)
                 break
-            task['current_step'] = idx+1
-            save_tasks(tasks)
+            if task_queue.advance_task(task_path, task['id'], worker, idx):
+                if idx + 1 >= len(steps):
+                    journal.close()
+                else:
+                    journal.record_committed(idx)
         else:
             print(resp.content or '')
+            # No action taken: the step stays open and is asked again next tick
+            journal.record_failed(idx, phash)
 
 # Entry point
 
@@ -227,7 +408,16 @@ def main():
     p.add_argument('--run-flow')
     p.add_argument('--self-awareness','-sa',action='store_true')
     p.add_argument('--feedback','-f')
+    p.add_argument('--metrics',action='store_true')
+    p.add_argument('--serve',action='store_true')
+    p.add_argument('--socket')
+    p.add_argument('--port',type=int)
+    p.add_argument('--submit')
+    p.add_argument('--batch-submit',action='store_true')
+    p.add_argument('--batch-collect',nargs='?',const='all')
+    p.add_argument('--batch-local',action='store_true')
     args = p.parse_args()
+    setup_environment()
     ctx = None
     if args.context_file:
         ctx = Path(args.context_file).read_text(encoding='utf-8')
@@ -235,6 +425,12 @@ def main():
     if args.run_flow:   handle_run_flow(args)
     if args.feedback:   handle_feedback(args)
     if args.self_awareness: handle_self_awareness()
+    if args.metrics:    handle_metrics()
+    if args.submit:     handle_submit(args)
+    if args.batch_submit: handle_batch_submit(args, ctx)
+    if args.batch_collect: handle_batch_collect(args)
+    if args.serve:      handle_serve(args, ctx)
+    if args.prompt and (args.socket or args.port): handle_remote_prompt(args, ctx)
     if args.prompt:     handle_one_shot(args,ctx)
     print("Jaime Agent CLI - type 'exit' to quit.")
     run_auto_loop(ctx, args.interval)
@@ -0,0 +1,196 @@
+# journal.py
+"""
+Write-ahead journal for run_auto_loop.
+
+Every step of a task appends fsync'ed JSON lines to
+<journal dir>/<task id>.jsonl as it reaches each durable point:
+
+    prompt     hash of the task id, step index and step prompt
+    response   the model reply (content / function_call)
+    intent     the call about to be dispatched (+ pre-stamp of its target)
+    result     the handler output
+    failed     the step failed or took no action; it is retried from scratch
+    committed  tasks.json was advanced past the step
+
+After a crash, `resume()` tells the loop how far the step got, so it can
+replay the recorded reply instead of calling the model again and skip a
+dispatch that already happened.  An intent without a result is considered
+applied when its target changed since the pre-stamp: the file's mtime/size
+for file writers, HEAD for git_commit and the upstream ref for git_push.
+Other calls are dispatched again.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+import subprocess
+from types import SimpleNamespace
+from typing import Any, NamedTuple, Optional
+
+FILE_WRITERS = {"write_file", "modify_file", "smart_modify_file"}
+# Git mutations → the ref they move
+GIT_REFS = {"git_commit": "HEAD", "git_push": "@{upstream}"}
+
+
+class StepState(NamedTuple):
+    response: Optional[dict] = None
+    intent: Optional[dict] = None
+    result: Optional[str] = None
+
+
+def prompt_hash(*parts: Any) -> str:
+    """Stable hash of everything that determines a step's model request."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str)
+                          .encode("utf-8")).hexdigest()[:16]
+
+
+def message_record(msg: Any) -> dict:
+    """Serialisable form of a model reply (SDK object or raw dict)."""
+    if isinstance(msg, dict):
+        content, call = msg.get("content"), msg.get("function_call")
+    else:
+        content, call = getattr(msg, "content", None), getattr(msg, "function_call", None)
+    record = {"content": content}
+    if call:
+        record["function_call"] = (
+            {"name": call.get("name"), "arguments": call.get("arguments")}
+            if isinstance(call, dict) else {"name": call.name, "arguments": call.arguments})
+    return record
+
+
+def replay_message(record: dict) -> SimpleNamespace:
+    """Rebuild an object shaped like the SDK reply from a journal record."""
+    call = record.get("function_call")
+    return SimpleNamespace(
+        role="assistant",
+        content=record.get("content"),
+        function_call=SimpleNamespace(**call) if call else None,
+    )
+
+
+def _file_stamp(path: str) -> Optional[list]:
+    try:
+        st = os.stat(os.path.abspath(os.path.expanduser(path)))
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _git_stamp(folder: str, ref: str) -> Optional[str]:
+    try:
+        proc = subprocess.run(["git", "rev-parse", "--verify", "--quiet", ref],
+                              cwd=os.path.expanduser(folder), capture_output=True,
+                              text=True, timeout=30)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return proc.stdout.strip() or None
+
+
+def _pre_stamp(call: dict):
+    """Stamp of what `call` would change, or None for calls without one."""
+    args = _call_args(call)
+    if call.get("name") in FILE_WRITERS:
+        return _file_stamp(args.get("path", ""))
+    if call.get("name") in GIT_REFS:
+        return _git_stamp(args.get("folder_path") or ".", GIT_REFS[call["name"]])
+    return None
+
+
+def _call_args(call: dict) -> dict:
+    args = call.get("arguments") or {}
+    if isinstance(args, str):
+        try:
+            args = json.loads(args)
+        except json.JSONDecodeError:
+            return {}
+    return args if isinstance(args, dict) else {}
+
+
+class TaskJournal:
+    def __init__(self, directory: str, task_id: str):
+        os.makedirs(directory, exist_ok=True)
+        safe = re.sub(r"[^\w.-]", "_", task_id)
+        self.path = os.path.join(directory, f"{safe}.jsonl")
+
+    def _append(self, entry: dict) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _entries(self) -> list[dict]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return []
+        out = []
+        for line in lines:
+            try:
+                out.append(json.loads(line))
+            except json.JSONDecodeError:
+                break  # torn last line from a crash mid-write
+        return out
+
+    # ----- recording ------------------------------------------------------ #
+    def record_prompt(self, step: int, phash: str) -> None:
+        self._append({"step": step, "phase": "prompt", "hash": phash})
+
+    def record_response(self, step: int, phash: str, msg: Any) -> None:
+        self._append({"step": step, "phase": "response", "hash": phash,
+                      "message": message_record(msg)})
+
+    def record_intent(self, step: int, phash: str, call: dict) -> None:
+        entry = {"step": step, "phase": "intent", "hash": phash, "call": call}
+        if call.get("name") in FILE_WRITERS or call.get("name") in GIT_REFS:
+            entry["pre"] = _pre_stamp(call)
+        self._append(entry)
+
+    def record_result(self, step: int, phash: str, result: str) -> None:
+        self._append({"step": step, "phase": "result", "hash": phash, "result": result})
+
+    def record_failed(self, step: int, phash: str) -> None:
+        self._append({"step": step, "phase": "failed", "hash": phash})
+
+    def record_committed(self, step: int) -> None:
+        self._append({"step": step, "phase": "committed"})
+
+    def close(self) -> None:
+        """Remove the journal once the task is finished."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    # ----- recovery ------------------------------------------------------- #
+    def resume(self, step: int, phash: str) -> StepState:
+        """Return how far `step` got with this prompt before the last stop."""
+        state = StepState()
+        for e in self._entries():
+            if e.get("step") != step:
+                continue
+            phase = e.get("phase")
+            if phase in ("failed", "committed") or e.get("hash") != phash:
+                state = StepState()
+            elif phase == "response":
+                state = StepState(response=e["message"])
+            elif phase == "intent":
+                state = state._replace(intent=e)
+            elif phase == "result":
+                state = state._replace(result=e["result"])
+        return state
+
+    @staticmethod
+    def intent_applied(intent: dict) -> bool:
+        """Best guess whether a dispatched-but-unrecorded call took effect."""
+        call = intent.get("call") or {}
+        if call.get("name") not in FILE_WRITERS and call.get("name") not in GIT_REFS:
+            return False
+        if _pre_stamp(call) != intent.get("pre"):
+            logging.info(f"journal: {call.get('name')} already applied before restart")
+            return True
+        return False
@@ -0,0 +1,193 @@
+# knowledge_cache.py
+"""
+Incremental cache for the knowledge context injected into prompts.
+
+* Files are cached individually and keyed by (path, mtime_ns, size); a change
+  feed polls the directory with os.scandir (metadata only) at most once per
+  `poll_interval` and re-reads just the files that changed, appeared or
+  vanished.  Each change bumps a generation counter.
+* Assembled contexts are memoised per (query, extra paths, generation) in a
+  small LRU bounded both by entry count and by total characters.
+* File texts are bounded too: past `max_file_chars` the least recently used
+  texts are dropped (their stamps stay, so this is not a change) and read
+  again on next use.  Extra paths are kept for the `max_extra` most recently
+  requested ones, and forgotten once their file is gone.
+
+A hot step therefore reads no knowledge files at all, while an edit under
+knowledge/ shows up on the first step after the next poll.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from fnmatch import fnmatch
+from typing import Callable, Iterable, Optional
+
+Docs = list[tuple[str, str]]
+
+
+class KnowledgeCache:
+    def __init__(self, directory: str, pattern: str = "*.txt",
+                 poll_interval: float = 1.0, max_contexts: int = 16,
+                 max_chars: int = 4_000_000, max_file_chars: int = 16_000_000,
+                 max_extra: int = 64):
+        self.directory = str(directory)
+        self.pattern = pattern
+        self.poll_interval = poll_interval
+        self.max_contexts = max_contexts
+        self.max_chars = max_chars
+        self.max_file_chars = max_file_chars
+        self.max_extra = max_extra
+        self.generation = 0
+        # path → (mtime_ns, size, text or None once evicted), least recently used first
+        self._files: OrderedDict[str, tuple[int, int, Optional[str]]] = OrderedDict()
+        self._file_chars = 0
+        self._extra: OrderedDict[str, None] = OrderedDict()
+        self._polled_at = float("-inf")
+        self._contexts: OrderedDict[tuple, str] = OrderedDict()
+        self._context_chars = 0
+        self._lock = threading.RLock()
+
+    # ----- file texts ----------------------------------------------------- #
+    def _set(self, path: str, entry: Optional[tuple[int, int, Optional[str]]]) -> None:
+        old = self._files.pop(path, None)
+        if old and old[2] is not None:
+            self._file_chars -= len(old[2])
+        if entry is not None:
+            self._files[path] = entry
+            if entry[2] is not None:
+                self._file_chars += len(entry[2])
+
+    def _trim(self) -> None:
+        """Drop least recently used texts beyond max_file_chars."""
+        for path in list(self._files):
+            if self._file_chars <= self.max_file_chars:
+                break
+            mtime, size, text = self._files[path]
+            if text is not None:
+                self._files[path] = (mtime, size, None)
+                self._file_chars -= len(text)
+
+    def _text(self, path: str) -> Optional[str]:
+        """Text of a known file, re-reading it if it was evicted."""
+        mtime, size, text = self._files[path]
+        if text is None:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    text = f.read()
+            except (OSError, UnicodeDecodeError):
+                logging.error(f"Error reading {path}")
+                return None
+            self._set(path, (mtime, size, text))
+        else:
+            self._files.move_to_end(path)
+        return text
+
+    # ----- change feed --------------------------------------------------- #
+    def _read(self, path: str, stamp: tuple[int, int]) -> bool:
+        """(Re)load one file if its stamp changed; True when content changed."""
+        cached = self._files.get(path)
+        if cached and cached[:2] == stamp:
+            return False
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except (OSError, UnicodeDecodeError):
+            logging.error(f"Error reading {path}")
+            if path not in self._files:
+                return False
+            self._set(path, None)
+            return True
+        self._set(path, (stamp[0], stamp[1], text))
+        logging.debug(f"knowledge cache: loaded {os.path.basename(path)}")
+        return True
+
+    def poll(self, force: bool = False) -> bool:
+        """Pick up added, edited and removed files; True if anything changed."""
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._polled_at < self.poll_interval:
+                return False
+            self._polled_at = now
+
+            seen: dict[str, tuple[int, int]] = {}
+            try:
+                with os.scandir(self.directory) as it:
+                    for entry in it:
+                        if entry.is_file() and fnmatch(entry.name, self.pattern):
+                            st = entry.stat()
+                            seen[entry.path] = (st.st_mtime_ns, st.st_size)
+            except FileNotFoundError:
+                pass
+            for path in list(self._extra):
+                try:
+                    st = os.stat(path)
+                    seen[path] = (st.st_mtime_ns, st.st_size)
+                except OSError:
+                    del self._extra[path]  # gone: stop watching it
+
+            changed = False
+            for path in [p for p in self._files if p not in seen]:
+                self._set(path, None)
+                changed = True
+            for path, stamp in seen.items():
+                changed |= self._read(path, stamp)
+            self._trim()
+            if changed:
+                self.generation += 1
+                self._contexts.clear()
+                self._context_chars = 0
+            return changed
+
+    # ----- assembled contexts -------------------------------------------- #
+    def _paths(self, extra: list[str]) -> list[str]:
+        """Track `extra`, poll, and return the document paths in order."""
+        new = [p for p in extra if p not in self._extra]
+        for p in extra:
+            self._extra[p] = None
+            self._extra.move_to_end(p)
+        while len(self._extra) > self.max_extra:
+            self._extra.popitem(last=False)
+        self.poll(force=bool(new))
+        listed = set(extra)
+        paths = [p for p in extra if p in self._files]
+        paths += [p for p in sorted(self._files, key=os.path.basename)
+                  if p not in listed and p not in self._extra]
+        return paths
+
+    def _documents(self, paths: list[str]) -> Docs:
+        docs = [(os.path.basename(p), text) for p in paths
+                if (text := self._text(p)) is not None]
+        self._trim()
+        return docs
+
+    def documents(self, extra: Iterable[str] = ()) -> Docs:
+        """(name, text) for `extra` paths, then the directory files by name."""
+        with self._lock:
+            return self._documents(self._paths([str(p) for p in extra]))
+
+    def context(self, query: str, assemble: Callable[[Docs], str],
+                extra: Iterable[str] = ()) -> str:
+        """Return the assembled context for `query`, reusing it while unchanged."""
+        with self._lock:
+            extra = tuple(str(p) for p in extra)
+            paths = self._paths(list(extra))
+            key = (query, extra, self.generation)
+            hit: Optional[str] = self._contexts.get(key)
+            if hit is not None:
+                self._contexts.move_to_end(key)
+                return hit
+
+            docs = self._documents(paths)
+            text = assemble(docs)
+            self._contexts[key] = text
+            self._context_chars += len(text)
+            while self._contexts and (len(self._contexts) > self.max_contexts
+                                      or self._context_chars > self.max_chars):
+                _, old = self._contexts.popitem(last=False)
+                self._context_chars -= len(old)
+            return text
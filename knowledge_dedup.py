@@ -0,0 +1,174 @@
+# knowledge_dedup.py
+"""
+Chunk-level near-duplicate removal for the knowledge context.
+
+Documents are split into paragraph chunks, every chunk gets a MinHash
+signature over word shingles, and LSH banding finds candidate pairs that are
+confirmed by estimated Jaccard similarity.  Each cluster of near-duplicates
+contributes one representative (its longest chunk) to the prompt.
+
+Signatures are keyed by the chunk's content hash and persisted in
+CACHE_DIR/knowledge_signatures.json, so only new or edited chunks are hashed
+on later runs.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import random
+import re
+
+from config import CACHE_DIR
+from file_lock import locked, read_json, write_json_atomic
+
+SIGNATURE_PATH = os.path.join(CACHE_DIR, "knowledge_signatures.json")
+
+NUM_PERM = 64
+BANDS = 16                      # 16 bands x 4 rows ≈ 0.5 similarity knee
+ROWS = NUM_PERM // BANDS
+SHINGLE_WORDS = 3
+THRESHOLD = float(os.getenv("JAIME_DEDUP_THRESHOLD", "0.7"))
+MAX_CHUNK_CHARS = 800
+MAX_SIGNATURES = 5000
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(0x4A41494D45)  # fixed seed: signatures must be stable on disk
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+_WORD = re.compile(r"\w+")
+
+
+def chunk_text(text: str, max_chars: int = MAX_CHUNK_CHARS) -> list[str]:
+    """Split on blank lines, merging short paragraphs up to `max_chars`."""
+    chunks: list[str] = []
+    current = ""
+    for para in re.split(r"\n\s*\n", text.strip()):
+        para = para.strip()
+        if not para:
+            continue
+        if current and len(current) + len(para) + 2 > max_chars:
+            chunks.append(current)
+            current = para
+        else:
+            current = f"{current}\n\n{para}" if current else para
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _shingles(text: str) -> set[str]:
+    words = _WORD.findall(text.lower())
+    if len(words) <= SHINGLE_WORDS:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_WORDS])
+            for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def minhash(text: str) -> list[int]:
+    """MinHash signature of `text` (NUM_PERM ints)."""
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+              for s in _shingles(text)]
+    if not hashes:
+        return [_PRIME] * NUM_PERM
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMS]
+
+
+def similarity(sig_a: list[int], sig_b: list[int]) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / NUM_PERM
+
+
+def _chunk_key(chunk: str) -> str:
+    return hashlib.sha1(" ".join(_WORD.findall(chunk.lower())).encode("utf-8")).hexdigest()
+
+
+class SignatureStore:
+    """Persistent chunk-hash → signature map, loaded once per process."""
+
+    def __init__(self, path: str = SIGNATURE_PATH):
+        self.path = path
+        self._sigs: dict[str, list[int]] | None = None
+        self._dirty = False
+
+    def _load(self) -> dict[str, list[int]]:
+        if self._sigs is None:
+            data = read_json(self.path, {})
+            self._sigs = data if isinstance(data, dict) else {}
+        return self._sigs
+
+    def get(self, chunk: str) -> list[int]:
+        sigs = self._load()
+        key = _chunk_key(chunk)
+        sig = sigs.pop(key, None)
+        if sig is None:
+            sig = minhash(chunk)
+            self._dirty = True
+        sigs[key] = sig  # most recently used last: flush() keeps the tail
+        return sig
+
+    def flush(self) -> None:
+        """Persist new signatures, keeping the MAX_SIGNATURES most recently used."""
+        if not self._dirty:
+            return
+        sigs = self._load()
+        if len(sigs) > MAX_SIGNATURES:
+            self._sigs = sigs = dict(list(sigs.items())[-MAX_SIGNATURES:])
+        try:
+            with locked(self.path):
+                write_json_atomic(self.path, sigs, indent=None)
+            self._dirty = False
+        except OSError as e:
+            logging.warning(f"Could not persist knowledge signatures: {e}")
+
+
+_store = SignatureStore()
+
+
+def _clusters(sigs: list[list[int]], threshold: float) -> list[int]:
+    """Union-find over LSH candidates; returns the root index of every chunk."""
+    parent = list(range(len(sigs)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for band in range(BANDS):
+        buckets: dict[tuple, list[int]] = {}
+        for i, sig in enumerate(sigs):
+            buckets.setdefault(tuple(sig[band * ROWS:(band + 1) * ROWS]), []).append(i)
+        for members in buckets.values():
+            for j in members[1:]:
+                a, b = find(members[0]), find(j)
+                if a != b and similarity(sigs[members[0]], sigs[j]) >= threshold:
+                    parent[b] = a
+    return [find(i) for i in range(len(sigs))]
+
+
+def dedupe_documents(docs: list[tuple[str, str]], threshold: float = THRESHOLD,
+                     store: SignatureStore = _store) -> list[tuple[str, str]]:
+    """Return `docs` ([(name, text)]) with near-duplicate chunks removed.
+
+    Each cluster keeps its longest chunk, in the document where it occurs;
+    documents left without chunks are dropped.
+    """
+    chunks = [(d, chunk) for d, (_, text) in enumerate(docs) for chunk in chunk_text(text)]
+    if not chunks:
+        return []
+    sigs = [store.get(chunk) for _, chunk in chunks]
+    roots = _clusters(sigs, threshold)
+    store.flush()
+
+    best: dict[int, int] = {}
+    for i, root in enumerate(roots):
+        if root not in best or len(chunks[i][1]) > len(chunks[best[root]][1]):
+            best[root] = i
+    kept = set(best.values())
+
+    bodies: dict[int, list[str]] = {}
+    for i, (d, chunk) in enumerate(chunks):
+        if i in kept:
+            bodies.setdefault(d, []).append(chunk)
+    return [(docs[d][0], "\n\n".join(body)) for d, body in sorted(bodies.items())]
@@ -0,0 +1,273 @@
+# memory_retention.py
+"""
+Rolling summarisation that keeps session memory bounded.
+
+After each append, handlers/append_json.py asks `over_limit()` whether the
+session breaks the retention policy:
+
+    JAIME_MEMORY_KEEP          recent messages kept verbatim (20)
+    JAIME_MEMORY_MAX_MESSAGES  fold once the log is longer than this (60)
+    JAIME_MEMORY_MAX_BYTES     ... or its file is larger than this (256 000)
+    JAIME_MEMORY_MAX_TOKENS    ... or, if set, its estimated tokens exceed this
+    JAIME_MEMORY_MAX_AGE_DAYS  ... and, if set, fold messages older than this
+    JAIME_MEMORY_LOW_WATER     share of the limits left after folding (0.5)
+
+If it does, the session is queued for the background worker, which folds
+everything before the recent window (plus any aged-out messages) into one
+summary message at the head of the log.  It folds on, into the recent
+window if need be (the last MIN_KEEP messages always stay), until what is
+left is under the low-water mark, so a small byte or token limit does not
+trigger a compaction on every append.  The summary itself is bounded by
+SUMMARY_MAX_CHARS and does not count towards the limits.  A previous summary is folded into
+the next one, so the log never holds more than one summary plus the recent
+turns.  The summariser is extractive and local by default; with
+JAIME_MEMORY_SUMMARIZER=model it uses the "summarize" model route and falls
+back to the extractive one on errors.
+
+The summary is computed without holding the session lock; the result is
+only written if the folded messages are still unchanged at the head.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+import blob_store
+import metrics
+from file_lock import locked, read_json, write_json_atomic
+
+SUMMARY_HEADER = "SUMMARY OF EARLIER TURNS:"
+SUMMARY_MAX_CHARS = 4000
+LINE_CHARS = 200
+MODEL_INPUT_CHARS = 16000
+MIN_KEEP = 2
+
+Message = Dict[str, Any]
+
+
+def _env_float(name: str) -> Optional[float]:
+    value = os.getenv(name)
+    return float(value) if value else None
+
+
+class Policy(NamedTuple):
+    keep_recent: int = 20
+    max_messages: int = 60
+    max_bytes: int = 256_000
+    max_age_s: Optional[float] = None
+    low_water: float = 0.5
+
+    @classmethod
+    def from_env(cls) -> "Policy":
+        max_bytes = int(os.getenv("JAIME_MEMORY_MAX_BYTES", "256000"))
+        tokens = _env_float("JAIME_MEMORY_MAX_TOKENS")
+        if tokens:
+            max_bytes = min(max_bytes, int(tokens * 4))  # ~4 bytes per token
+        days = _env_float("JAIME_MEMORY_MAX_AGE_DAYS")
+        return cls(keep_recent=int(os.getenv("JAIME_MEMORY_KEEP", "20")),
+                   max_messages=int(os.getenv("JAIME_MEMORY_MAX_MESSAGES", "60")),
+                   max_bytes=max_bytes,
+                   max_age_s=days * 86400 if days else None,
+                   low_water=float(os.getenv("JAIME_MEMORY_LOW_WATER", "0.5")))
+
+
+# --------------------------------------------------------------------------- #
+#  Policy checks
+# --------------------------------------------------------------------------- #
+def _size(m: Message) -> int:
+    """Approximate bytes `m` takes in the session file."""
+    return len(json.dumps(m, indent=2, ensure_ascii=False).encode("utf-8"))
+
+
+def _aged(messages: List[Message], policy: Policy, now: float) -> int:
+    """Number of leading messages older than the age limit."""
+    if policy.max_age_s is None:
+        return 0
+    cutoff = now - policy.max_age_s
+    n = 0
+    for m in messages:
+        if m.get("summary") or (m.get("ts") or now) < cutoff:
+            n += 1
+        else:
+            break
+    # A lone summary is not "aged"
+    return 0 if n == 1 and messages[0].get("summary") else n
+
+
+def over_limit(messages: List[Message], size: int, policy: Policy,
+               now: Optional[float] = None) -> bool:
+    """True when the session should be compacted."""
+    now = time.time() if now is None else now
+    summarised = bool(messages and messages[0].get("summary"))
+    aged = _aged(messages, policy, now)
+    if len(messages) - summarised <= MIN_KEEP and not aged:
+        return False
+    if summarised:
+        size -= _size(messages[0])
+    return len(messages) > policy.max_messages or size > policy.max_bytes or bool(aged)
+
+
+def split_point(messages: List[Message], policy: Policy, now: Optional[float] = None) -> int:
+    """How many leading messages to fold into the summary (0 = none)."""
+    now = time.time() if now is None else now
+    fold = max(len(messages) - policy.keep_recent, _aged(messages, policy, now), 0)
+    # Fold down to the low-water mark, not just under the limit
+    kept = sum(_size(m) for m in messages[fold:])
+    while fold < len(messages) - MIN_KEEP and (
+            kept > policy.max_bytes * policy.low_water
+            or len(messages) - fold > policy.max_messages * policy.low_water):
+        kept -= _size(messages[fold])
+        fold += 1
+    # Do not orphan a tool result from the call that produced it
+    while 0 < fold < len(messages) and messages[fold].get("role") == "tool":
+        fold += 1
+    if fold == 1 and messages[0].get("summary"):
+        return 0
+    return fold
+
+
+# --------------------------------------------------------------------------- #
+#  Summarisers
+# --------------------------------------------------------------------------- #
+def _clip(text: str, limit: int = LINE_CHARS) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+def _line(m: Message) -> Optional[str]:
+    role = m.get("role") or "?"
+    call = m.get("function_call")
+    if call:
+        name = call.get("name") if isinstance(call, dict) else getattr(call, "name", "?")
+        args = call.get("arguments") if isinstance(call, dict) else getattr(call, "arguments", "")
+        return f"- {role} called {name}({_clip(str(args or ''), 120)})"
+    content = m.get("content")
+    if not isinstance(content, str) or not content.strip():
+        return None
+    if m.get("blob"):
+        content = m["blob"].get("preview", "")
+        size = m["blob"].get("size", 0)
+    else:
+        size = len(content)
+    if role == "tool":
+        first = next((l for l in content.splitlines() if l.strip()), "")
+        return f"- tool result: {_clip(first, 160)} ({size} chars)"
+    return f"- {role}: {_clip(content)}"
+
+
+def _previous(folded: List[Message]) -> List[str]:
+    if folded and folded[0].get("summary"):
+        return [l for l in folded[0]["content"].splitlines()[1:] if l.strip()]
+    return []
+
+
+def extractive_summary(folded: List[Message], max_chars: int = SUMMARY_MAX_CHARS) -> str:
+    """One line per folded turn; the oldest lines go first when over budget."""
+    lines = [l for l in _previous(folded) if not l.startswith("- … ")]
+    lines += [l for l in (_line(m) for m in folded if not m.get("summary")) if l]
+    dropped = False
+    while lines and sum(len(l) + 1 for l in lines) > max_chars:
+        lines.pop(0)
+        dropped = True
+    if dropped:
+        lines.insert(0, "- … (older turns omitted)")
+    return "\n".join(lines)
+
+
+def model_summary(folded: List[Message], max_chars: int = SUMMARY_MAX_CHARS) -> str:
+    """Ask the cheap "summarize" route for a summary (raises on failure)."""
+    from client import complete
+    transcript = extractive_summary(folded, MODEL_INPUT_CHARS)
+    text = complete([
+        {"role": "system", "content":
+            "Summarize this agent conversation log for later turns. Keep file paths, "
+            "decisions, tool results that matter and unresolved errors. Use short "
+            f"bullet points, at most {max_chars // 6} words."},
+        {"role": "user", "content": transcript},
+    ], phase="summarize")
+    if not text.strip():
+        raise ValueError("empty summary")
+    return text.strip()[:max_chars]
+
+
+def summarize(folded: List[Message]) -> str:
+    if os.getenv("JAIME_MEMORY_SUMMARIZER", "extractive") == "model":
+        try:
+            return model_summary(folded)
+        except Exception as e:
+            logging.warning(f"memory summary via model failed ({e}); using extractive")
+    return extractive_summary(folded)
+
+
+# --------------------------------------------------------------------------- #
+#  Compaction
+# --------------------------------------------------------------------------- #
+def compact_file(path: str, policy: Optional[Policy] = None,
+                 summarizer: Callable[[List[Message]], str] = summarize) -> bool:
+    """Fold the old part of the session at `path`; True if it was rewritten."""
+    policy = policy or Policy.from_env()
+    started = time.perf_counter()
+    with locked(path, shared=True):
+        data = read_json(path, [])
+    if not isinstance(data, list):
+        return False
+    fold = split_point(data, policy)
+    if not fold:
+        return False
+    head = data[:fold]
+    covers = sum(m.get("covers", 1) if m.get("summary") else 1 for m in head)
+    summary = {"role": "system", "content": f"{SUMMARY_HEADER}\n{summarizer(head)}",
+               "summary": True, "covers": covers, "ts": round(time.time(), 3)}
+
+    with locked(path):
+        current = read_json(path, [])
+        if not isinstance(current, list) or current[:fold] != head:
+            return False  # reset or compacted concurrently; the next append retries
+        compacted = [summary] + current[fold:]
+        write_json_atomic(path, compacted)
+    # Folded stubs may have been the last references to their blobs
+    blob_store.collect_garbage(os.path.dirname(path))
+    metrics.record("memory_compaction", folded=fold, kept=len(compacted) - 1,
+                   bytes_before=len(json.dumps(current, ensure_ascii=False)),
+                   bytes_after=len(json.dumps(compacted, ensure_ascii=False)),
+                   ms=round((time.perf_counter() - started) * 1000, 1))
+    return True
+
+
+class RetentionWorker:
+    """Background thread compacting queued session files one at a time."""
+
+    def __init__(self, policy: Optional[Policy] = None):
+        self.policy = policy or Policy.from_env()
+        self._queue: List[str] = []
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def schedule(self, path: str) -> None:
+        with self._cond:
+            if path not in self._queue:
+                self._queue.append(path)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="memory-retention",
+                                                daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                path = self._queue.pop(0)
+            try:
+                compact_file(path, self.policy)
+            except Exception as e:  # never take the agent down over housekeeping
+                logging.warning(f"memory compaction of {path} failed: {e}")
+
+
+WORKER = RetentionWorker()
@@ -0,0 +1,58 @@
+# metrics.py
+"""
+Tiny append-only metrics log (metrics.jsonl at project root).
+
+Each call to `record()` writes one JSON line; `summarize()` folds the log
+back into per-event counts and numeric totals so savings can be compared
+across runs without extra tooling.
+"""
+
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+METRICS_PATH = os.path.join(HERE, "metrics.jsonl")
+
+
+def record(event: str, **fields: Any) -> None:
+    """Append one metrics event; never raises into the caller."""
+    entry = {"ts": round(time.time(), 3), "event": event, **fields}
+    try:
+        with open(METRICS_PATH, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+    except OSError as e:
+        logging.debug(f"metrics write failed: {e}")
+
+
+def summarize(event: Optional[str] = None,
+              by: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+    """Return {event: {"count": n, <numeric field>: total, ...}}.
+
+    With `by`, events are further split on that field ("llm_call:validation").
+    """
+    totals: Dict[str, Dict[str, float]] = {}
+    try:
+        with open(METRICS_PATH, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        return totals
+
+    for line in lines:
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        name = entry.get("event")
+        if event is not None and name != event:
+            continue
+        if by is not None:
+            name = f"{name}:{entry.get(by)}"
+        bucket = totals.setdefault(name, {"count": 0})
+        bucket["count"] += 1
+        for key, value in entry.items():
+            if key != "ts" and isinstance(value, (int, float)) and not isinstance(value, bool):
+                bucket[key] = bucket.get(key, 0) + value
+    return totals
@@ -0,0 +1,86 @@
+# model_router.py
+"""
+Per-phase model routing.
+
+Routes come from config.MODEL_ROUTES, optionally overridden by the JSON file
+named in JAIME_MODEL_ROUTES:
+
+    {"validation": {"targets": ["deepseek:qwen2.5-coder", "openai:gpt-4o-mini"],
+                    "timeout": 20},
+     "smart_modify_file": {"targets": ["openai:gpt-4o"], "timeout": 300}}
+
+A route is an ordered fallback chain: client._route_call tries each target
+in turn (through that provider's rate-limit scheduler) and moves on when one
+fails.  Phases are the `phase` names used by client ("prompt", "validation",
+"execution", "auto_loop", "serve", "summarize") and LLM-calling handlers
+("smart_modify_file"); anything unlisted uses "default".  Batch mode has no
+route of its own: it sends the OpenAI model of the "auto_loop" route.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from functools import lru_cache
+from typing import Any, NamedTuple
+
+from config import MODEL_ROUTES
+from file_lock import read_json
+
+PROVIDERS = ("openai", "deepseek")
+DEFAULT_TIMEOUT = 120.0
+
+
+class Target(NamedTuple):
+    provider: str
+    model: str
+    timeout: float
+
+    def __str__(self) -> str:
+        return f"{self.provider}:{self.model}"
+
+
+class Route(NamedTuple):
+    name: str
+    targets: tuple
+
+
+def _target(item: Any, timeout: float) -> Target:
+    if isinstance(item, str):
+        provider, sep, model = item.partition(":")
+        item = {"provider": provider, "model": model} if sep else {"provider": "", "model": ""}
+    provider, model = item.get("provider"), item.get("model")
+    if provider not in PROVIDERS or not model:
+        raise ValueError(f"invalid route target {item!r}; expected '<provider>:<model>' "
+                         f"with provider in {PROVIDERS}")
+    return Target(provider, model, float(item.get("timeout", timeout)))
+
+
+def load_routes() -> dict[str, Route]:
+    """Built-in routes merged with the JAIME_MODEL_ROUTES override file."""
+    raw = dict(MODEL_ROUTES)
+    override = os.getenv("JAIME_MODEL_ROUTES")
+    if override:
+        extra = read_json(override, None)
+        if isinstance(extra, dict):
+            raw.update(extra)
+        else:
+            logging.warning(f"Ignoring JAIME_MODEL_ROUTES={override}: not a JSON object")
+    routes = {}
+    for name, spec in raw.items():
+        timeout = float(spec.get("timeout", DEFAULT_TIMEOUT))
+        targets = tuple(_target(t, timeout) for t in spec.get("targets", []))
+        if not targets:
+            raise ValueError(f"route '{name}' has no targets")
+        routes[name] = Route(name, targets)
+    return routes
+
+
+@lru_cache(maxsize=1)
+def _routes() -> dict[str, Route]:
+    return load_routes()
+
+
+def route_for(phase: str) -> Route:
+    routes = _routes()
+    return routes.get(phase) or routes["default"]
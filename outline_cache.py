@@ -0,0 +1,167 @@
+# outline_cache.py
+"""
+Structure of Python sources without reading them into the prompt.
+
+`outline(path)` parses a file with `ast` and returns its module docstring
+and symbols (classes, functions, methods, module-level assignments and
+calls) with signatures, first docstring lines and line spans.  Outlines are
+cached by absolute path and validated against (mtime_ns, size); the cache is
+persisted in CACHE_DIR/outlines.json, so unchanged files are never re-parsed
+across runs.
+
+`symbol_source(path, name)` uses the cached spans to return just the lines
+of one symbol ("ResultCache.lookup" or a bare "lookup").
+"""
+
+from __future__ import annotations
+
+import ast
+import logging
+import os
+import threading
+from typing import Any, Optional
+
+from config import CACHE_DIR
+from file_lock import locked, read_json, write_json_atomic
+
+OUTLINE_PATH = os.path.join(CACHE_DIR, "outlines.json")
+MAX_OUTLINES = 20000
+# Bumped whenever the outline format changes, invalidating persisted entries
+VERSION = 1
+
+
+def _first_line(doc: Optional[str]) -> str:
+    return doc.strip().splitlines()[0] if doc and doc.strip() else ""
+
+
+def _signature(node: ast.AST) -> str:
+    if isinstance(node, ast.ClassDef):
+        bases = [ast.unparse(b) for b in node.bases] + [ast.unparse(k) for k in node.keywords]
+        return f"class {node.name}({', '.join(bases)})" if bases else f"class {node.name}"
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+    return f"{prefix} {node.name}({ast.unparse(node.args)}){returns}"
+
+
+def _symbols(body: list, parent: str = "", depth: int = 0) -> list[dict]:
+    out = []
+    for node in body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            name = f"{parent}.{node.name}" if parent else node.name
+            kind = ("class" if isinstance(node, ast.ClassDef)
+                    else "method" if parent else "function")
+            start = min([d.lineno for d in node.decorator_list] + [node.lineno])
+            out.append({"kind": kind, "name": name, "signature": _signature(node),
+                        "doc": _first_line(ast.get_docstring(node)),
+                        "start": start, "end": node.end_lineno, "depth": depth})
+            if isinstance(node, ast.ClassDef):
+                out += _symbols(node.body, name, depth + 1)
+        elif not parent and isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for target in targets:
+                if isinstance(target, ast.Name):
+                    out.append({"kind": "variable", "name": target.id,
+                                "signature": target.id, "doc": "",
+                                "start": node.lineno, "end": node.end_lineno, "depth": 0})
+        elif not parent and isinstance(node, ast.Expr) and isinstance(node.value, ast.Call):
+            # Module-level calls such as FUNCTIONS.append({...}) extend a structure
+            func = ast.unparse(node.value.func)
+            out.append({"kind": "call", "name": func, "signature": f"{func}(...)",
+                        "doc": "", "start": node.lineno, "end": node.end_lineno, "depth": 0})
+    return out
+
+
+def parse_outline(source: str) -> dict[str, Any]:
+    """Outline of Python `source` (raises SyntaxError)."""
+    tree = ast.parse(source)
+    return {"doc": _first_line(ast.get_docstring(tree)),
+            "lines": source.count("\n") + 1,
+            "symbols": _symbols(tree.body)}
+
+
+class OutlineCache:
+    """Persistent (path, mtime_ns, size) → outline map, loaded once per process."""
+
+    def __init__(self, path: str = OUTLINE_PATH):
+        self.path = path
+        self._entries: Optional[dict[str, dict]] = None
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict[str, dict]:
+        if self._entries is None:
+            data = read_json(self.path, {})
+            ok = isinstance(data, dict) and data.get("version") == VERSION
+            self._entries = data.get("files", {}) if ok else {}
+        return self._entries
+
+    def outline(self, path: str) -> dict[str, Any]:
+        """Outline of the file at `path` (raises OSError / SyntaxError)."""
+        path = os.path.abspath(os.path.expanduser(path))
+        st = os.stat(path)
+        stamp = [st.st_mtime_ns, st.st_size]
+        with self._lock:
+            entry = self._load().get(path)
+            if entry and entry["stamp"] == stamp:
+                return entry["outline"]
+        with open(path, "r", encoding="utf-8") as f:
+            result = parse_outline(f.read())
+        with self._lock:
+            entries = self._load()
+            entries.pop(path, None)  # re-insert so the newest entries are kept
+            entries[path] = {"stamp": stamp, "outline": result}
+            self._dirty = True
+        return result
+
+    def flush(self) -> None:
+        """Persist new outlines, keeping only the most recent MAX_OUTLINES."""
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = self._load()
+            if len(entries) > MAX_OUTLINES:
+                self._entries = entries = dict(list(entries.items())[-MAX_OUTLINES:])
+            try:
+                with locked(self.path):
+                    write_json_atomic(self.path, {"version": VERSION, "files": entries},
+                                      indent=None)
+                self._dirty = False
+            except OSError as e:
+                logging.warning(f"Could not persist outline cache: {e}")
+
+
+CACHE = OutlineCache()
+
+
+def find_symbols(outline: dict[str, Any], name: str) -> list[dict]:
+    """Symbols whose qualified name is `name` or ends with '.<name>'."""
+    exact = [s for s in outline["symbols"] if s["name"] == name]
+    return exact or [s for s in outline["symbols"] if s["name"].endswith(f".{name}")]
+
+
+def symbol_source(path: str, name: str, cache: OutlineCache = CACHE) -> tuple[list[dict], str]:
+    """(matching symbols, source of the first match with line numbers)."""
+    matches = find_symbols(cache.outline(path), name)
+    if not matches:
+        return [], ""
+    sym = matches[0]
+    with open(os.path.expanduser(path), "r", encoding="utf-8") as f:
+        lines = f.read().splitlines()[sym["start"] - 1:sym["end"]]
+    width = len(str(sym["end"]))
+    return matches, "\n".join(f"{sym['start'] + i:>{width}}  {line}" for i, line in enumerate(lines))
+
+
+def format_outline(display: str, outline: dict[str, Any], max_depth: int = 1) -> str:
+    """Compact text form: one symbol per line with its span and docstring."""
+    head = f"{display} ({outline['lines']} lines)"
+    if outline["doc"]:
+        head += f" — {outline['doc']}"
+    rows = [head]
+    for s in outline["symbols"]:
+        if s["depth"] > max_depth:
+            continue
+        row = f"{'  ' * (s['depth'] + 1)}{s['signature']}  L{s['start']}-{s['end']}"
+        if s["doc"]:
+            row += f"  # {s['doc']}"
+        rows.append(row)
+    return "\n".join(rows)
@@ -0,0 +1,191 @@
+# prefetch.py
+"""
+Speculative warm-up of tool_cache while the model is thinking.
+
+Before each auto-loop LLM call, the current and next step texts are scanned
+for existing paths ("./handlers/read_file.py", "~/proj", "config.py") and
+git diff / status wording.  A single background thread then primes the
+results the dispatcher can serve from cache: read_file for files and
+directory listings, and git_status plus git_diff for repositories.  The
+diff is computed without fetching, but its cache key ignores `fetch`, so
+the model's git_diff call (fetch defaults to true) hits it too.  If the
+model asks for one of them, the dispatch is a cache hit.
+
+Limits keep the speculation cheap:
+
+* at most MAX_TARGETS calls per warm-up, run one at a time on one thread;
+* files over MAX_FILE_BYTES and directories with more than MAX_DIR_FILES
+  files are skipped before any read;
+* a warm-up stops once MAX_TOTAL_BYTES of results were produced;
+* a newer warm-up (or cancel()) drops whatever is still pending;
+* settle() also waits for the call in flight, and the auto loop calls it
+  before every mutating call (results racing a write are discarded by
+  tool_cache either way).
+
+Every call is checked against the local rules first, so prefetching never
+touches a path a real call could not.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+import time
+from typing import Iterable, Optional
+
+import metrics
+from rule_engine import check_call
+from tool_cache import ResultCache
+
+MAX_TARGETS = 8
+MAX_FILE_BYTES = 256_000
+MAX_DIR_FILES = 2_000
+MAX_TOTAL_BYTES = 2_000_000
+
+_TOKEN = re.compile(r"""[^\s'"`,;()\[\]{}<>]+""")
+_PATHLIKE = re.compile(r"^(?:~|\.{1,2})(?:/|$)|/|^[\w.-]+\.\w{1,8}$")
+_GIT = re.compile(r"\b(?:diff|status|changes|changed)\b", re.IGNORECASE)
+
+
+def _dir_small(path: str) -> bool:
+    count = 0
+    for _, _, files in os.walk(path):
+        count += len(files)
+        if count > MAX_DIR_FILES:
+            return False
+    return True
+
+
+def _repo_root(path: str) -> Optional[str]:
+    """The git repository containing `path`, if any."""
+    current = os.path.abspath(path)
+    while True:
+        if os.path.isdir(os.path.join(current, ".git")):
+            return current
+        parent = os.path.dirname(current)
+        if parent == current:
+            return None
+        current = parent
+
+
+def candidate_paths(text: str) -> list[str]:
+    """Existing paths mentioned in `text`, as written, in order of appearance."""
+    out: list[str] = []
+    for token in _TOKEN.findall(text):
+        token = token.rstrip(".:!?")
+        if not token or "$" in token or "://" in token or not _PATHLIKE.search(token):
+            continue
+        if token not in out and os.path.exists(os.path.expanduser(token)):
+            out.append(token)
+    return out
+
+
+def plan(texts: Iterable[str]) -> list[tuple[str, dict]]:
+    """Cacheable tool calls the steps in `texts` are likely to make."""
+    calls: list[tuple[str, dict]] = []
+    for text in texts:
+        paths = candidate_paths(text or "")
+        for path in paths:
+            calls.append(("read_file", {"path": path}))
+        if text and _GIT.search(text):
+            dirs = [p for p in paths if os.path.isdir(os.path.expanduser(p))]
+            folder = dirs[0] if dirs else "."
+            if not os.path.isdir(os.path.join(os.path.expanduser(folder), ".git")):
+                folder = _repo_root(os.path.expanduser(folder))
+            if folder:
+                calls.append(("git_status", {"folder_path": folder}))
+                calls.append(("git_diff", {"folder_path": folder, "fetch": False}))
+    unique = []
+    for call in calls:
+        if call not in unique:
+            unique.append(call)
+    return unique[:MAX_TARGETS]
+
+
+def _affordable(name: str, args: dict) -> bool:
+    if name != "read_file":
+        return True
+    path = os.path.expanduser(args["path"])
+    try:
+        if os.path.isdir(path):
+            return _dir_small(path)
+        return os.path.getsize(path) <= MAX_FILE_BYTES
+    except OSError:
+        return False
+
+
+class Prefetcher:
+    """One background thread that primes `cache`; only the newest plan runs."""
+
+    def __init__(self, cache: ResultCache):
+        self.cache = cache
+        self._generation = 0
+        self._pending: Optional[list[tuple[str, dict]]] = None
+        self._running = False
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def warm(self, texts: Iterable[str]) -> None:
+        """Queue a warm-up for the given step texts (replacing any pending one)."""
+        calls = plan(texts)
+        with self._cond:
+            self._generation += 1
+            self._pending = calls or None
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="prefetch", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def cancel(self) -> None:
+        with self._cond:
+            self._generation += 1
+            self._pending = None
+
+    def settle(self) -> None:
+        """Cancel pending work and wait for the call in flight to finish."""
+        with self._cond:
+            self._generation += 1
+            self._pending = None
+            while self._running:
+                self._cond.wait()
+
+    def _current(self, generation: int) -> bool:
+        with self._cond:
+            return generation == self._generation
+
+    def _run(self) -> None:
+        from handlers.dispatch import _run_handler
+        while True:
+            with self._cond:
+                while self._pending is None:
+                    self._cond.wait()
+                calls, self._pending = self._pending, None
+                generation = self._generation
+                self._running = True
+
+            started = time.perf_counter()
+            warmed = produced = 0
+            for name, args in calls:
+                if not self._current(generation) or produced >= MAX_TOTAL_BYTES:
+                    break
+                if check_call(name, args) or not _affordable(name, args):
+                    continue
+                result: list[str] = []
+
+                def compute(name=name, args=args) -> str:
+                    result.append(_run_handler(name, args))
+                    return result[0]
+
+                try:
+                    if self.cache.prime(name, args, compute):
+                        warmed += 1
+                except Exception as e:  # speculation must never break the loop
+                    logging.debug(f"prefetch {name} {args} failed: {e}")
+                produced += len(result[0]) if result else 0
+            with self._cond:
+                self._running = False
+                self._cond.notify_all()
+            metrics.record("prefetch", planned=len(calls), warmed=warmed, bytes=produced,
+                           ms=round((time.perf_counter() - started) * 1000, 1))
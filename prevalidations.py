@@ -1,3 +1,49 @@
+from constants import PROJECT_PATH
+
+# Judgment rules: sent to the LLM validation phase as plain text.  Keep this
+# list for checks that genuinely need the model to decide.
 PREVALIDATIONS = [
     "prompt the path of the file thats going to be updated or created",
+]
+
+# Mechanical rules: compiled once and evaluated locally by rule_engine against
+# every step (before the model) and every dispatched call (after the model).
+#
+#   step_regex  – "pattern" searched in the step text; "match" is "deny"
+#                 (default) or "require".
+#   path_glob   – path arguments ("args") of the listed "handlers" must match
+#                 one of "allow" (if given) and none of "deny".  Globs are
+#                 resolved against the working directory; ~ is expanded.
+#   handler     – deny a call to one of "handlers" when every "when" entry
+#                 matches: {"arg": name, "equals": value} or
+#                 {"arg": name, "pattern": regex}; an empty "when" always denies.
+LOCAL_RULES = [
+    {
+        "id": "no-force-push",
+        "type": "step_regex",
+        "pattern": r"\bgit\s+push\b.*\s(--force\S*|-f)\b",
+        "message": "force pushes are not allowed",
+    },
+    {
+        "id": "no-history-rewrite",
+        "type": "step_regex",
+        "pattern": r"\bgit\s+(reset\s+--hard|filter-branch|rebase\s+-i)\b",
+        "message": "rewriting git history is not allowed",
+    },
+    {
+        "id": "write-path-required",
+        "type": "handler",
+        "handlers": ["write_file", "modify_file", "smart_modify_file"],
+        "when": [{"arg": "path", "pattern": r"^\s*$"}],
+        "message": "a target path must be provided",
+    },
+    {
+        "id": "writes-inside-project",
+        "type": "path_glob",
+        "handlers": ["write_file", "modify_file", "smart_modify_file"],
+        "args": ["path"],
+        "allow": [".", "./**", PROJECT_PATH, f"{PROJECT_PATH}/**"],
+        "deny": ["**/.git", "**/.git/**"],
+        "message": "files may only be written inside the project, never under .git",
+    },
 ]
\ No newline at end of file
@@ -0,0 +1,143 @@
+# rule_engine.py
+"""
+Local evaluation of the mechanical rules declared in prevalidations.LOCAL_RULES.
+
+Rules are compiled once (regexes, globs → regexes) and then checked in
+microseconds against:
+
+* each step's text, before any LLM call      → check_step()
+* each dispatched function call, after it    → check_call()
+
+Only the judgment rules in PREVALIDATIONS still go through the model.
+"""
+
+from __future__ import annotations
+
+import fnmatch
+import os
+import re
+from typing import Any, Iterable, NamedTuple, Optional
+
+
+class Violation(NamedTuple):
+    rule_id: str
+    message: str
+
+    def __str__(self) -> str:
+        return f"[{self.rule_id}] {self.message}"
+
+
+class _Rule(NamedTuple):
+    id: str
+    type: str
+    message: str
+    handlers: frozenset
+    args: tuple
+    pattern: Optional[re.Pattern]
+    require: bool
+    allow: tuple
+    deny: tuple
+    when: tuple
+
+
+def _compile_glob(glob: str) -> re.Pattern:
+    """Turn a (possibly relative, possibly ~) glob into an absolute-path regex."""
+    expanded = os.path.expanduser(glob)
+    if not os.path.isabs(expanded) and not expanded.startswith("*"):
+        expanded = os.path.join(os.getcwd(), expanded)
+    return re.compile(fnmatch.translate(os.path.normpath(expanded)))
+
+
+def _compile_rule(raw: dict) -> _Rule:
+    kind = raw["type"]
+    if kind not in ("step_regex", "path_glob", "handler"):
+        raise ValueError(f"Unknown rule type '{kind}' in rule {raw.get('id')}")
+
+    when = []
+    for cond in raw.get("when", []):
+        if "pattern" in cond:
+            when.append((cond["arg"], re.compile(cond["pattern"]), None))
+        else:
+            when.append((cond["arg"], None, cond.get("equals")))
+
+    return _Rule(
+        id=raw.get("id", kind),
+        type=kind,
+        message=raw.get("message", "rule violated"),
+        handlers=frozenset(raw.get("handlers", [])),
+        args=tuple(raw.get("args", ("path", "folder_path"))),
+        pattern=(re.compile(raw["pattern"], re.IGNORECASE)
+                 if "pattern" in raw else None),
+        require=raw.get("match", "deny") == "require",
+        allow=tuple(_compile_glob(g) for g in raw.get("allow", [])),
+        deny=tuple(_compile_glob(g) for g in raw.get("deny", [])),
+        when=tuple(when),
+    )
+
+
+def compile_rules(rules: Iterable[dict]) -> tuple[_Rule, ...]:
+    """Validate and precompile a list of declarative rule dicts."""
+    return tuple(_compile_rule(r) for r in rules)
+
+
+# Globs are resolved against the working directory, so the compiled set is
+# cached per cwd (handlers such as create_git_branch may chdir).
+_compiled: dict[str, tuple[_Rule, ...]] = {}
+
+
+def _default_rules() -> tuple[_Rule, ...]:
+    cwd = os.getcwd()
+    if cwd not in _compiled:
+        from prevalidations import LOCAL_RULES
+        _compiled[cwd] = compile_rules(LOCAL_RULES)
+    return _compiled[cwd]
+
+
+def check_step(text: str, rules: Optional[tuple] = None) -> list[Violation]:
+    """Return the violations of step_regex rules for a step's text."""
+    out = []
+    for rule in rules if rules is not None else _default_rules():
+        if rule.type != "step_regex":
+            continue
+        found = rule.pattern.search(text or "") is not None
+        if found != rule.require:
+            out.append(Violation(rule.id, rule.message))
+    return out
+
+
+def _path_violates(rule: _Rule, value: str) -> bool:
+    path = os.path.normpath(os.path.abspath(os.path.expanduser(value)))
+    if any(p.match(path) for p in rule.deny):
+        return True
+    return bool(rule.allow) and not any(p.match(path) for p in rule.allow)
+
+
+def _condition_holds(args: dict, cond: tuple) -> bool:
+    name, pattern, equals = cond
+    if name not in args:
+        return False
+    value = args[name]
+    if pattern is not None:
+        return pattern.search(str(value)) is not None
+    return value == equals
+
+
+def check_call(name: str, args: dict[str, Any],
+               rules: Optional[tuple] = None) -> list[Violation]:
+    """Return the violations of path_glob/handler rules for one function call."""
+    out = []
+    for rule in rules if rules is not None else _default_rules():
+        if rule.type == "step_regex" or (rule.handlers and name not in rule.handlers):
+            continue
+        if rule.type == "path_glob":
+            if any(isinstance(args.get(a), str) and args[a].strip()
+                   and _path_violates(rule, args[a]) for a in rule.args):
+                out.append(Violation(rule.id, rule.message))
+        elif all(_condition_holds(args, c) for c in rule.when):
+            out.append(Violation(rule.id, rule.message))
+    return out
+
+
+def format_violations(violations: list[Violation]) -> str:
+    """Render violations in the handlers' ❌ error style."""
+    return "❌ Validation failed: " + "; ".join(str(v) for v in violations)
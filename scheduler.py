@@ -0,0 +1,252 @@
+# scheduler.py
+"""
+Client-side rate-limit scheduler for LLM requests.
+
+* Two token buckets per provider – requests/min and tokens/min – start from
+  conservative defaults and are re-seeded from the provider's
+  x-ratelimit-{limit,remaining,reset}-{requests,tokens} response headers.
+* Concurrency is adjusted AIMD-style: +1/limit per success, halved on a 429.
+* Waiting requests are served by priority (INTERACTIVE before BACKGROUND),
+  then FIFO.
+* 429s, 5xx and connection errors are retried with full-jitter exponential
+  backoff, honouring Retry-After when the provider sends it.
+
+Callers pick their priority per thread with `request_priority()`.  The
+clock, sleep and random source are injectable for deterministic tests.
+"""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import logging
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Mapping, Optional
+
+import metrics
+
+INTERACTIVE = 0
+BACKGROUND = 10
+
+DEFAULT_RPM = float(os.getenv("JAIME_RPM", "500"))
+DEFAULT_TPM = float(os.getenv("JAIME_TPM", "200000"))
+MAX_CONCURRENCY = int(os.getenv("JAIME_MAX_CONCURRENCY", "8"))
+MAX_RETRIES = 6
+BASE_DELAY = 0.5
+MAX_DELAY = 60.0
+
+_local = threading.local()
+
+
+@contextmanager
+def request_priority(priority: int) -> Iterator[None]:
+    """Run this thread's LLM requests at `priority` (lower is served first)."""
+    previous = getattr(_local, "priority", None)
+    _local.priority = priority
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+
+def current_priority() -> int:
+    priority = getattr(_local, "priority", None)
+    return INTERACTIVE if priority is None else priority
+
+
+_DURATION = re.compile(r"([\d.]+)(ms|s|m|h)")
+_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_reset(value: Optional[str]) -> Optional[float]:
+    """Parse reset durations such as '1s', '6m0s' or '20ms' into seconds."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION.findall(value)
+    return sum(float(n) * _UNITS[u] for n, u in parts) if parts else None
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float, clock: Callable[[], float] = time.monotonic):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` is available (0 if it is now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.tokens -= amount
+
+    def seed(self, limit: Optional[float], remaining: Optional[float],
+             reset: Optional[float]) -> None:
+        """Align the bucket with what the provider reports."""
+        now = self.clock()
+        self._refill(now)
+        if limit:
+            self.capacity = limit
+            self.rate = limit / 60.0
+        if remaining is not None:
+            self.tokens = min(self.tokens, remaining)
+            if reset and limit and remaining < limit:
+                # Provider refills (limit - remaining) over `reset` seconds
+                self.rate = max(self.rate, (limit - remaining) / reset)
+
+
+def _status(exc: BaseException) -> Optional[int]:
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    for key in ("retry-after-ms", "retry-after"):
+        value = headers.get(key)
+        if value:
+            try:
+                return float(value) / (1000.0 if key.endswith("ms") else 1.0)
+            except ValueError:
+                pass
+    return None
+
+
+def _retryable(exc: BaseException) -> bool:
+    status = _status(exc)
+    if status is not None:
+        return status == 429 or status >= 500
+    name = type(exc).__name__
+    return "Timeout" in name or "Connection" in name
+
+
+class RateLimitScheduler:
+    def __init__(self, name: str, rpm: float = DEFAULT_RPM, tpm: float = DEFAULT_TPM,
+                 max_concurrency: int = MAX_CONCURRENCY,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep,
+                 rng: Optional[random.Random] = None):
+        self.name = name
+        self.clock = clock
+        self.sleep = sleep
+        self.rng = rng or random.Random()
+        self.requests = TokenBucket(rpm, clock)
+        self.tokens = TokenBucket(tpm, clock)
+        self.max_concurrency = max_concurrency
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self._queue: list[tuple[int, int]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    # ----- admission ----------------------------------------------------- #
+    def _acquire(self, est_tokens: float, priority: int) -> None:
+        ticket = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+            try:
+                while True:
+                    if self._queue[0] == ticket and self.in_flight < int(self.limit):
+                        now = self.clock()
+                        delay = max(self.requests.wait_time(1, now),
+                                    self.tokens.wait_time(est_tokens, now))
+                        if delay <= 0:
+                            break
+                        self._cond.wait(delay)
+                    else:
+                        self._cond.wait(1.0)
+                heapq.heappop(self._queue)
+                self.requests.take(1)
+                self.tokens.take(est_tokens)
+                self.in_flight += 1
+            except BaseException:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                raise
+            finally:
+                self._cond.notify_all()
+
+    def _release(self, throttled: bool) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(1.0, self.limit / 2)
+            else:
+                self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+    # ----- feedback -------------------------------------------------------- #
+    def observe(self, headers: Optional[Mapping[str, str]], est_tokens: float,
+                used_tokens: Optional[int]) -> None:
+        """Correct the token estimate and re-seed buckets from headers."""
+        with self._cond:
+            if used_tokens is not None:
+                self.tokens.take(used_tokens - est_tokens)
+            if headers:
+                for bucket, kind in ((self.requests, "requests"), (self.tokens, "tokens")):
+                    def num(key: str) -> Optional[float]:
+                        try:
+                            return float(headers.get(f"x-ratelimit-{key}-{kind}"))
+                        except (TypeError, ValueError):
+                            return None
+                    bucket.seed(num("limit"), num("remaining"),
+                                parse_reset(headers.get(f"x-ratelimit-reset-{kind}")))
+            self._cond.notify_all()
+
+    # ----- public entry point -------------------------------------------- #
+    def call(self, send: Callable[[], tuple[Any, Optional[Mapping[str, str]]]],
+             est_tokens: float, used_tokens: Callable[[Any], Optional[int]] = lambda r: None,
+             priority: Optional[int] = None, max_retries: int = MAX_RETRIES) -> Any:
+        """Run `send()` (returning (result, headers)) within the limits, with retries."""
+        priority = current_priority() if priority is None else priority
+        for attempt in range(max_retries + 1):
+            self._acquire(est_tokens, priority)
+            try:
+                result, headers = send()
+            except Exception as e:
+                throttled = _status(e) == 429
+                self._release(throttled)
+                if not _retryable(e) or attempt == max_retries:
+                    raise
+                delay = (_retry_after(e)
+                         or self.rng.uniform(0, min(MAX_DELAY, BASE_DELAY * 2 ** attempt)))
+                metrics.record("rate_limit", provider=self.name, status=_status(e),
+                               attempt=attempt + 1, delay_s=round(delay, 3),
+                               concurrency=self.limit)
+                logging.warning(f"{self.name}: {type(e).__name__} (status {_status(e)}); "
+                                f"retry {attempt + 1}/{max_retries} in {delay:.2f}s")
+                self.sleep(delay)
+                continue
+            self._release(False)
+            self.observe(headers, est_tokens, used_tokens(result))
+            return result
+
+
+_schedulers: dict[str, RateLimitScheduler] = {}
+_registry_lock = threading.Lock()
+
+
+def scheduler_for(name: str) -> RateLimitScheduler:
+    """Shared scheduler per provider/endpoint name."""
+    with _registry_lock:
+        if name not in _schedulers:
+            _schedulers[name] = RateLimitScheduler(name)
+        return _schedulers[name]
@@ -0,0 +1,224 @@
+# server.py
+"""
+Warm daemon for `jaime_agent.py --serve`.
+
+One process keeps the LLM stack, its pooled HTTP connections, the handler
+modules and the knowledge cache loaded, and answers many small requests from
+thin clients.  The wire format is one JSON object per line, over a Unix
+socket (default) or a localhost TCP port:
+
+    {"op": "ping"}
+    {"op": "prompt", "prompt": "...", "execute": false, "session": "editor",
+     "priority": "interactive" | "background"}
+    {"op": "submit", "task": {"id": "...", "steps": ["..."]}}
+
+Each request gets exactly one JSON line back with "ok": true/false.
+Requests are served concurrently, one thread per connection.
+
+The TCP transport only binds to loopback addresses, and over TCP an
+"execute": true prompt (which runs handlers: file writes, git push, ...) is
+refused unless the request carries "token" equal to JAIME_SERVE_TOKEN.  The
+Unix socket is protected by its file permissions and needs no token.
+"""
+
+from __future__ import annotations
+
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import re
+import socket
+import socketserver
+from typing import Any, Callable, Optional, Union
+
+from constants import PROJECT_PATH
+
+SOCKET_PATH = os.path.expanduser(
+    os.getenv("JAIME_SOCKET", os.path.join(PROJECT_PATH, "jaime.sock")))
+
+Address = Union[str, tuple]
+
+_SESSION_ID = re.compile(r"^[\w.-]+$")
+
+
+def _token() -> Optional[str]:
+    return os.getenv("JAIME_SERVE_TOKEN") or None
+
+
+def _token_ok(req: dict) -> bool:
+    token = _token()
+    return bool(token) and isinstance(req.get("token"), str) and \
+        hmac.compare_digest(req["token"], token)
+
+
+def _message_to_dict(msg: Any) -> dict:
+    """Normalise an SDK message or raw dict into a JSON-serialisable reply."""
+    if isinstance(msg, dict):
+        content = msg.get("content")
+        call = msg.get("function_call")
+    else:
+        content = getattr(msg, "content", None)
+        call = getattr(msg, "function_call", None)
+    out = {"content": content or ""}
+    if call:
+        out["function_call"] = (call if isinstance(call, dict)
+                                else {"name": call.name, "arguments": call.arguments})
+    return out
+
+
+class AgentService:
+    """Request handling, independent of the transport."""
+
+    def __init__(self, task_path: str, context: Optional[str] = None,
+                 knowledge: Optional[Callable[[str], str]] = None):
+        # Imported here so the LLM stack is loaded once, when the daemon starts.
+        import client
+        from handlers.append_json import reset_messages, use_session
+        self.client = client
+        self.use_session = use_session
+        self.task_path = task_path
+        self.context = context
+        self.knowledge = knowledge
+        self.default_session = f"serve-{os.getpid()}"
+        with use_session(self.default_session):
+            reset_messages()  # clean start for the daemon's own session
+
+    def handle_request(self, req: dict, trusted: bool = True) -> dict:
+        """Answer one request; `trusted` is False for unauthenticated TCP clients."""
+        op = req.get("op")
+        if op == "ping":
+            return {"ok": True, "pid": os.getpid()}
+        if op == "prompt":
+            return self._prompt(req, trusted)
+        if op == "submit":
+            return self._submit(req)
+        return {"ok": False, "error": f"unknown op '{op}'"}
+
+    def _prompt(self, req: dict, trusted: bool = True) -> dict:
+        from rule_engine import check_step, format_violations
+        from scheduler import BACKGROUND, INTERACTIVE, request_priority
+
+        prompt = req.get("prompt")
+        if not isinstance(prompt, str) or not prompt.strip():
+            return {"ok": False, "error": "'prompt' must be a non-empty string"}
+        session = req.get("session") or self.default_session
+        if not isinstance(session, str) or not _SESSION_ID.match(session):
+            return {"ok": False,
+                    "error": "'session' may only contain letters, digits, '_', '.' and '-'"}
+        if req.get("execute") and not trusted:
+            return {"ok": False, "error": "'execute' over TCP needs a valid 'token' "
+                                          "(JAIME_SERVE_TOKEN); use the Unix socket otherwise"}
+        violations = check_step(prompt)
+        if violations:
+            return {"ok": False, "error": format_violations(violations)}
+
+        context = req.get("context", self.context)
+        knowledge = (self.knowledge(req.get("query") or prompt)
+                     if req.get("knowledge") and self.knowledge else None)
+        priority = BACKGROUND if req.get("priority") == "background" else INTERACTIVE
+        with self.use_session(session), \
+                request_priority(priority):
+            if req.get("execute"):
+                result = self.client.handle_prompt(prompt, context, knowledge=knowledge) or ""
+                return {"ok": not result.startswith("❌"), "content": result}
+            msg = self.client.handle_prompt_raw(prompt, context, phase="serve",
+                                                knowledge=knowledge)
+        return {"ok": True, **_message_to_dict(msg)}
+
+    def _submit(self, req: dict) -> dict:
+        import task_queue
+        try:
+            queued = task_queue.submit_task(self.task_path, req.get("task") or {})
+        except ValueError as e:
+            return {"ok": False, "error": str(e)}
+        return {"ok": True, "queued": queued}
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                req = json.loads(line)
+                trusted = not isinstance(self.server, _TCPServer) or _token_ok(req)
+                resp = self.server.service.handle_request(req, trusted)
+            except Exception as e:
+                logging.exception("serve request failed")
+                resp = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            self.wfile.write((json.dumps(resp, ensure_ascii=False, default=str) + "\n")
+                             .encode("utf-8"))
+            self.wfile.flush()
+
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+    class _UnixServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+else:  # Windows: only the TCP transport (--port) is available
+    _UnixServer = None
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def _claim_socket_path(path: str) -> None:
+    """Remove a stale socket file, refusing if a live daemon owns it."""
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        return
+    try:
+        request(path, {"op": "ping"}, timeout=1)
+    except (ConnectionRefusedError, FileNotFoundError):
+        os.unlink(path)  # nobody listening: left behind by a dead daemon
+        return
+    except OSError as e:
+        # Includes timeouts: a busy daemon still owns the socket
+        raise RuntimeError(f"{path} is in use by an unresponsive daemon ({e})") from None
+    raise RuntimeError(f"another daemon is already listening on {path}")
+
+
+def serve(service: AgentService, address: Address = SOCKET_PATH) -> None:
+    """Serve forever on a Unix socket path or a (host, port) tuple."""
+    if isinstance(address, tuple):
+        try:
+            loopback = ipaddress.ip_address(address[0]).is_loopback
+        except ValueError:
+            loopback = address[0] == "localhost"
+        if not loopback:
+            raise RuntimeError(f"refusing to serve on non-loopback address {address[0]}")
+        server = _TCPServer(address, _RequestHandler)
+    elif _UnixServer is None:
+        raise RuntimeError("Unix sockets are not supported here; use --port")
+    else:
+        _claim_socket_path(address)
+        server = _UnixServer(address, _RequestHandler)
+    server.service = service
+    logging.info(f"Jaime daemon listening on {address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if not isinstance(address, tuple) and os.path.exists(address):
+            os.unlink(address)
+
+
+def request(address: Address, payload: dict, timeout: Optional[float] = None) -> dict:
+    """Thin client: send one request to the daemon and return its reply."""
+    family = socket.AF_INET if isinstance(address, tuple) else socket.AF_UNIX
+    if family == socket.AF_INET and _token() and "token" not in payload:
+        payload = {**payload, "token": _token()}
+    with socket.socket(family, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(address)
+        sock.sendall((json.dumps(payload) + "\n").encode("utf-8"))
+        with sock.makefile("rb") as reader:
+            line = reader.readline()
+    if not line:
+        raise ConnectionError("daemon closed the connection without replying")
+    return json.loads(line)
@@ -0,0 +1,166 @@
+# task_queue.py
+"""
+tasks.json as a shared work queue for several agent processes.
+
+All reads-modify-writes happen under file_lock.locked(), and a worker only
+runs a task while it holds an unexpired lease on it:
+
+    claim_task()      → pick the first task that is unleased (or whose lease
+                        expired) and lease it to this worker
+    claim_runnable()  → lease every such task at once (batch mode)
+    advance_task()    → record a finished step and renew the lease; the task
+                        is removed once its last step is done
+    release_task()    → drop the lease (failure / shutdown) so others can retry
+
+A crashed worker simply stops renewing; its task becomes claimable again
+after LEASE_SECONDS.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import socket
+import time
+from typing import Optional
+
+from file_lock import locked, read_json, write_json_atomic
+
+LEASE_SECONDS = float(os.getenv("JAIME_LEASE_SECONDS", "300"))
+
+
+def worker_id() -> str:
+    """Identity used as lease owner (host:pid)."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _load(path: str) -> list[dict]:
+    data = read_json(path, [])
+    if not isinstance(data, list):
+        logging.error(f"{path} does not contain a task list")
+        return []
+    return data
+
+
+def load_tasks(path: str) -> list[dict]:
+    """Return a snapshot of the queue."""
+    with locked(path, shared=True):
+        return _load(path)
+
+
+def save_tasks(path: str, tasks: list[dict]) -> None:
+    """Replace the whole queue (single-writer tools, flows, etc.)."""
+    with locked(path):
+        write_json_atomic(path, tasks)
+
+
+def submit_task(path: str, task: dict) -> int:
+    """Append a task (id + steps) to the queue; returns the new queue length."""
+    if not task.get("id") or not isinstance(task.get("steps"), list):
+        raise ValueError("a task needs an 'id' and a list of 'steps'")
+    with locked(path):
+        tasks = _load(path)
+        if any(t.get("id") == task["id"] for t in tasks):
+            raise ValueError(f"task '{task['id']}' is already queued")
+        tasks.append({**task, "current_step": task.get("current_step", 0)})
+        write_json_atomic(path, tasks)
+        return len(tasks)
+
+
+def step_prompt(task: dict, idx: int, text: str) -> str:
+    """The user message sent for step `idx` of `task` (also its journal key)."""
+    return f"Task {task['id']} step {idx+1}/{len(task.get('steps', []))}: {text}"
+
+
+def _lease_active(task: dict, now: float) -> bool:
+    lease = task.get("lease")
+    return bool(lease) and lease.get("expires", 0) > now
+
+
+def claim_task(path: str, worker: str,
+               lease_seconds: float = LEASE_SECONDS) -> Optional[dict]:
+    """Lease the first runnable task to `worker` and return a copy of it.
+
+    A task already leased by `worker` is returned again (and renewed), so a
+    worker keeps its task between steps.  Finished tasks are dropped.
+    """
+    now = time.time()
+    with locked(path):
+        tasks = _load(path)
+        remaining = [t for t in tasks
+                     if t.get("current_step", 0) < len(t.get("steps", []))]
+        claimed = None
+        for owned_first in (True, False):
+            for task in remaining:
+                lease = task.get("lease") or {}
+                mine = lease.get("owner") == worker
+                if owned_first and not mine:
+                    continue
+                if not owned_first and _lease_active(task, now):
+                    continue
+                task["lease"] = {"owner": worker, "expires": now + lease_seconds}
+                claimed = task
+                break
+            if claimed:
+                break
+
+        if claimed is not None or len(remaining) != len(tasks):
+            write_json_atomic(path, remaining)
+    return dict(claimed) if claimed else None
+
+
+def claim_runnable(path: str, worker: str, lease_seconds: float) -> list[dict]:
+    """Lease every unfinished task not held by another worker; return copies."""
+    now = time.time()
+    with locked(path):
+        tasks = _load(path)
+        claimed = []
+        for task in tasks:
+            if task.get("current_step", 0) >= len(task.get("steps", [])):
+                continue
+            lease = task.get("lease") or {}
+            if lease.get("owner") != worker and _lease_active(task, now):
+                continue
+            task["lease"] = {"owner": worker, "expires": now + lease_seconds}
+            claimed.append(dict(task))
+        if claimed:
+            write_json_atomic(path, tasks)
+    return claimed
+
+
+def advance_task(path: str, task_id: str, worker: str, step_index: int,
+                 lease_seconds: float = LEASE_SECONDS) -> bool:
+    """Mark `step_index` done for a task leased by `worker`.
+
+    Returns False if the lease was lost (expired and taken by another worker),
+    in which case nothing is written.
+    """
+    now = time.time()
+    with locked(path):
+        tasks = _load(path)
+        for i, task in enumerate(tasks):
+            if task.get("id") != task_id:
+                continue
+            if (task.get("lease") or {}).get("owner") != worker:
+                logging.warning(f"Lease on {task_id} lost by {worker}")
+                return False
+            task["current_step"] = max(task.get("current_step", 0), step_index + 1)
+            if task["current_step"] >= len(task.get("steps", [])):
+                tasks.pop(i)
+            else:
+                task["lease"]["expires"] = now + lease_seconds
+            write_json_atomic(path, tasks)
+            logging.info(f"Tasks saved ({len(tasks)} remaining)")
+            return True
+    return False
+
+
+def release_task(path: str, task_id: str, worker: str) -> None:
+    """Give up `worker`'s lease on a task, leaving its progress intact."""
+    with locked(path):
+        tasks = _load(path)
+        for task in tasks:
+            if task.get("id") == task_id and (task.get("lease") or {}).get("owner") == worker:
+                task.pop("lease", None)
+                write_json_atomic(path, tasks)
+                return
@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+# Modules live flat in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def _isolated_state(tmp_path, monkeypatch):
+    """Keep metrics and session memory written by tests out of the checkout."""
+    import metrics
+    from handlers import append_json
+    monkeypatch.setattr(metrics, "METRICS_PATH", str(tmp_path / "metrics.jsonl"))
+    monkeypatch.setattr(append_json, "SESSION_DIR", str(tmp_path / "sessions"))
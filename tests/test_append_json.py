@@ -0,0 +1,31 @@
+import os
+import subprocess
+import sys
+
+from handlers import append_json
+
+
+def _dead_pid():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def test_prune_removes_only_sessions_of_exited_processes(tmp_path):
+    dead = _dead_pid()
+    for name in (f"pid-{dead}.json", f"serve-{dead}.json",
+                 f"pid-{os.getpid()}.json", "shared.json"):
+        (tmp_path / name).write_text("[]")
+    (tmp_path / f"pid-{dead}.json.lock").write_text("")
+
+    assert append_json.prune_sessions(str(tmp_path)) == 2
+    assert sorted(os.listdir(tmp_path)) == [f"pid-{os.getpid()}.json", "shared.json"]
+
+
+def test_process_session_is_removed_on_exit(tmp_path):
+    code = ("from handlers import append_json as a; "
+            f"a.SESSION_DIR = {str(tmp_path)!r}; "
+            "a.append_json({'role': 'user', 'content': 'hi'})")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", code], cwd=root, check=True)
+    assert [n for n in os.listdir(tmp_path) if n.endswith(".json")] == []
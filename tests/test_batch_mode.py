@@ -0,0 +1,77 @@
+import json
+
+import batch_mode
+import task_queue
+from journal import TaskJournal, prompt_hash, replay_message
+
+
+def _tasks():
+    return [{"id": f"t{n}", "steps": [f"write file ./out_{n}.txt", f"read file ./out_{n}.txt"],
+             "current_step": 0} for n in (1, 2)]
+
+
+def _fake_complete(body):
+    """Answer every step with a write_file call naming the step's file."""
+    step = body["messages"][-1]["content"]
+    path = next(w for w in step.split() if w.startswith("./out_"))
+    call = {"name": "write_file", "arguments": json.dumps({"path": path, "content": "hi"})}
+    return {"model": "local", "usage": {"prompt_tokens": 1, "completion_tokens": 1},
+            "choices": [{"message": {"role": "assistant", "content": None,
+                                     "function_call": call}}]}
+
+
+def _run_batch(tmp_path):
+    task_path = str(tmp_path / "tasks.json")
+    task_queue.save_tasks(task_path, _tasks())
+    state_path, journal_dir = str(tmp_path / "batches.json"), str(tmp_path / "journal")
+    backend = batch_mode.LocalBatchBackend(str(tmp_path / "batches"), complete=_fake_complete)
+
+    record = batch_mode.submit_batch(task_path, state_path, journal_dir, backend)
+    assert len(record["items"]) == 2
+    # Submitted tasks stay leased, so no worker can run them meanwhile
+    assert task_queue.claim_task(task_path, "other") is None
+
+    summary = batch_mode.collect_batch(record["id"], task_path, state_path, journal_dir,
+                                       backend, interval=0)
+    assert summary == {"status": "completed", "requests": 2, "answered": 2, "failed": 0}
+    assert batch_mode.pending_batches(state_path) == {}
+    return task_path, journal_dir
+
+
+def test_collect_journals_replies_and_releases_leases(tmp_path):
+    task_path, journal_dir = _run_batch(tmp_path)
+
+    for task in task_queue.load_tasks(task_path):
+        assert "lease" not in task or task["lease"] is None
+        prompt = task_queue.step_prompt(task, 0, task["steps"][0])
+        state = TaskJournal(journal_dir, task["id"]).resume(0, prompt_hash(task["id"], 0, prompt))
+        assert state.response["function_call"]["name"] == "write_file"
+
+
+def test_auto_loop_dispatches_batched_replies(tmp_path, monkeypatch):
+    import client
+    import jaime_agent
+
+    task_path, journal_dir = _run_batch(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("JAIME_SESSION_ID", "batch-test")
+    monkeypatch.setattr(jaime_agent, "TASK_FILE", tmp_path / "tasks.json")
+    monkeypatch.setattr(jaime_agent, "JOURNAL_DIR", tmp_path / "journal")
+    asked = []
+
+    def second_step(prompt, *args, **kwargs):
+        # Only the steps after the batched ones reach the model
+        asked.append(prompt)
+        path = next(w for w in prompt.split() if w.startswith("./out_"))
+        return replay_message({"role": "assistant", "content": None, "function_call": {
+            "name": "read_file", "arguments": json.dumps({"path": path})}})
+
+    monkeypatch.setattr(client, "handle_prompt_raw", second_step)
+    monkeypatch.setattr(jaime_agent, "load_reference_docs", lambda task_id: None)
+    jaime_agent.run_auto_loop(None, 0)
+
+    assert (tmp_path / "out_1.txt").read_text() == "hi"
+    assert (tmp_path / "out_2.txt").read_text() == "hi"
+    assert task_queue.load_tasks(task_path) == []
+    assert len(asked) == 2 and all("read file" in p for p in asked)
+
@@ -0,0 +1,54 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+import blob_store
+from tool_cache import ResultCache
+
+
+def _session(path, digest, age=0.0):
+    path.write_text(json.dumps([{"role": "tool", "content": "…",
+                                 "blob": {"sha256": digest, "size": 1, "preview": ""}}]))
+    if age:
+        then = time.time() - age
+        os.utime(path, (then, then))
+
+
+def test_gc_ignores_dead_and_stale_sessions(tmp_path):
+    sessions, blobs = tmp_path / "sessions", str(tmp_path / "blobs")
+    sessions.mkdir()
+    dead, stale, live = (blob_store.put(t, blobs) for t in ("dead", "stale", "live"))
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    _session(sessions / f"pid-{proc.pid}.json", dead)
+    _session(sessions / "old.json", stale, age=30 * 86400)
+    _session(sessions / "shared.json", live)
+
+    assert blob_store.collect_garbage(str(sessions), blobs, grace=0, ttl=7 * 86400) == 2
+    assert blob_store.get(live, blobs) == "live"
+    assert blob_store.get(dead, blobs) is None and blob_store.get(stale, blobs) is None
+
+
+def test_result_refs_carry_the_pid_and_are_cited(tmp_path):
+    target = tmp_path / "a.txt"
+    target.write_text("x")
+    ref = ResultCache().store("read_file", {"path": str(target)}, "x")
+    assert ref == f"r{os.getpid()}-1"
+
+    blobs = str(tmp_path / "blobs")
+    stub = blob_store.externalize({"role": "tool", "content": "y" * 10, "result_ref": ref},
+                                  limit=4, blob_dir=blobs)
+    expanded = blob_store.expand_cited([stub], f"see [{ref}]", blobs)
+    assert expanded[0]["content"] == "y" * 10
+
+
+def test_default_blob_dir_follows_the_session_dir(tmp_path):
+    from handlers import append_json
+    stub = blob_store.externalize({"role": "tool", "content": "x" * 10}, limit=4)
+
+    path = os.path.join(append_json.SESSION_DIR, "blobs", stub["blob"]["sha256"][:2],
+                        stub["blob"]["sha256"])
+    assert path.startswith(str(tmp_path)) and os.path.exists(path)
+    assert blob_store.expand(stub)["content"] == "x" * 10
@@ -0,0 +1,74 @@
+import sqlite3
+
+import code_index
+from code_index import CodeIndex
+
+
+def _index(tmp_path, **kwargs):
+    # The database lives outside the indexed tree
+    return CodeIndex(tmp_path / "repo", db_path=str(tmp_path / "index.sqlite"),
+                     poll_interval=0, **kwargs)
+
+
+def _repo(tmp_path):
+    (tmp_path / "repo" / "pkg").mkdir(parents=True)
+    (tmp_path / "repo" / "pkg" / "a.py").write_text("def alpha():\n    pass\n")
+    (tmp_path / "repo" / "b.py").write_text("def beta():\n    pass\n")
+    return _index(tmp_path, sweep_interval=3600)
+
+
+def _paths(index, query):
+    matches, _ = index.search(query)
+    return [m.path for m in matches]
+
+
+def test_unchanged_tree_is_not_listed_again(tmp_path, monkeypatch):
+    index = _repo(tmp_path)
+    assert _paths(index, "alpha") == ["pkg/a.py"]
+
+    calls = []
+    real = code_index.list_files
+    monkeypatch.setattr(code_index, "list_files", lambda *a: calls.append(a) or real(*a))
+    for _ in range(3):
+        assert _paths(index, "beta") == ["b.py"]
+    assert calls == []
+
+
+def test_change_feed_picks_up_new_edited_and_removed_files(tmp_path):
+    index = _repo(tmp_path)
+    index.refresh()
+
+    (tmp_path / "repo" / "pkg" / "c.py").write_text("def gamma():\n    pass\n")
+    assert _paths(index, "gamma") == ["pkg/c.py"]
+
+    # An in-place edit does not touch the directory: it arrives through notify()
+    (tmp_path / "repo" / "pkg" / "a.py").write_text("def delta():\n    pass\n")
+    index.notify([str(tmp_path / "repo" / "pkg" / "a.py")])
+    assert _paths(index, "delta") == ["pkg/a.py"]
+    assert _paths(index, "alpha") == []
+
+    (tmp_path / "repo" / "pkg" / "c.py").unlink()
+    assert _paths(index, "gamma") == []
+
+
+def test_bulk_build_appends_segments_then_compacts(tmp_path, monkeypatch):
+    monkeypatch.setattr(code_index, "BATCH_FILES", 3)
+    (tmp_path / "repo").mkdir()
+    for n in range(10):
+        (tmp_path / "repo" / f"m{n}.py").write_text(f"value_{n} = {n}\n")
+    index = _index(tmp_path)
+
+    assert index.refresh()["updated"] == 10
+    assert index._db.execute("SELECT DISTINCT seg FROM postings").fetchall() == [(0,)]
+    assert _paths(index, "value_7") == ["m7.py"]
+
+
+def test_many_candidates_stay_under_the_sql_variable_limit(tmp_path):
+    (tmp_path / "repo").mkdir()
+    for n in range(1200):
+        (tmp_path / "repo" / f"f{n}.py").write_text("shared_token\n")
+    index = _index(tmp_path)
+    index._db.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999)
+
+    matches, stats = index.search("shared_token", max_results=5)
+    assert stats["candidates"] == 1200 and len(matches) == 5
@@ -0,0 +1,115 @@
+import json
+import subprocess
+
+import pytest
+
+import task_queue
+from journal import StepState, TaskJournal, prompt_hash, replay_message
+
+PHASH = prompt_hash("t1", 0, "write file ./out.txt")
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    for var in ("AUTHOR", "COMMITTER"):
+        monkeypatch.setenv(f"GIT_{var}_NAME", "test")
+        monkeypatch.setenv(f"GIT_{var}_EMAIL", "test@example.com")
+    path = tmp_path / "repo"
+    path.mkdir()
+    subprocess.run(["git", "init", "-q"], cwd=path, check=True)
+    (path / "a.txt").write_text("a")
+    subprocess.run(["git", "add", "a.txt"], cwd=path, check=True)
+    subprocess.run(["git", "commit", "-qm", "first"], cwd=path, check=True)
+    return path
+
+
+def _write_call(path):
+    return {"name": "write_file", "arguments": json.dumps({"path": str(path), "content": "hi"})}
+
+
+def _commit_call(repo):
+    return {"name": "git_commit",
+            "arguments": json.dumps({"commit_message": "second", "folder_path": str(repo)})}
+
+
+def test_recorded_response_is_replayed(tmp_path):
+    journal = TaskJournal(str(tmp_path), "t1")
+    journal.record_prompt(0, PHASH)
+    journal.record_response(0, PHASH, {"content": None, "function_call": _write_call("x")})
+
+    state = journal.resume(0, PHASH)
+    assert state.intent is None and state.result is None
+    assert replay_message(state.response).function_call.name == "write_file"
+
+
+def test_hash_mismatch_resets_the_step(tmp_path):
+    journal = TaskJournal(str(tmp_path), "t1")
+    journal.record_response(0, PHASH, {"content": "old"})
+    journal.record_intent(0, PHASH, _write_call(tmp_path / "out.txt"))
+
+    assert journal.resume(0, prompt_hash("t1", 0, "edited step")) == StepState()
+    assert journal.resume(0, PHASH).response == {"content": "old"}
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    journal = TaskJournal(str(tmp_path), "t1")
+    journal.record_response(0, PHASH, {"content": "kept"})
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"step": 0, "phase": "result", "ha')  # crash mid-write
+
+    state = journal.resume(0, PHASH)
+    assert state.response == {"content": "kept"} and state.result is None
+
+
+def test_file_intent_without_result_checks_the_target(tmp_path):
+    target = tmp_path / "out.txt"
+    journal = TaskJournal(str(tmp_path / "journal"), "t1")
+    journal.record_intent(0, PHASH, _write_call(target))
+    intent = journal.resume(0, PHASH).intent
+
+    assert not journal.intent_applied(intent)
+    target.write_text("hi")
+    assert journal.intent_applied(intent)
+
+
+def test_git_commit_intent_without_result_checks_head(tmp_path, repo):
+    journal = TaskJournal(str(tmp_path / "journal"), "t1")
+    journal.record_intent(0, PHASH, _commit_call(repo))
+    intent = journal.resume(0, PHASH).intent
+
+    assert intent["pre"] and not journal.intent_applied(intent)
+    (repo / "a.txt").write_text("b")
+    subprocess.run(["git", "commit", "-qam", "second"], cwd=repo, check=True)
+    assert journal.intent_applied(intent)
+
+
+def test_resume_does_not_commit_twice(tmp_path, repo, monkeypatch):
+    import client
+    import jaime_agent
+
+    task = {"id": "t1", "steps": ["commit the repo"], "current_step": 0}
+    task_queue.save_tasks(str(tmp_path / "tasks.json"), [task])
+    monkeypatch.setenv("JAIME_SESSION_ID", "journal-test")
+    monkeypatch.setattr(jaime_agent, "TASK_FILE", tmp_path / "tasks.json")
+    monkeypatch.setattr(jaime_agent, "JOURNAL_DIR", tmp_path / "journal")
+    monkeypatch.setattr(jaime_agent, "load_reference_docs", lambda task_id: None)
+    monkeypatch.setattr(client, "handle_prompt_raw",
+                        lambda *a, **k: pytest.fail("the journaled reply must be replayed"))
+
+    # The previous run crashed after git_commit ran but before its result was journaled
+    phash = prompt_hash("t1", 0, task_queue.step_prompt(task, 0, "commit the repo"))
+    journal = TaskJournal(str(tmp_path / "journal"), "t1")
+    journal.record_response(0, phash, {"content": None, "function_call": _commit_call(repo)})
+    journal.record_intent(0, phash, _commit_call(repo))
+    (repo / "a.txt").write_text("b")
+    subprocess.run(["git", "commit", "-qam", "second"], cwd=repo, check=True)
+    # Staged work a repeated git_commit would pick up
+    (repo / "b.txt").write_text("b")
+    subprocess.run(["git", "add", "b.txt"], cwd=repo, check=True)
+
+    jaime_agent.run_auto_loop(None, 0)
+
+    log = subprocess.run(["git", "log", "--oneline"], cwd=repo, capture_output=True,
+                         text=True, check=True).stdout.splitlines()
+    assert len(log) == 2
+    assert task_queue.load_tasks(str(tmp_path / "tasks.json")) == []
@@ -0,0 +1,35 @@
+from knowledge_cache import KnowledgeCache
+
+
+def test_file_texts_stay_under_the_byte_cap(tmp_path):
+    for n in range(5):
+        (tmp_path / f"{n}.txt").write_text(str(n) * 100)
+    cache = KnowledgeCache(tmp_path, poll_interval=0, max_file_chars=250)
+
+    docs = cache.documents()
+    generation = cache.generation
+
+    assert [text for _, text in docs] == [str(n) * 100 for n in range(5)]
+    assert cache._file_chars <= 250
+    # Evicted texts are re-read on use without counting as a change
+    assert cache.documents() == docs and cache.generation == generation
+
+
+def test_extra_paths_are_pruned_and_bounded(tmp_path):
+    knowledge = tmp_path / "knowledge"
+    knowledge.mkdir()
+    extras = []
+    for n in range(4):
+        path = tmp_path / f"extra{n}.txt"
+        path.write_text("x")
+        extras.append(str(path))
+    cache = KnowledgeCache(knowledge, poll_interval=0, max_extra=2)
+
+    for path in extras:
+        cache.documents([path])
+    assert list(cache._extra) == extras[-2:]
+
+    (tmp_path / "extra3.txt").unlink()
+    cache.poll(force=True)
+    assert list(cache._extra) == extras[2:3]
+    assert set(cache._files) == {extras[2]}
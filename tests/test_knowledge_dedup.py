@@ -0,0 +1,45 @@
+import json
+
+import knowledge_dedup
+from knowledge_dedup import SignatureStore, dedupe_documents, minhash, similarity
+
+BASE = ("The dispatcher imports the handler module named after the function and calls "
+        "its handle function with the parsed arguments, turning every failure into a "
+        "readable error message for the model.")
+
+
+def test_minhash_estimates_jaccard_similarity():
+    near = BASE.replace("readable", "clear")
+    other = "Rate limits are tracked per provider with two token buckets and AIMD."
+
+    assert similarity(minhash(BASE), minhash(BASE)) == 1.0
+    assert similarity(minhash(BASE), minhash(near)) >= 0.7
+    assert similarity(minhash(BASE), minhash(other)) < 0.2
+
+
+def test_near_duplicates_collapse_only_above_the_threshold(tmp_path):
+    store = SignatureStore(str(tmp_path / "sigs.json"))
+    near = BASE.replace("readable", "clear")
+    docs = [("a.txt", BASE), ("b.txt", near), ("c.txt", "Something else entirely, about caches.")]
+
+    # The longer chunk of the cluster stays; b.txt is left empty and dropped
+    assert dedupe_documents(docs, threshold=0.7, store=store) == [docs[0], docs[2]]
+
+    assert dedupe_documents(docs, threshold=1.0, store=store) == docs
+
+
+def test_flush_keeps_the_most_recently_used_signatures(tmp_path, monkeypatch):
+    monkeypatch.setattr(knowledge_dedup, "MAX_SIGNATURES", 2)
+    path = tmp_path / "sigs.json"
+    store = SignatureStore(str(path))
+    for chunk in ("alpha beta gamma", "delta epsilon zeta", "alpha beta gamma",
+                  "eta theta iota"):
+        store.get(chunk)
+    store.flush()
+
+    saved = json.loads(path.read_text())
+    assert len(saved) == 2
+    fresh = SignatureStore(str(path))
+    assert fresh.get("alpha beta gamma") == minhash("alpha beta gamma")
+    assert not fresh._dirty  # loaded, not recomputed
+    assert knowledge_dedup._chunk_key("delta epsilon zeta") not in saved
@@ -0,0 +1,80 @@
+import json
+import time
+
+import blob_store
+import memory_retention
+from memory_retention import Policy, compact_file, over_limit, split_point, summarize
+
+
+def _turns(n, size=10):
+    return [{"role": "user" if i % 2 else "assistant", "content": f"{i} " + "x" * size}
+            for i in range(n)]
+
+
+def _write(path, messages):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(messages, indent=2))
+
+
+def test_split_keeps_tool_results_with_their_call():
+    policy = Policy(keep_recent=3, max_messages=10)
+    messages = _turns(6)
+    messages[3] = {"role": "tool", "content": "result of call 2"}
+
+    assert split_point(messages, policy) == 4
+    assert split_point([{"role": "system", "content": "s", "summary": True}] + _turns(3),
+                       policy) == 0
+
+
+def test_compaction_stops_below_the_low_water_mark(tmp_path):
+    policy = Policy(keep_recent=20, max_messages=60, max_bytes=2000, low_water=0.5)
+    path = tmp_path / "sessions" / "s.json"
+    messages = _turns(16, size=150)
+    _write(path, messages)
+    assert over_limit(messages, path.stat().st_size, policy)
+
+    assert compact_file(str(path), policy, summarizer=lambda head: "summary")
+    compacted = json.loads(path.read_text())
+    assert compacted[0]["summary"] and compacted[0]["covers"] + len(compacted) - 1 == 16
+    # The next append does not trigger another compaction
+    compacted.append({"role": "user", "content": "one more"})
+    _write(path, compacted)
+    assert not over_limit(compacted, path.stat().st_size, policy)
+
+
+def test_model_summary_falls_back_to_extractive(monkeypatch):
+    import client
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("provider down")
+
+    monkeypatch.setenv("JAIME_MEMORY_SUMMARIZER", "model")
+    monkeypatch.setattr(client, "complete", fail)
+    folded = _turns(3)
+    assert summarize(folded) == memory_retention.extractive_summary(folded)
+
+
+def test_gc_after_compaction_keeps_referenced_blobs(tmp_path):
+    from handlers import append_json
+    path = tmp_path / "sessions" / "s.json"
+    folded = blob_store.externalize({"role": "tool", "content": "old " * 50}, limit=10)
+    kept = blob_store.externalize({"role": "tool", "content": "new " * 50}, limit=10)
+    _write(path, [folded] + _turns(4) + [kept])
+
+    assert compact_file(str(path), Policy(keep_recent=2, max_messages=4))
+    assert blob_store.get(kept["blob"]["sha256"]) is not None  # fresh: grace period
+    blob_store.collect_garbage(append_json.SESSION_DIR, grace=0)
+    assert blob_store.get(folded["blob"]["sha256"]) is None
+    assert blob_store.get(kept["blob"]["sha256"]) == "new " * 50
+
+
+def test_worker_compacts_scheduled_sessions(tmp_path):
+    path = tmp_path / "sessions" / "s.json"
+    _write(path, _turns(8))
+    worker = memory_retention.RetentionWorker(Policy(keep_recent=2, max_messages=4))
+
+    worker.schedule(str(path))
+    deadline = time.time() + 5
+    while time.time() < deadline and len(json.loads(path.read_text())) == 8:
+        time.sleep(0.01)
+    assert len(json.loads(path.read_text())) == 3
@@ -0,0 +1,114 @@
+import os
+
+import pytest
+
+import outline_cache
+from handlers import outline_file, outline_repo
+from outline_cache import OutlineCache, parse_outline, symbol_source
+
+SOURCE = '''"""Module doc.
+
+More detail."""
+import os
+
+LIMIT: int = 3
+FUNCTIONS = []
+FUNCTIONS.append({"name": "x"})
+
+
+class Store(dict):
+    """Keeps things."""
+
+    def lookup(self, key, default=None) -> str:
+        """Find a key."""
+        return self.get(key, default)
+
+    @staticmethod
+    async def fetch(*urls):
+        pass
+
+
+def lookup(key):
+    return key
+'''
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = OutlineCache(str(tmp_path / "cache" / "outlines.json"))
+    monkeypatch.setattr(outline_file, "CACHE", cache)
+    monkeypatch.setattr(outline_repo, "CACHE", cache)
+    return cache
+
+
+def test_symbols_have_kinds_signatures_docs_and_spans():
+    outline = parse_outline(SOURCE)
+    rows = [(s["kind"], s["name"], s["signature"], s["doc"], s["start"], s["end"], s["depth"])
+            for s in outline["symbols"]]
+
+    assert outline["doc"] == "Module doc."
+    assert rows == [
+        ("variable", "LIMIT", "LIMIT", "", 6, 6, 0),
+        ("variable", "FUNCTIONS", "FUNCTIONS", "", 7, 7, 0),
+        ("call", "FUNCTIONS.append", "FUNCTIONS.append(...)", "", 8, 8, 0),
+        ("class", "Store", "class Store(dict)", "Keeps things.", 11, 20, 0),
+        ("method", "Store.lookup", "def lookup(self, key, default=None) -> str",
+         "Find a key.", 14, 16, 1),
+        ("method", "Store.fetch", "async def fetch(*urls)", "", 18, 20, 1),
+        ("function", "lookup", "def lookup(key)", "", 23, 24, 0),
+    ]
+
+
+def test_symbol_source_prefers_the_exact_name(tmp_path, cache):
+    path = tmp_path / "mod.py"
+    path.write_text(SOURCE)
+
+    matches, source = symbol_source(str(path), "lookup", cache)
+    assert [m["name"] for m in matches] == ["lookup"]
+    assert source.splitlines() == ["23  def lookup(key):", "24      return key"]
+    matches, _ = symbol_source(str(path), "fetch", cache)
+    assert matches[0]["start"] == 18  # the decorator line
+    assert outline_file.handle(str(path), "Store.lookup").startswith(
+        f"{path}:14-16 method Store.lookup")
+
+
+def test_cache_is_invalidated_by_mtime_and_persisted(tmp_path, cache, monkeypatch):
+    path = tmp_path / "mod.py"
+    path.write_text("def a():\n    pass\n")
+    parses = []
+    real = outline_cache.parse_outline
+    monkeypatch.setattr(outline_cache, "parse_outline",
+                        lambda source: parses.append(source) or real(source))
+
+    assert [s["name"] for s in cache.outline(str(path))["symbols"]] == ["a"]
+    cache.outline(str(path))
+    assert len(parses) == 1
+
+    path.write_text("def b():\n    pass\n")  # same size: only the mtime differs
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert [s["name"] for s in cache.outline(str(path))["symbols"]] == ["b"]
+    assert len(parses) == 2
+
+    cache.flush()
+    reloaded = OutlineCache(cache.path)
+    assert [s["name"] for s in reloaded.outline(str(path))["symbols"]] == ["b"]
+    assert len(parses) == 2
+
+
+def test_repo_outline_always_shows_the_first_file(tmp_path, cache, monkeypatch):
+    for name in ("a.py", "b.py", "c.py"):
+        (tmp_path / name).write_text("".join(f"def {name[0]}{i}(x):\n    pass\n"
+                                             for i in range(50)))
+    monkeypatch.setattr(outline_repo, "MAX_CHARS", 200)
+
+    lines = outline_repo.handle(str(tmp_path)).splitlines()
+    assert lines[0].startswith("a.py (101 lines)")
+    assert lines[1].strip().startswith("def a0(x)")
+    assert lines[-2] == "  ... outline truncated"
+    assert lines[-1] == "... 2 more file(s) not shown; narrow with glob"
+    assert sum(len(line) + 1 for line in lines[:-3]) <= 200
+
+    monkeypatch.setattr(outline_repo, "MAX_CHARS", 60_000)
+    text = outline_repo.handle(str(tmp_path), glob="b.py")
+    assert text.startswith("b.py") and "not shown" not in text
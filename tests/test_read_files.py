@@ -0,0 +1,46 @@
+import json
+
+from handlers import read_files
+
+
+def test_small_files_whole_and_cut_bytes_go_to_truncated_files(tmp_path):
+    (tmp_path / "a.txt").write_text("a" * 99 + "\n")
+    (tmp_path / "b.txt").write_text("b" * 99 + "\n")
+    (tmp_path / "wide.txt").write_text(("w" * 249 + "\n") * 20)  # 250-byte lines
+    (tmp_path / "narrow.txt").write_text(("n" * 9 + "\n") * 600)  # 10-byte lines
+
+    result = read_files.handle([str(tmp_path)], max_bytes=2000)
+    files = {f["path"].rsplit("/", 1)[-1]: f for f in result["files"]}
+
+    assert files["a.txt"]["content"] == "a" * 99 + "\n" and not files["a.txt"]["truncated"]
+    assert files["b.txt"]["content"] == "b" * 99 + "\n" and not files["b.txt"]["truncated"]
+    assert files["wide.txt"]["truncated"] and files["narrow.txt"]["truncated"]
+    assert files["wide.txt"]["content"].endswith("\n")
+    # Without the refill "wide" leaves 150 of its 900 bytes unused
+    assert 2000 - 30 <= result["used"] <= 2000
+    assert result["used"] == sum(len(f["content"]) for f in files.values())
+    json.dumps(result)
+
+
+def test_missing_path_is_reported_and_takes_no_budget(tmp_path):
+    (tmp_path / "big.txt").write_text(("x" * 9 + "\n") * 100)
+
+    result = read_files.handle([str(tmp_path / "gone.txt"), str(tmp_path / "big.txt")],
+                               max_bytes=500)
+    gone, big = result["files"]
+
+    assert gone["skipped"] == "not found" and "content" not in gone
+    assert big["truncated"] and len(big["content"]) == 500 == result["used"]
+
+
+def test_reads_many_files_on_the_pool(tmp_path):
+    for i in range(3 * read_files.WORKERS):
+        (tmp_path / f"f{i:02}.txt").write_text(f"{i}\n")
+    (tmp_path / "blob.bin").write_bytes(b"\0\1\2")
+
+    result = read_files.handle([str(tmp_path / "*")])
+    files = result["files"]
+
+    assert [f["content"] for f in files if "content" in f] == [
+        f"{i}\n" for i in range(3 * read_files.WORKERS)]
+    assert files[0]["skipped"] == "binary"
@@ -0,0 +1,39 @@
+import pytest
+
+from rule_engine import check_call, check_step
+
+STEPS = [
+    ("no-force-push", "git push --force origin main", "git push origin main"),
+    ("no-force-push", "then git push -f", "push the feature-fix branch with git push"),
+    ("no-history-rewrite", "git reset --hard HEAD~3", "git reset HEAD~1 then commit"),
+    ("no-history-rewrite", "git rebase -i main", "git rebase main"),
+]
+
+CALLS = [
+    ("write-path-required", "write_file", {"path": "  ", "content": "x"},
+     {"path": "out.txt", "content": "x"}),
+    ("writes-inside-project", "write_file", {"path": "../outside.txt", "content": "x"},
+     {"path": "./sub/inside.txt", "content": "x"}),
+    ("writes-inside-project", "modify_file", {"path": "sub/../../outside.txt"},
+     {"path": "sub/../inside.txt"}),
+    ("writes-inside-project", "smart_modify_file", {"path": ".git/config"},
+     {"path": "src/gitconfig.py"}),
+]
+
+
+@pytest.mark.parametrize("rule_id, denied, allowed", STEPS)
+def test_step_rules(rule_id, denied, allowed):
+    assert [v.rule_id for v in check_step(denied)] == [rule_id]
+    assert check_step(allowed) == []
+
+
+@pytest.mark.parametrize("rule_id, handler, denied, allowed", CALLS)
+def test_call_rules(rule_id, handler, denied, allowed, tmp_path, monkeypatch):
+    project = tmp_path / "project"
+    project.mkdir()
+    monkeypatch.chdir(project)  # "." in the allow list is the working directory
+
+    assert rule_id in [v.rule_id for v in check_call(handler, denied)]
+    assert check_call(handler, allowed) == []
+    # Read-only handlers are not restricted by write rules
+    assert check_call("read_file", denied) == []
@@ -0,0 +1,118 @@
+import random
+import threading
+import time
+
+import pytest
+
+from scheduler import BACKGROUND, BASE_DELAY, INTERACTIVE, RateLimitScheduler, TokenBucket
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class Throttled(Exception):
+    status_code = 429
+
+
+def _scheduler(clock=None, **kwargs):
+    slept = []
+    sched = RateLimitScheduler("test", clock=clock or Clock(), sleep=slept.append,
+                               rng=random.Random(7), **kwargs)
+    return sched, slept
+
+
+def test_bucket_refills_at_its_rate_up_to_capacity():
+    clock = Clock()
+    bucket = TokenBucket(60, clock)  # one per second
+
+    bucket.take(60)
+    assert bucket.wait_time(1, clock()) == pytest.approx(1.0)
+    clock.now += 30
+    assert bucket.wait_time(30, clock()) == 0
+    assert bucket.tokens == pytest.approx(30)
+    clock.now += 600
+    bucket.wait_time(1, clock())
+    assert bucket.tokens == 60
+
+
+def test_usage_over_the_estimate_is_borrowed_from_the_bucket():
+    clock = Clock()
+    sched, _ = _scheduler(clock, rpm=60, tpm=600)  # 10 tokens/s
+
+    assert sched.call(lambda: ("ok", None), est_tokens=100, used_tokens=lambda r: 700) == "ok"
+    # 600 in the bucket, 700 used: 100 borrowed from the next refill
+    assert sched.tokens.tokens == pytest.approx(-100)
+    # The debt plus 100 for the next request, at 10 tokens/s
+    assert sched.tokens.wait_time(100, clock()) == pytest.approx(20.0)
+
+
+def test_429_halves_concurrency_and_successes_recover_additively():
+    sched, slept = _scheduler(max_concurrency=8)
+    replies = iter([Throttled(), "ok"])
+
+    def send():
+        reply = next(replies)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply, None
+
+    assert sched.call(send, est_tokens=1) == "ok"
+    assert sched.limit == pytest.approx(4 + 1 / 4)
+    assert slept == [pytest.approx(random.Random(7).uniform(0, BASE_DELAY))]
+
+    sched.in_flight += 1
+    sched._release(True)
+    assert sched.limit == pytest.approx((4 + 1 / 4) / 2)
+    for _ in range(200):
+        sched.in_flight += 1
+        sched._release(False)
+    assert sched.limit == 8
+
+
+def test_waiting_requests_are_served_by_priority():
+    sched, _ = _scheduler(max_concurrency=1)
+    sched._acquire(1, INTERACTIVE)  # occupies the only slot
+    order = []
+
+    def waiter(priority):
+        sched._acquire(1, priority)
+        order.append(priority)
+        sched._release(False)
+
+    threads = []
+    for priority in (BACKGROUND, BACKGROUND + 1, INTERACTIVE):
+        threads.append(threading.Thread(target=waiter, args=(priority,)))
+        threads[-1].start()
+        while len(sched._queue) < len(threads):
+            time.sleep(0.001)
+    sched._release(False)
+    for t in threads:
+        t.join(5)
+    assert order == [INTERACTIVE, BACKGROUND, BACKGROUND + 1]
+
+
+def test_only_the_last_route_target_gets_the_full_retry_budget(monkeypatch):
+    import client
+    from model_router import Route, Target
+
+    targets = (Target("deepseek", "local", 5), Target("openai", "a", 30),
+               Target("openai", "b", 30))
+    budgets = []
+
+    class Recorder:
+        def call(self, send, est, used, **kwargs):
+            budgets.append(kwargs.get("max_retries"))
+            if len(budgets) < len(targets):
+                raise ConnectionError("down")
+            return "reply"
+
+    monkeypatch.setattr(client, "route_for", lambda phase: Route("test", targets))
+    monkeypatch.setattr(client, "scheduler_for", lambda provider: Recorder())
+
+    assert client._route_call({"messages": []}, "test") == ("reply", targets[-1], 2)
+    assert budgets == [1, 1, None]  # None: the scheduler's MAX_RETRIES
@@ -0,0 +1,79 @@
+import os
+import socket
+
+import pytest
+
+import server
+
+
+def _unix_socket(path, listen):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(path)
+    if listen:
+        sock.listen(1)
+    return sock
+
+
+def test_stale_socket_is_reclaimed(tmp_path):
+    path = str(tmp_path / "jaime.sock")
+    _unix_socket(path, listen=False).close()  # file stays, nobody listens
+
+    server._claim_socket_path(path)
+    assert not os.path.exists(path)
+
+
+def test_slow_daemon_keeps_its_socket(tmp_path):
+    path = str(tmp_path / "jaime.sock")
+    sock = _unix_socket(path, listen=True)  # accepts, never answers the ping
+    try:
+        with pytest.raises(RuntimeError):
+            server._claim_socket_path(path)
+        assert os.path.exists(path)
+    finally:
+        sock.close()
+
+
+def test_execute_tolerates_a_none_result(tmp_path, monkeypatch):
+    import client
+    monkeypatch.setattr(client, "handle_prompt", lambda *a, **k: None)
+    service = server.AgentService(str(tmp_path / "tasks.json"))
+    assert service.handle_request({"op": "prompt", "prompt": "hi", "execute": True}) == \
+        {"ok": True, "content": ""}
+
+
+def test_session_ids_cannot_escape_the_session_dir(tmp_path, monkeypatch):
+    import client
+    from handlers import append_json
+    seen = []
+    monkeypatch.setattr(client, "handle_prompt_raw",
+                        lambda *a, **k: seen.append(append_json.session_path()) or {"content": "x"})
+    service = server.AgentService(str(tmp_path / "tasks.json"))
+
+    resp = service.handle_request({"op": "prompt", "prompt": "hi", "session": "../../evil"})
+    assert not resp["ok"] and seen == []
+    assert service.handle_request({"op": "prompt", "prompt": "hi", "session": "editor"})["ok"]
+    assert seen == [os.path.join(append_json.SESSION_DIR, "editor.json")]
+
+    with append_json.use_session("../../evil"):
+        path = append_json.session_path()
+    assert os.path.dirname(path) == append_json.SESSION_DIR
+
+
+def test_execute_over_tcp_needs_the_token(tmp_path, monkeypatch):
+    import client
+    monkeypatch.setattr(client, "handle_prompt", lambda *a, **k: "done")
+    service = server.AgentService(str(tmp_path / "tasks.json"))
+    req = {"op": "prompt", "prompt": "hi", "execute": True}
+
+    monkeypatch.delenv("JAIME_SERVE_TOKEN", raising=False)
+    assert not server._token_ok(req)
+    assert not service.handle_request(req, trusted=False)["ok"]
+    monkeypatch.setenv("JAIME_SERVE_TOKEN", "s3cret")
+    assert not server._token_ok({**req, "token": "wrong"})
+    assert server._token_ok({**req, "token": "s3cret"})
+    assert service.handle_request(req, trusted=True) == {"ok": True, "content": "done"}
+
+
+def test_tcp_refuses_non_loopback_hosts(tmp_path):
+    with pytest.raises(RuntimeError):
+        server.serve(None, ("0.0.0.0", 0))
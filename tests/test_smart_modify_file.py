@@ -0,0 +1,13 @@
+import client
+from handlers import smart_modify_file
+
+
+def test_empty_reply_leaves_file_alone(tmp_path, monkeypatch):
+    target = tmp_path / "a.py"
+    target.write_text("x = 1\n")
+    monkeypatch.setattr(client, "complete", lambda messages, phase: "")
+
+    result = smart_modify_file.handle(str(target), "rename x to y")
+
+    assert result.startswith("❌")
+    assert target.read_text() == "x = 1\n"
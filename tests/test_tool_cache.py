@@ -0,0 +1,128 @@
+import threading
+
+from prefetch import Prefetcher
+from tool_cache import ResultCache
+
+
+def _read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def test_prime_racing_a_write_is_discarded(tmp_path):
+    target = tmp_path / "x.py"
+    target.write_text("old")
+    cache = ResultCache()
+    args = {"path": str(target)}
+
+    def compute():
+        stale = _read(target)
+        # The main loop writes the file while the prefetch read is in flight
+        target.write_text("new content")
+        cache.invalidate_for("write_file", args)
+        return stale
+
+    assert cache.prime("read_file", args, compute) is False
+    assert cache.lookup("read_file", args) is None
+
+
+def test_prime_racing_clear_is_discarded(tmp_path):
+    target = tmp_path / "x.py"
+    target.write_text("old")
+    cache = ResultCache()
+    args = {"path": str(target)}
+
+    def compute():
+        cache.clear()  # task changed mid-prefetch
+        return _read(target)
+
+    assert cache.prime("read_file", args, compute) is False
+    assert cache.lookup("read_file", args) is None
+
+
+def test_prime_stores_unchanged_result(tmp_path):
+    target = tmp_path / "x.py"
+    target.write_text("old")
+    cache = ResultCache()
+    args = {"path": str(target)}
+
+    assert cache.prime("read_file", args, lambda: _read(target)) is True
+    entry = cache.lookup("read_file", args)
+    assert entry.result == "old" and entry.primed
+
+
+def test_settle_waits_for_the_call_in_flight(tmp_path, monkeypatch):
+    target = tmp_path / "x.py"
+    target.write_text("old")
+    cache = ResultCache()
+    started, release = threading.Event(), threading.Event()
+
+    def slow_handler(name, args):
+        started.set()
+        release.wait(5)
+        return _read(args["path"])
+
+    monkeypatch.setattr("handlers.dispatch._run_handler", slow_handler)
+    prefetcher = Prefetcher(cache)
+    prefetcher.warm([f"read {target}"])
+    assert started.wait(5)
+
+    settled = threading.Event()
+    waiter = threading.Thread(target=lambda: (prefetcher.settle(), settled.set()))
+    waiter.start()
+    assert not settled.wait(0.2)
+    release.set()
+    waiter.join(5)
+    assert settled.is_set()
+
+
+def test_prefetched_git_state_answers_the_models_calls(tmp_path, monkeypatch):
+    import subprocess
+
+    import tool_cache
+    from handlers.dispatch import _run_handler
+    from prefetch import plan
+
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    subprocess.run(["git", "init", "-q"], cwd=repo, check=True)
+    subprocess.run(["git", "-c", "user.name=t", "-c", "user.email=t@example.com",
+                    "commit", "-q", "--allow-empty", "-m", "first"], cwd=repo, check=True)
+    (repo / "a.txt").write_text("a")
+    cache = ResultCache()
+
+    calls = plan([f"run git diff in path {repo}"])
+    assert [name for name, _ in calls] == ["read_file", "git_status", "git_diff"]
+    for name, args in calls:
+        assert cache.prime(name, args, lambda: _run_handler(name, args))
+
+    status = cache.lookup("git_status", {"folder_path": str(repo)})
+    assert status is not None and "?? a.txt" in status.result
+    # The model leaves fetch at its default (true)
+    assert cache.lookup("git_diff", {"folder_path": str(repo)}) is not None
+    monkeypatch.setattr(tool_cache, "FETCH_TTL", -1.0)
+    assert cache.lookup("git_diff", {"folder_path": str(repo), "fetch": True}) is None
+    assert cache.lookup("git_diff", {"folder_path": str(repo), "fetch": False}) is not None
+
+
+def test_git_entries_see_working_tree_edits(tmp_path):
+    import subprocess
+
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    subprocess.run(["git", "init", "-q"], cwd=repo, check=True)
+    (repo / "a.txt").write_text("a")
+    subprocess.run(["git", "add", "a.txt"], cwd=repo, check=True)
+    subprocess.run(["git", "-c", "user.name=t", "-c", "user.email=t@example.com",
+                    "commit", "-qm", "first"], cwd=repo, check=True)
+    cache = ResultCache()
+    args = {"folder_path": str(repo), "fetch": False}
+
+    assert cache.store("git_diff", args, "clean") is not None
+    assert cache.lookup("git_diff", args) is not None
+    (repo / "a.txt").write_text("edited outside the agent")
+    assert cache.lookup("git_diff", args) is None
+
+    assert cache.store("git_diff", args, "dirty") is not None
+    (repo / "a.txt").write_text("edited again, same file")
+    assert cache.lookup("git_diff", args) is None
@@ -0,0 +1,37 @@
+from tool_selection import select_functions
+
+
+def _names(schemas):
+    return [s["name"] for s in schemas]
+
+
+def test_override_resolves_removed_duplicates():
+    assert _names(select_functions("x", override=["modify_file"])) == ["write_file"]
+
+
+def test_override_ignores_unknown_names(caplog):
+    assert _names(select_functions("x", override=["read_file", "nope"])) == ["read_file"]
+    assert "nope" in caplog.text
+
+
+def test_unresolvable_override_falls_back_to_selection():
+    assert "read_file" in _names(select_functions("read file ./a.py", override=["nope"]))
+
+
+def test_empty_override_sends_no_tools():
+    assert select_functions("read file ./a.py", override=[]) == []
+
+
+def test_cacheable_prefix_sends_the_task_union_on_every_step(monkeypatch):
+    import client
+    from tool_selection import all_functions
+
+    monkeypatch.setattr(client, "STABLE_TOOLS", "auto")
+    steps = ["read file ./a.py", "git commit the change"]
+    knowledge = "k" * client.CACHE_MIN_PREFIX_CHARS
+    first = client.functions_for(steps[0], None, knowledge, steps=steps)
+    second = client.functions_for(steps[1], None, knowledge, steps=steps)
+
+    assert first == second
+    assert {"read_file", "git_commit"} <= set(_names(first))
+    assert len(first) < len(all_functions())
@@ -0,0 +1,246 @@
+# tool_cache.py
+"""
+Memoisation of read-only tool results for the dispatcher.
+
+Cacheable calls are `read_file` (files and directory listings), `git_status`
+and `git_diff`.  An entry is keyed by handler + arguments and validated
+against a stamp of its targets:
+
+* file             → (mtime_ns, size)
+* directory        → mtime_ns of the directory itself
+* git repo         → mtime_ns of .git/index and .git/HEAD, plus the path and
+                     (mtime_ns, size) of every dirty or untracked file, so
+                     working-tree edits made outside the agent show up too
+
+`fetch` is not part of a git_diff key, so the fetch=false diff prefetch.py
+warms also answers the model's usual fetch=true call; such a call only
+accepts an entry younger than FETCH_TTL seconds, after which it runs (and
+fetches) again.
+
+Nested edits made outside the agent are not visible in a directory's or
+repo's stamp, so every mutating handler (write_file, modify_file,
+smart_modify_file, git_*) also invalidates all entries whose targets overlap
+the paths it touched.
+
+Each stored result gets a short reference id ("r<pid>-1", "r<pid>-2", ...)
+so that a repeated call can point back to the earlier result instead of
+repeating it; the pid keeps ids unique when processes share a session.
+Path arguments are normalised in the key, so "./a.py" and "a.py" share one
+entry.
+
+`prime()` stores a result ahead of the call (see prefetch.py).  A primed
+entry has not been shown to the model yet, so its first lookup reports
+`primed=True` and the dispatcher returns the full text instead of a reference.
+Its stamp is taken before the result is computed, and the result is dropped
+if the targets changed or the cache was invalidated or cleared meanwhile, so
+a prefetch racing a write can never cache the old contents.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, NamedTuple, Optional
+
+MUTATING = {"write_file", "modify_file", "smart_modify_file", "git_add",
+            "git_commit", "git_push", "git_pull", "create_git_branch"}
+PATH_ARGS = ("path", "folder_path")
+GIT_READERS = {"git_diff", "git_status"}
+FETCH_TTL = 300.0
+
+MAX_ENTRIES = 128
+MAX_CHARS = 8_000_000
+
+
+class Entry(NamedTuple):
+    ref: str
+    result: str
+    targets: tuple
+    stamp: tuple
+    primed: bool = False
+    created: float = 0.0    # time.monotonic() when stored
+
+
+def cacheable(name: str, args: dict[str, Any]) -> bool:
+    return name == "read_file" or name in GIT_READERS
+
+
+def _abs(path: str) -> str:
+    return os.path.abspath(os.path.expanduser(path))
+
+
+def _targets(args: dict[str, Any]) -> tuple:
+    return tuple(_abs(args[a]) for a in PATH_ARGS if isinstance(args.get(a), str))
+
+
+def _dirty_files(repo: str) -> Optional[list]:
+    """(path, mtime_ns, size) of the repo's changed and untracked files."""
+    try:
+        out = subprocess.run(
+            ["git", "--no-optional-locks", "status", "--porcelain", "-z",
+             "--untracked-files=all"],
+            cwd=repo, capture_output=True, check=True, timeout=30).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    entries = out.decode("utf-8", "surrogateescape").split("\0")
+    files = []
+    skip = False
+    for entry in entries:
+        if skip or len(entry) < 4:
+            skip = False
+            continue
+        skip = entry[0] in "RC"  # the next entry is the rename source
+        path = os.path.join(repo, entry[3:])
+        try:
+            st = os.stat(path)
+            files.append((entry[3:], st.st_mtime_ns, st.st_size))
+        except OSError:
+            files.append((entry[3:], -1, -1))
+    return files
+
+
+def _stamp(name: str, targets: tuple) -> Optional[tuple]:
+    parts = []
+    try:
+        for target in targets:
+            if name in GIT_READERS:
+                git_dir = os.path.join(target, ".git")
+                parts.extend(os.stat(os.path.join(git_dir, f)).st_mtime_ns
+                             for f in ("index", "HEAD") if os.path.exists(os.path.join(git_dir, f)))
+                dirty = _dirty_files(target)
+                if dirty is None:
+                    return None
+                parts.append(tuple(dirty))
+            else:
+                st = os.stat(target)
+                parts.append((st.st_mtime_ns, st.st_size if os.path.isfile(target) else -1))
+    except OSError:
+        return None
+    return tuple(parts)
+
+
+def _overlaps(a: str, b: str) -> bool:
+    return a == b or a.startswith(b.rstrip(os.sep) + os.sep) or b.startswith(a.rstrip(os.sep) + os.sep)
+
+
+class ResultCache:
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_chars: int = MAX_CHARS):
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self._entries: OrderedDict[tuple, Entry] = OrderedDict()
+        self._chars = 0
+        self._next_ref = 0
+        # Bumped by invalidate()/clear(); in-flight primes compare against it
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name: str, args: dict[str, Any]) -> tuple:
+        args = {k: _abs(v) if k in PATH_ARGS and isinstance(v, str) else v
+                for k, v in args.items() if not (name == "git_diff" and k == "fetch")}
+        return name, json.dumps(args, sort_keys=True, default=str)
+
+    def _drop(self, key: tuple) -> None:
+        entry = self._entries.pop(key)
+        self._chars -= len(entry.result)
+
+    def lookup(self, name: str, args: dict[str, Any]) -> Optional[Entry]:
+        """Return a still-valid entry for this call, or None."""
+        if not cacheable(name, args):
+            return None
+        key = self._key(name, args)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if _stamp(name, entry.targets) != entry.stamp:
+                self._drop(key)
+                return None
+            if (name == "git_diff" and args.get("fetch", True) is not False
+                    and time.monotonic() - entry.created > FETCH_TTL):
+                return None  # too old to stand in for a fresh fetch
+            self._entries.move_to_end(key)
+            if entry.primed:
+                self._entries[key] = entry._replace(primed=False)
+            return entry
+
+    def store(self, name: str, args: dict[str, Any], result: str,
+              primed: bool = False, stamp: Optional[tuple] = None,
+              generation: Optional[int] = None) -> Optional[str]:
+        """Cache a fresh result; returns its reference id (None if not cached).
+
+        `stamp` and `generation`, when given, are the values observed before
+        the result was computed; the result is discarded if either moved on.
+        """
+        if not cacheable(name, args) or result.startswith("❌"):
+            return None
+        targets = _targets(args)
+        current = _stamp(name, targets)
+        if current is None or len(result) > self.max_chars:
+            return None
+        if stamp is not None and stamp != current:
+            return None
+        key = self._key(name, args)
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return None
+            if key in self._entries:
+                self._drop(key)
+            self._next_ref += 1
+            ref = f"r{os.getpid()}-{self._next_ref}"
+            self._entries[key] = Entry(ref, result, targets, current, primed, time.monotonic())
+            self._chars += len(result)
+            while len(self._entries) > self.max_entries or self._chars > self.max_chars:
+                self._drop(next(iter(self._entries)))
+            return ref
+
+    def prime(self, name: str, args: dict[str, Any], compute: Callable[[], str]) -> bool:
+        """Run `compute()` and cache its result unless a valid entry exists.
+
+        Returns True when a new result was stored.
+        """
+        if not cacheable(name, args):
+            return False
+        key = self._key(name, args)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and _stamp(name, entry.targets) == entry.stamp:
+                return False
+            generation = self._generation
+        stamp = _stamp(name, _targets(args))
+        if stamp is None:
+            return False
+        result = compute()
+        return self.store(name, args, result, primed=True, stamp=stamp,
+                          generation=generation) is not None
+
+    def invalidate(self, paths: tuple) -> None:
+        """Drop every entry whose targets overlap any of `paths`."""
+        with self._lock:
+            self._generation += 1
+            for key in [k for k, e in self._entries.items()
+                        if any(_overlaps(t, p) for t in e.targets for p in paths)]:
+                self._drop(key)
+
+    def invalidate_for(self, name: str, args: dict[str, Any]) -> None:
+        """Apply the invalidation implied by a (possibly) mutating call."""
+        if name in MUTATING:
+            self.invalidate(_targets(args) or (os.getcwd(),))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._chars = 0
+
+
+def reference_text(name: str, ref: str) -> str:
+    """Short stand-in for a repeated, unchanged result."""
+    return f"↩️ Unchanged since earlier {name} result [{ref}]; see that tool message."
+
+
+CACHE = ResultCache()
@@ -0,0 +1,170 @@
+# tool_selection.py
+"""
+Pick the subset of FUNCTIONS worth sending for one step.
+
+Selection is purely local keyword matching – no model call:
+
+* each schema is indexed once by the words of its name (weighted) and
+  description, expanded with a few verb synonyms used in task steps;
+* the step text is tokenised the same way and every schema is scored;
+* tools used earlier in the same task get a small boost;
+* schemas that are exact duplicates of an earlier one (same description and
+  parameters, e.g. write_file / modify_file) are dropped.
+
+When nothing scores, the whole de-duplicated list is returned so a step never
+loses access to a tool it needs.  A step can bypass selection entirely by
+being a dict: {"step": "...", "tools": ["read_file"]} (an empty list sends
+no functions at all).  When the request prefix is cacheable, a task sends the
+union of its steps' selections on every step (task_functions).  Override names of dropped duplicates resolve to the
+schema they duplicate; unknown names are logged and ignored, and an override
+naming no known tool falls back to keyword selection.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import re
+from functools import lru_cache
+from typing import Any, Iterable, Optional
+
+from function_schema import FUNCTIONS
+
+# Keys the provider understands; anything else (e.g. "context") stays local.
+_SCHEMA_KEYS = ("name", "description", "parameters")
+
+_SYNONYMS = {
+    "read": {"read", "open", "show", "view", "inspect", "look", "list", "folder",
+             "directory", "dir", "contents", "verify", "check", "analyze", "analize"},
+    "write": {"write", "create", "new", "save", "append", "add"},
+    "modify": {"modify", "update", "change", "edit", "fix", "rewrite", "replace", "apply"},
+    "smart": {"modify", "update", "change", "edit", "fix", "rewrite", "refactor",
+              "instructions"},
+    "diff": {"diff", "changes", "compare", "difference"},
+    "status": {"status", "changed", "modified", "staged", "untracked", "stat", "stats"},
+    "commit": {"commit", "message"},
+    "push": {"push", "publish", "upload"},
+    "pull": {"pull", "fetch", "sync", "rebase", "update"},
+    "add": {"add", "stage"},
+    "branch": {"branch", "checkout"},
+    "git": {"git", "repo", "repository"},
+    "file": {"file", "files", "path"},
+    "search": {"search", "find", "grep", "locate", "where", "usages", "usage",
+               "defined", "definition", "occurrences", "references"},
+    "code": {"code", "symbol", "function", "class", "method"},
+    "outline": {"outline", "structure", "symbols", "signatures", "overview",
+                "skeleton", "summary", "summarize"},
+}
+
+_STOPWORDS = {"the", "a", "an", "to", "of", "in", "on", "for", "and", "or", "it",
+              "is", "if", "its", "with", "from", "by", "be", "this", "that",
+              "which", "will", "then", "based", "specified", "given"}
+
+_WORD = re.compile(r"[a-z]+")
+
+NAME_WEIGHT = 3.0
+HISTORY_BOOST = 1.0
+MAX_TOOLS = 4
+# Drop candidates scoring below this fraction of the best match.
+RELATIVE_CUTOFF = 0.5
+
+
+def _tokens(text: str) -> set[str]:
+    return {w for w in _WORD.findall(text.lower()) if w not in _STOPWORDS}
+
+
+def step_text(step: Any) -> str:
+    """Return the prompt text of a task step (plain string or override dict)."""
+    return step.get("step", "") if isinstance(step, dict) else str(step)
+
+
+def step_tools(step: Any) -> Optional[list[str]]:
+    """Return the explicit tool override of a step, or None."""
+    return step.get("tools") if isinstance(step, dict) else None
+
+
+@lru_cache(maxsize=1)
+def _canonical() -> dict[str, str]:
+    """Every tool name → the name of the first schema it duplicates (or itself)."""
+    first: dict[str, str] = {}
+    out = {}
+    for fn in FUNCTIONS:
+        signature = json.dumps([fn.get("description"), fn.get("parameters")], sort_keys=True)
+        out[fn["name"]] = first.setdefault(signature, fn["name"])
+    return out
+
+
+@lru_cache(maxsize=1)
+def _index() -> tuple[tuple[dict, frozenset, frozenset], ...]:
+    """(clean schema, name keywords, description keywords), de-duplicated."""
+    canonical = _canonical()
+    out = []
+    for fn in FUNCTIONS:
+        if canonical[fn["name"]] != fn["name"]:
+            continue
+        clean = {k: fn[k] for k in _SCHEMA_KEYS if k in fn}
+        name_words = set(fn["name"].split("_"))
+        name_kw = set(name_words)
+        for word in name_words:
+            name_kw |= _SYNONYMS.get(word, set())
+        out.append((clean, frozenset(name_kw),
+                    frozenset(_tokens(fn.get("description", "")))))
+    return tuple(out)
+
+
+def all_functions() -> list[dict]:
+    """Every de-duplicated schema, stripped of local-only keys."""
+    return [schema for schema, _, _ in _index()]
+
+
+def select_functions(text: str,
+                     history: Iterable[str] = (),
+                     override: Optional[list[str]] = None,
+                     max_tools: int = MAX_TOOLS,
+                     stable: bool = False) -> list[dict]:
+    """Return the schemas relevant to `text`, in FUNCTIONS order.
+
+    With `stable=True` the full list is returned (unless overridden) so the
+    request prefix does not change between steps.
+    """
+    if override is not None:
+        canonical = _canonical()
+        unknown = [name for name in override if name not in canonical]
+        if unknown:
+            logging.warning(f"Unknown tools in step override ignored: {', '.join(unknown)}")
+        wanted = {canonical[name] for name in override if name in canonical}
+        if wanted or not override:
+            return [schema for schema, _, _ in _index() if schema["name"] in wanted]
+    if stable:
+        return all_functions()
+
+    words = _tokens(text)
+    used = {_canonical().get(name, name) for name in history}
+    scored = []
+    for pos, (schema, name_kw, desc_kw) in enumerate(_index()):
+        score = NAME_WEIGHT * len(words & name_kw) + len(words & desc_kw)
+        if score and schema["name"] in used:
+            score += HISTORY_BOOST
+        if score:
+            scored.append((score, pos, schema))
+
+    if not scored:
+        return all_functions()
+
+    top = max(score for score, _, _ in scored)
+    best = sorted((t for t in scored if t[0] >= top * RELATIVE_CUTOFF),
+                  key=lambda t: (-t[0], t[1]))[:max_tools]
+    # Keep a canonical order so identical subsets serialise identically.
+    return [schema for _, _, schema in sorted(best, key=lambda t: t[1])]
+
+
+def task_functions(steps: Iterable[Any]) -> list[dict]:
+    """Union of the per-step selections of a whole task, in FUNCTIONS order.
+
+    Sent for every step of the task when the prefix is cacheable: it stays
+    identical between steps without paying for the full tool list.
+    """
+    wanted: set[str] = set()
+    for step in steps:
+        wanted |= {s["name"] for s in select_functions(step_text(step), (), step_tools(step))}
+    return [schema for schema, _, _ in _index() if schema["name"] in wanted]